@@ -1,19 +1,22 @@
-from typing import Generator
-from fastapi import Depends, HTTPException, status
+from functools import cache
+from ipaddress import IPv4Network, IPv6Network, ip_address, ip_network
+from typing import AsyncGenerator, Generator
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import SessionLocal
+from app.db.session import AsyncSessionLocal, SessionLocal
 from app.core.config import settings
+from app.core.principals import Principal, cache_principal, get_cached_principal
 from app.schemas.token import TokenData
-from app.crud import crud_user
+from app.crud import crud_user_async
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login/token")
 
 def get_db() -> Generator:
     """
-    FastAPI dependency for obtaining a database session.
+    FastAPI dependency for obtaining a (sync) database session.
     Ensures that the session is closed after each request.
     """
     try:
@@ -22,12 +25,55 @@ def get_db() -> Generator:
     finally:
         db.close()
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
-):
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
     """
-    Functionality to obtain the current user from the JWT token.
+    FastAPI dependency for obtaining an async database session.
+    Ensures that the session is closed after each request.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+@cache
+def _trusted_networks(trusted_proxies: str) -> tuple[IPv4Network | IPv6Network, ...]:
+    entries = [entry.strip() for entry in trusted_proxies.split(",")]
+    return tuple(ip_network(entry, strict=False) for entry in entries if entry and entry != "*")
+
+def _is_trusted(address: str, networks: tuple) -> bool:
+    try:
+        parsed = ip_address(address)
+    except ValueError:
+        return False
+    return any(parsed in network for network in networks)
+
+def get_client_ip(request: Request) -> str:
+    """
+    FastAPI dependency with the address of the client.
+    When the peer is one of TRUSTED_PROXIES, it is the right-most X-Forwarded-For
+    entry that is not a trusted proxy: the entries to its left come from the
+    client and can be forged. "*" trusts the peer whatever its address.
     """
+    peer = request.client.host if request.client else "unknown"
+    trusted_proxies = [entry.strip() for entry in settings.TRUSTED_PROXIES.split(",")]
+    trust_any = "*" in trusted_proxies
+    networks = _trusted_networks(settings.TRUSTED_PROXIES)
+    if not trust_any and not _is_trusted(peer, networks):
+        return peer
+
+    forwarded = [
+        entry.strip()
+        for header in request.headers.getlist("x-forwarded-for")
+        for entry in header.split(",")
+        if entry.strip()
+    ]
+    if trust_any:
+        # Solo el peer es de confianza: la última entrada la añadió él
+        return forwarded[-1] if forwarded else peer
+    for address in reversed(forwarded):
+        if not _is_trusted(address, networks):
+            return address
+    return forwarded[0] if forwarded else peer
+
+async def _authenticate(db: AsyncSession, token: str, use_cache: bool) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -43,9 +89,37 @@ def get_current_user(
         token_data = TokenData(email=email)
     except JWTError:
         raise credentials_exception
-    
-    user = crud_user.get_user_by_email(db, email=token_data.email)
-    if user is None:
-        raise credentials_exception
-    
-    return user        
\ No newline at end of file
+
+    principal = get_cached_principal(token) if use_cache else None
+    if principal is None:
+        user = await crud_user_async.get_user_by_email(db, email=token_data.email)
+        if user is None:
+            raise credentials_exception
+        principal = Principal(id=user.id, email=user.email, is_active=user.is_active)
+        cache_principal(token, principal, expires_at=payload["exp"])
+
+    if not principal.is_active:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
+
+    return principal
+
+async def get_current_user(
+    db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)
+) -> Principal:
+    """
+    Functionality to obtain the current user from the JWT token.
+    The user snapshot is cached per token, so repeated requests skip the DB lookup.
+    The invalidation only reaches this process: with several workers, a user
+    deactivated elsewhere keeps access here for up to PRINCIPAL_CACHE_TTL_SECONDS.
+    """
+    return await _authenticate(db, token, use_cache=True)
+
+async def get_current_user_fresh(
+    db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)
+) -> Principal:
+    """
+    Like `get_current_user`, but always reads the user from the DB, for the
+    endpoints that return decrypted passwords: a user deactivated on another
+    worker is rejected at once. The cache is refreshed with what was read.
+    """
+    return await _authenticate(db, token, use_cache=False)
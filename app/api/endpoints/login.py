@@ -1,27 +1,43 @@
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from pydantic import EmailStr
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import deps
-from app.crud import crud_user
+from app.crud import crud_user_async
 from app.schemas.token import Token
 from app.schemas.password_reset import PasswordReset
-from app.core.security import create_access_token, create_password_reset_token, get_password_hash, verify_password_reset_token
+from app.core.security import create_access_token, verify_password_reset_token
 from app.core.config import settings
+from app.core.login_throttle import login_throttle
+from app.core import outbox
 
 router = APIRouter()
 
 @router.post("/token", response_model=Token)
-def login_for_access_token(
-    db: Session = Depends(deps.get_db),
+async def login_for_access_token(
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(deps.get_async_db),
+    client_ip: str = Depends(deps.get_client_ip),
     form_data: OAuth2PasswordRequestForm = Depends()
 ):
     """
     OAuth2 compatible token login, get an access token for future requests.
+    The bcrypt verification runs on the dedicated hashing pool.
+    Too many attempts for an account or from an IP get a 429 before any hashing.
+    Hashes made with an outdated cost are upgraded after the response.
     """
-    user = crud_user.authenticate_user(
-        db, email=form_data.username, password=form_data.password
+    retry_after = login_throttle.check(form_data.username, client_ip)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, try again later.",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    user = await crud_user_async.authenticate_user(
+        db, email=form_data.username, password=form_data.password, background_tasks=background_tasks
     )
     if not user:
         raise HTTPException(
@@ -29,7 +45,8 @@ def login_for_access_token(
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
+    login_throttle.login_succeeded(form_data.username)
+
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.email}, expires_delta=access_token_expires
@@ -38,31 +55,25 @@ def login_for_access_token(
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/password-recovery/{email}", status_code=status.HTTP_200_OK)
-def recover_password(email: str, db: Session = Depends(deps.get_db)):
+async def recover_password(email: EmailStr, db: AsyncSession = Depends(deps.get_async_db)):
     """
     Start the password recovery process.
+    The email goes to the outbox and the delivery worker sends it (if the user
+    exists), so the response takes the same short time either way.
+    A recovery already pending for the address is not queued again.
     """
-    user = crud_user.get_user_by_email(db, email=email)
+    # Sin consultar el usuario aquí: no revelamos, ni por el tiempo de
+    # respuesta, si existe o no. El worker descarta los emails desconocidos.
+    await outbox.enqueue_password_recovery(db, email)
+    await db.commit()
+    outbox.outbox_worker.wake()
 
-    if not user:
-        # No revelamos si el usuario existe o no por seguridad.
-        # Simplemente actuamos como si el proceso hubiera funcionado con normalidad.
-        print(f"Password recovery requested for non-existent user: {email}")
-        return {"msg": "If a user with that email exists, a password recovery link has been sent."}
-
-    password_reset_token = create_password_reset_token(email=email)
-    
-    print("--- PASSWORD RESET TOKEN (SIMULATED EMAIL) ---")
-    print(f"User: {user.email}")
-    print(f"Token: {password_reset_token}")
-    print("-----------------------------------------------")
-    
     return {"msg": "If a user with that email exists, a password recovery link has been sent."}
 
 @router.post("/reset-password/", status_code=status.HTTP_200_OK)
-def reset_password(
+async def reset_password(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     reset_data: PasswordReset
 ):
     """
@@ -75,18 +86,13 @@ def reset_password(
             detail="Invalid or expired token",
         )
     
-    user = crud_user.get_user_by_email(db, email=email)
+    user = await crud_user_async.get_user_by_email(db, email=email)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="The user with this email does not exist.",
         )
-        
-        
     
-    hashed_password = get_password_hash(reset_data.new_password)
-    user.hashed_password = hashed_password
-    db.add(user)
-    db.commit()
+    await crud_user_async.update_user_password(db, user, reset_data.new_password)
     
     return {"msg": "Password updated successfully"}    
\ No newline at end of file
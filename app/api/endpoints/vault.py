@@ -1,103 +1,390 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from functools import partial
+from typing import List, Literal, Sequence
+import csv
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import deps
-from app.models.user import User as UserModel
-from app.schemas.vault_item import VaultItem, VaultItemCreate, VaultItemUpdate, VaultItemWithPassword
-from app.crud import crud_vault_item
+from app.core.principals import Principal
+from app.schemas.vault_item import (
+    VaultChanges,
+    VaultImportResult,
+    VaultItem,
+    VaultItemCreate,
+    VaultItemUpdate,
+    VaultItemWithPassword,
+    VaultRevealRequest,
+)
+from app.models.vault_item import VaultItem as VaultItemModel
+from app.crud import crud_user_async, crud_vault_item_async
+from app.crud.crud_vault_item import (
+    CURSOR_KEY_TYPES, DEFAULT_LIST_FIELDS, FIELD_COLUMNS, RELEVANCE, next_page_key
+)
+from app.core.etags import etag_matches, make_etag
+from app.core.pagination import InvalidCursor, decode_cursor, encode_cursor
+from app.core.importers import ImportFormatError, iter_import_rows
+from app.core import events, exporters
 from app.core.security import decrypt_data
+from app.core.config import settings
+from app.core import crypto_pool
 
 router = APIRouter()
 
+ITEM_FIELDS = (*FIELD_COLUMNS, "password")
+
+def _parse_fields(fields: str | None, allowed: Sequence[str]) -> tuple[str, ...] | None:
+    """
+    Parses `?fields=a,b`. The id is always returned; unknown fields are a 400.
+    Returns None when the parameter is not given.
+    """
+    if fields is None:
+        return None
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return tuple(dict.fromkeys(["id", *requested]))
+
+async def _check_etag(
+    request: Request, db: AsyncSession, user_id: int, cache_control: str = "private, no-cache"
+) -> tuple[str, Response | None]:
+    """
+    ETag of a vault read, from the vault version and the request (path and query).
+    Returns the ETag and, when `If-None-Match` matches it, the 304 response to send.
+    """
+    version = await crud_user_async.get_vault_version(db, user_id)
+    return _etag_for_version(request, user_id, version, cache_control)
+
+def _etag_for_version(
+    request: Request, user_id: int, version: int, cache_control: str = "private, no-cache"
+) -> tuple[str, Response | None]:
+    etag = make_etag(user_id, version, request.url.path, request.url.query)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return etag, Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": etag, "Cache-Control": cache_control},
+        )
+    return etag, None
+
+def _with_password(item: VaultItemModel, password: str) -> dict:
+    """
+    Body of a VaultItemWithPassword built straight from the row. The stored
+    fields were validated on write, so they are returned as they are instead
+    of going through model_validate/model_dump again.
+    """
+    return {
+        "id": item.id,
+        "owner_id": item.owner_id,
+        "username": item.username,
+        "url": item.url,
+        "notes": item.notes,
+        "icon": item.icon,
+        "password": password,
+    }
+
 @router.post("/", response_model=VaultItem, status_code=status.HTTP_201_CREATED)
-def create_vault_item(
+async def create_vault_item(
     *,
-    db: Session = Depends(deps.get_db),
-    current_user: UserModel = Depends(deps.get_current_user),
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: Principal = Depends(deps.get_current_user),
     item_in: VaultItemCreate
 ):
     """
     Create a new item in the vault for the current user.
     """
-    item = crud_vault_item.create_vault_item(db=db, item=item_in, owner_id=current_user.id)
+    item = await crud_vault_item_async.create_vault_item(db=db, item=item_in, owner_id=current_user.id)
     return item
 
+@router.post("/import", response_model=VaultImportResult)
+async def import_vault_items(
+    file: UploadFile,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: Principal = Depends(deps.get_current_user)
+):
+    """
+    Bulk import of the export of another password manager.
+    Accepts CSV (Chrome, Firefox, Bitwarden, LastPass, 1Password...), JSON
+    (Bitwarden or a list of items) and NDJSON files. Invalid rows are reported
+    in `errors` and do not stop the import.
+    """
+    rows = iter_import_rows(file.file, file.filename)
+    try:
+        return await crud_vault_item_async.import_vault_items(db, owner_id=current_user.id, rows=rows)
+    except (ImportFormatError, UnicodeDecodeError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Could not read the file: {e}")
+
+@router.get("/export")
+async def export_vault_items(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: Principal = Depends(deps.get_current_user_fresh)
+):
+    """
+    Export the whole vault of the current user, with decrypted passwords, as NDJSON or CSV.
+    The response is streamed: rows are read in small partitions, each one
+    decrypted and formatted on the crypto pool.
+    """
+    owner_id = current_user.id
+    encode = exporters.format_csv if format == "csv" else exporters.format_ndjson
+    keyring = await crud_user_async.get_data_keyring(db, owner_id)
+
+    async def body():
+        # La dependencia cierra la sesión al volver el endpoint, antes de que
+        # se envíe el cuerpo; aquí se reutiliza y se cierra al terminar.
+        try:
+            if format == "csv":
+                yield exporters.csv_header()
+            async for partition in crud_vault_item_async.stream_vault_items_for_export(db, owner_id):
+                # Descifrar y formatear la partición, fuera del event loop
+                yield await crypto_pool.run(encode, partition, keyring)
+        finally:
+            await db.close()
+
+    return StreamingResponse(
+        body(),
+        media_type=exporters.MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="vault-export.{format}"',
+            "Cache-Control": "no-store",
+        },
+    )
+
 @router.get("/", response_model=List[VaultItem])
-def read_vault_items(
-    db: Session = Depends(deps.get_db),
-    current_user: UserModel = Depends(deps.get_current_user),
+async def read_vault_items(
+    request: Request,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: Principal = Depends(deps.get_current_user),
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
     q: str | None = None,
-    url_filter: str | None = None
+    url_filter: str | None = None,
+    domain: str | None = None,
+    sort: Literal["id", "url", "relevance"] = "id",
+    cursor: str | None = None,
+    fields: str | None = None
 ):
     """
     Gets the list of items in the vault for the current user.
-    - `q`: Free text search in username, URL, and notes.
+    - `q`: Free text search (word prefixes) in username, URL, and notes.
     - `url_filter`: Filters items whose URL contains this text.
+    - `domain`: Items for this host, its subdomains or its parent domains (autofill).
+    - `sort`: Order of the items (`id`, `url`, or `relevance` when searching with `q`).
+    - `cursor`: Opaque cursor of the next page. When there are more items, it is
+      returned in the `X-Next-Cursor` response header.
+    - `fields`: Comma-separated fields to return. By default all but `notes`,
+      which is only read from the database when asked for.
+
+    The response carries an ETag; with a matching `If-None-Match` it is a 304.
     """
-    items = crud_vault_item.get_vault_items_by_owner(
+    if sort == RELEVANCE and not q:
+        raise HTTPException(status_code=400, detail="sort=relevance requires a search query")
+    fields = _parse_fields(fields, FIELD_COLUMNS) or DEFAULT_LIST_FIELDS
+
+    etag, not_modified = await _check_etag(request, db, current_user.id)
+    if not_modified is not None:
+        return not_modified
+
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, sort, CURSOR_KEY_TYPES[sort])
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    # Pedimos un item de más para saber si hay otra página
+    rows = await crud_vault_item_async.get_vault_item_rows_by_owner(
         db,
         owner_id=current_user.id,
         skip=skip,
-        limit=limit,
+        limit=limit + 1,
         search=q,
-        url_filter=url_filter
+        url_filter=url_filter,
+        sort=sort,
+        after=after,
+        domain=domain,
+        fields=fields
     )
-    return items
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(sort, next_page_key(rows, sort, after, skip))
+    # Como en _with_password, las filas no pasan por el response_model
+    return ORJSONResponse(
+        [{field: getattr(row, field) for field in fields} for row in rows], headers=headers
+    )
+
+@router.get("/changes", response_model=VaultChanges)
+async def read_vault_changes(
+    request: Request,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: Principal = Depends(deps.get_current_user),
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=1000)
+):
+    """
+    Delta sync: the items created or updated and the ids deleted after the
+    `since` seq (0 for a full sync). Store the returned `seq` and send it as
+    `since` in the next call; while `has_more` is true, call again right away.
+    A 410 means the deletions after `since` were already compacted: do a full
+    sync with `since=0`.
+    """
+    version, compacted_seq = await crud_user_async.get_vault_sync_state(db, current_user.id)
+    if 0 < since < compacted_seq:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="The changes since this seq are no longer available; sync again with since=0",
+        )
+    etag, not_modified = _etag_for_version(request, current_user.id, version)
+    if not_modified is not None:
+        return not_modified
+
+    rows = await crud_vault_item_async.get_vault_item_changes(
+        db, owner_id=current_user.id, since=since, limit=limit + 1
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    items, deleted = [], []
+    for row in rows:
+        if row.deleted_at is not None:
+            deleted.append(row.id)
+        else:
+            item = {field: getattr(row, field) for field in FIELD_COLUMNS}
+            item.update(seq=row.seq, updated_at=row.updated_at)
+            items.append(item)
+    # Sin más páginas, el cliente queda al día hasta la versión leída
+    seq = rows[-1].seq if has_more else max(since, version, rows[-1].seq if rows else 0)
+    return ORJSONResponse(
+        {"items": items, "deleted": deleted, "seq": seq, "has_more": has_more},
+        headers={"ETag": etag, "Cache-Control": "private, no-cache"},
+    )
+
+@router.get("/events")
+async def stream_vault_events(
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: Principal = Depends(deps.get_current_user)
+):
+    """
+    Server-sent events with the vault version of the current user. The first
+    `vault` event carries the current version and a new one is sent after
+    every change, from any session; on each event, sync with `/vault/changes`.
+    Idle connections get a keepalive comment every `SSE_KEEPALIVE_SECONDS`.
+    """
+    user_id = current_user.id
+
+    async def body():
+        async with events.broker.subscribe(user_id) as subscription:
+            # Se lee la versión ya suscritos para no perder un cambio entre medias;
+            # la conexión a la base de datos no se retiene mientras dura el stream.
+            try:
+                version = await crud_user_async.get_vault_version(db, user_id)
+            finally:
+                await db.close()
+            subscription.seq = max(subscription.seq, version)
+            yield events.format_event(subscription.seq)
+            while True:
+                seq = await subscription.wait(settings.SSE_KEEPALIVE_SECONDS)
+                yield events.KEEPALIVE if seq is None else events.format_event(seq)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/reveal", response_model=List[VaultItemWithPassword])
+async def reveal_vault_items(
+    reveal_in: VaultRevealRequest,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: Principal = Depends(deps.get_current_user_fresh)
+):
+    """
+    Obtains several items with their decrypted passwords in one request.
+    Ids that do not exist or belong to another user are left out of the response.
+    """
+    keyring = await crud_user_async.get_data_keyring(db, current_user.id)
+    items = await crud_vault_item_async.get_vault_items_by_ids(
+        db, item_ids=reveal_in.ids, owner_id=current_user.id
+    )
+    encrypted = [item.encrypted_password for item in items]
+    decrypt = partial(decrypt_data, keyring=keyring)
+    # Los lotes grandes se descifran en paralelo en el pool de cifrado
+    if len(encrypted) > settings.CRYPTO_CHUNK_SIZE:
+        passwords = await crypto_pool.map_in_chunks(decrypt, encrypted, settings.CRYPTO_CHUNK_SIZE)
+    else:
+        passwords = [decrypt(value) for value in encrypted]
+    return ORJSONResponse([_with_password(item, password) for item, password in zip(items, passwords)])
 
 @router.get("/{item_id}", response_model=VaultItemWithPassword)
-def read_vault_item(
+async def read_vault_item(
     item_id: int,
-    db: Session = Depends(deps.get_db),
-    current_user: UserModel = Depends(deps.get_current_user)
+    request: Request,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: Principal = Depends(deps.get_current_user_fresh),
+    fields: str | None = None
 ):
     """
     Obtains the details of a specific item in the vault, including the decrypted password.
+    - `fields`: Comma-separated fields to return (e.g. `notes`). The password is
+      only decrypted when `password` is among them.
+
+    The response carries an ETag; with a matching `If-None-Match` it is a 304.
     """
-    item = crud_vault_item.get_vault_item(db, item_id=item_id, owner_id=current_user.id)
+    fields = _parse_fields(fields, ITEM_FIELDS)
+    with_password = fields is None or "password" in fields
+    # Con la contraseña descifrada la respuesta no se guarda en ninguna cache
+    cache_control = "no-store" if with_password else "private, no-cache"
+    etag, not_modified = await _check_etag(request, db, current_user.id, cache_control)
+    if not_modified is not None:
+        return not_modified
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    item = await crud_vault_item_async.get_vault_item(
+        db, item_id=item_id, owner_id=current_user.id, fields=fields
+    )
     if not item:
         raise HTTPException(status_code=404, detail="Vault item not found")
 
-    decrypted_password = decrypt_data(item.encrypted_password)
-
-    item_data = VaultItem.model_validate(item).model_dump()
-    item_data["password"] = decrypted_password
+    if fields is None:
+        keyring = await crud_user_async.get_data_keyring(db, current_user.id)
+        return ORJSONResponse(
+            _with_password(item, decrypt_data(item.encrypted_password, keyring)), headers=headers
+        )
 
-    return VaultItemWithPassword(**item_data)
+    # Solo se tocan los atributos cargados: el resto no se ha leído
+    body = {field: getattr(item, field) for field in fields if field != "password"}
+    if "password" in fields:
+        keyring = await crud_user_async.get_data_keyring(db, current_user.id)
+        body["password"] = decrypt_data(item.encrypted_password, keyring)
+    return ORJSONResponse(body, headers=headers)
 
 @router.put("/{item_id}", response_model=VaultItem)
-def update_vault_item(
+async def update_vault_item(
     item_id: int,
     item_in: VaultItemUpdate,
-    db: Session = Depends(deps.get_db),
-    current_user: UserModel = Depends(deps.get_current_user)
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: Principal = Depends(deps.get_current_user)
 ):
     """
     Update an item in the vault.
     """
-    
-    db_item = crud_vault_item.get_vault_item(db, item_id=item_id, owner_id=current_user.id)
-    if not db_item:
+    item = await crud_vault_item_async.update_vault_item(
+        db=db, item_id=item_id, owner_id=current_user.id, item_in=item_in
+    )
+    if not item:
         raise HTTPException(status_code=404, detail="Vault item not found")
-    
-    item = crud_vault_item.update_vault_item(db=db, db_item=db_item, item_in=item_in)
     return item
 
 @router.delete("/{item_id}", response_model=VaultItem)
-def delete_vault_item(
+async def delete_vault_item(
     item_id: int,
     *,
-    db: Session = Depends(deps.get_db),
-    current_user: UserModel = Depends(deps.get_current_user)
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: Principal = Depends(deps.get_current_user)
 ):
     """
     Remove an item from the vault.
     """
-    db_item = crud_vault_item.get_vault_item(db, item_id=item_id, owner_id=current_user.id)
-    if not db_item:
+    db_item = await crud_vault_item_async.remove_vault_item(db=db, item_id=item_id, owner_id=current_user.id)
+    if db_item is None:
         raise HTTPException(status_code=404, detail="Vault item not found")
-
-    item = crud_vault_item.remove_vault_item(db=db, item_id=item_id)
-    return item
\ No newline at end of file
+    return db_item
@@ -0,0 +1,178 @@
+"""
+Cipher engines for the vault secrets.
+
+New ciphertexts are raw bytes with a small versioned header, so several
+engines can coexist: rows written by one engine stay readable after switching
+`CIPHER_ENGINE`, and the key rotation job re-encrypts them with the current one.
+
+    version (1 byte) | key id (4 bytes) | nonce (12 bytes) | ciphertext + tag (16 bytes)
+
+The header is authenticated as associated data. Legacy Fernet tokens have no
+header: they are URL-safe base64 and always start with "g" (the 0x80 version
+byte of the Fernet spec), which never collides with the AEAD versions.
+
+The AEAD keys are derived with HKDF from the configured Fernet keys, so the
+same `ENCRYPTION_KEY` / `ENCRYPTION_OLD_KEYS` settings drive every engine.
+
+Vault secrets are encrypted with per-user data keys (`DataKeyring`, envelope
+encryption): each data key is random, stored wrapped by the master `Keyring`
+and identified by its own key id in the header.
+"""
+import base64
+import hashlib
+import os
+
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+FERNET = "fernet"
+
+# Motores AEAD disponibles: nombre -> (byte de versión, clase de cryptography).
+# Para añadir otro motor basta con registrarlo aquí con una versión nueva.
+AEAD_ENGINES = {
+    "aes-256-gcm": (1, AESGCM),
+    "chacha20-poly1305": (2, ChaCha20Poly1305),
+}
+
+DEFAULT_AEAD_ENGINE = "aes-256-gcm"
+DATA_KEY_SIZE = 32
+KEY_ID_SIZE = 4
+NONCE_SIZE = 12
+HEADER_SIZE = 1 + KEY_ID_SIZE
+_KDF_INFO = b"password-manager vault secrets v1"
+
+
+class InvalidCiphertext(ValueError):
+    pass
+
+
+def derive_key(fernet_key: str) -> bytes:
+    """Derive the 256-bit AEAD key from a Fernet key."""
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=_KDF_INFO).derive(
+        base64.urlsafe_b64decode(fernet_key.encode("utf-8"))
+    )
+
+
+def key_id(key: bytes) -> bytes:
+    """Short fingerprint of a derived key, stored in the header to pick the key on decrypt."""
+    return hashlib.sha256(key).digest()[:KEY_ID_SIZE]
+
+
+class Keyring:
+    """
+    Encrypts with the primary key and the configured engine; decrypts any
+    supported format written with any of the known keys.
+    """
+
+    def __init__(self, keys: list[str], engine: str = DEFAULT_AEAD_ENGINE):
+        if engine != FERNET and engine not in AEAD_ENGINES:
+            raise ValueError(f"Unknown cipher engine: {engine}")
+        self.engine = engine
+        self._primary_fernet = Fernet(keys[0].encode("utf-8"))
+        self._fernet = MultiFernet([Fernet(key.encode("utf-8")) for key in keys])
+
+        # (versión, key id) -> instancia AEAD, creada una sola vez por clave
+        self._aeads: dict[tuple[int, bytes], object] = {}
+        for index, key in enumerate(keys):
+            derived = derive_key(key)
+            kid = key_id(derived)
+            for version, cls in AEAD_ENGINES.values():
+                self._aeads[(version, kid)] = cls(derived)
+            if index == 0:
+                self._primary_key_id = kid
+
+        if engine != FERNET:
+            version = AEAD_ENGINES[engine][0]
+            self._header = bytes([version]) + self._primary_key_id
+            self._primary_aead = self._aeads[(version, self._primary_key_id)]
+
+    def encrypt(self, plaintext: bytes) -> bytes:
+        if self.engine == FERNET:
+            return self._primary_fernet.encrypt(plaintext)
+        return _aead_encrypt(self._primary_aead, self._header, plaintext)
+
+    def decrypt(self, ciphertext: bytes) -> bytes:
+        if _is_fernet(ciphertext):
+            try:
+                return self._fernet.decrypt(ciphertext)
+            except InvalidToken as exc:
+                raise InvalidCiphertext("Invalid Fernet token") from exc
+        aead = self._aeads.get((ciphertext[0], ciphertext[1:HEADER_SIZE]))
+        if aead is None:
+            raise InvalidCiphertext("Unknown ciphertext version or key")
+        return _aead_decrypt(aead, ciphertext)
+
+    def is_current(self, ciphertext: bytes) -> bool:
+        """Whether a ciphertext already uses the configured engine and the primary key."""
+        if self.engine != FERNET:
+            return ciphertext[:HEADER_SIZE] == self._header
+        if not _is_fernet(ciphertext):
+            return False
+        try:
+            self._primary_fernet.decrypt(ciphertext)
+        except InvalidToken:
+            return False
+        return True
+
+    def rotate(self, ciphertext: bytes) -> bytes:
+        """Re-encrypt a ciphertext with the configured engine and the primary key."""
+        return self.encrypt(self.decrypt(ciphertext))
+
+
+class DataKeyring:
+    """
+    Keyring of one user's data key. Ciphertexts written with another key
+    (before the user had a data key) are decrypted with the master keyring.
+    """
+
+    def __init__(self, data_key: bytes, master: Keyring):
+        # Con el motor fernet configurado, las claves de datos usan el AEAD por defecto
+        engine = master.engine if master.engine in AEAD_ENGINES else DEFAULT_AEAD_ENGINE
+        version = AEAD_ENGINES[engine][0]
+        self._key_id = key_id(data_key)
+        self._header = bytes([version]) + self._key_id
+        self._aeads = {version: cls(data_key) for version, cls in AEAD_ENGINES.values()}
+        self._primary_aead = self._aeads[version]
+        self._master = master
+
+    def encrypt(self, plaintext: bytes) -> bytes:
+        return _aead_encrypt(self._primary_aead, self._header, plaintext)
+
+    def decrypt(self, ciphertext: bytes) -> bytes:
+        if ciphertext[1:HEADER_SIZE] == self._key_id and ciphertext[0] in self._aeads:
+            return _aead_decrypt(self._aeads[ciphertext[0]], ciphertext)
+        return self._master.decrypt(ciphertext)
+
+    def is_current(self, ciphertext: bytes) -> bool:
+        return ciphertext[:HEADER_SIZE] == self._header
+
+    def rotate(self, ciphertext: bytes) -> bytes:
+        return self.encrypt(self.decrypt(ciphertext))
+
+
+CipherKeyring = Keyring | DataKeyring
+
+
+def new_data_key() -> bytes:
+    return os.urandom(DATA_KEY_SIZE)
+
+
+def _aead_encrypt(aead, header: bytes, plaintext: bytes) -> bytes:
+    nonce = os.urandom(NONCE_SIZE)
+    return header + nonce + aead.encrypt(nonce, plaintext, header)
+
+
+def _aead_decrypt(aead, ciphertext: bytes) -> bytes:
+    header = ciphertext[:HEADER_SIZE]
+    nonce = ciphertext[HEADER_SIZE:HEADER_SIZE + NONCE_SIZE]
+    try:
+        return aead.decrypt(nonce, ciphertext[HEADER_SIZE + NONCE_SIZE:], header)
+    except InvalidTag as exc:
+        raise InvalidCiphertext("Invalid ciphertext") from exc
+
+
+def _is_fernet(ciphertext: bytes) -> bool:
+    return ciphertext[:1] == b"g"
@@ -3,13 +3,109 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 class Settings(BaseSettings):
     # Base de datos
     DATABASE_URL: str = "sqlite:///./password_manager.db"
+    # Si está vacía se deriva de DATABASE_URL (p. ej. sqlite -> sqlite+aiosqlite)
+    ASYNC_DATABASE_URL: str = ""
+    # Al arrancar: "check" solo migra si cambió la versión del esquema,
+    # "migrate" migra siempre y "skip" no toca la base de datos
+    SCHEMA_STARTUP_MODE: str = "check"
 
     # Seguridad y JWT
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     ENCRYPTION_KEY: str
+    # Claves antiguas separadas por comas: solo se usan para descifrar
+    ENCRYPTION_OLD_KEYS: str = ""
+    # Motor para los datos nuevos: aes-256-gcm, chacha20-poly1305 o fernet
+    CIPHER_ENGINE: str = "aes-256-gcm"
     CORS_ORIGINS: str = ""
+
+    # Coste de bcrypt: calibrar con `python -m app.jobs.calibrate_hashing`.
+    # Los hashes con otro coste se rehacen al hacer login.
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_BUDGET_MS: float = 250
+
+    # Pool dedicado para el hashing con bcrypt (login, registro y reseteo)
+    HASHING_POOL_KIND: str = "thread"  # "thread" o "process"
+    HASHING_POOL_WORKERS: int = 4
+    HASHING_QUEUE_LIMIT: int = 64
+
+    # Límite de intentos de login, por cuenta y por IP (antes de bcrypt)
+    LOGIN_THROTTLE_ACCOUNT_BURST: int = 10
+    LOGIN_THROTTLE_ACCOUNT_PER_MINUTE: float = 5
+    LOGIN_THROTTLE_IP_BURST: int = 30
+    LOGIN_THROTTLE_IP_PER_MINUTE: float = 20
+    LOGIN_THROTTLE_MAX_KEYS: int = 100000
+    # Proxies (IPs o redes, separadas por comas; "*" = cualquiera) cuya cabecera
+    # X-Forwarded-For indica la IP real del cliente. Vacío: se usa la IP de la conexión
+    TRUSTED_PROXIES: str = ""
+
+    # Pool para cifrar/descifrar lotes (importación, reveal)
+    CRYPTO_POOL_WORKERS: int = 4
+    CRYPTO_CHUNK_SIZE: int = 100
+
+    # Importación masiva del vault
+    IMPORT_BATCH_SIZE: int = 500
+
+    # Job de rotación de la clave de cifrado
+    KEY_ROTATION_CHUNK_SIZE: int = 200
+    KEY_ROTATION_ROWS_PER_SECOND: int = 1000
+
+    # Tombstones de items borrados (sincronización incremental)
+    TOMBSTONE_RETENTION_DAYS: int = 30
+    TOMBSTONE_COMPACTION_CHUNK_SIZE: int = 1000
+
+    # Notificaciones de cambios del vault (SSE)
+    EVENT_BROKER: str = "memory"  # "memory" (un proceso) o "database" (varios workers)
+    EVENT_BROKER_POLL_SECONDS: float = 1.0
+    SSE_KEEPALIVE_SECONDS: float = 15.0
+
+    # Emails (recuperación de contraseña): "console" los imprime, "smtp" los envía
+    EMAIL_TRANSPORT: str = "console"
+    EMAIL_FROM: str = "Password Manager <no-reply@localhost>"
+    PASSWORD_RESET_URL: str = "http://localhost:5173/reset-password"
+    SMTP_HOST: str = "localhost"
+    SMTP_PORT: int = 25
+    SMTP_USERNAME: str = ""
+    SMTP_PASSWORD: str = ""
+    SMTP_STARTTLS: bool = False
+    SMTP_TIMEOUT_SECONDS: float = 10.0
+
+    # Worker de la outbox de emails (en el proceso de la API)
+    OUTBOX_WORKER_ENABLED: bool = True
+    OUTBOX_POLL_SECONDS: float = 5.0
+    OUTBOX_BATCH_SIZE: int = 50
+    OUTBOX_CONCURRENCY: int = 4
+    OUTBOX_MAX_ATTEMPTS: int = 6
+    # Espera antes del reintento n: BACKOFF * 2^(n-1), hasta MAX_BACKOFF
+    OUTBOX_BACKOFF_SECONDS: float = 30.0
+    OUTBOX_MAX_BACKOFF_SECONDS: float = 3600.0
+    # Un email reclamado por un worker que cae vuelve a estar pendiente tras el lease
+    OUTBOX_LEASE_SECONDS: float = 300.0
+    # Días que se guardan los emails fallidos antes de borrarlos
+    OUTBOX_FAILED_RETENTION_DAYS: int = 7
+
+    # Métricas Prometheus en /metrics
+    METRICS_ENABLED: bool = True
+    # Si no está vacío, /metrics exige "Authorization: Bearer <token>"
+    METRICS_TOKEN: str = ""
+
+    # Perfilado bajo demanda: peticiones con la cabecera "X-Profile: <token>"
+    PROFILING_ENABLED: bool = False
+    PROFILING_TOKEN: str = ""
+    PROFILING_DIR: str = "./profiles"
+
+    # Cache de las claves de datos (por usuario) ya descifradas
+    DATA_KEY_CACHE_TTL_SECONDS: int = 300
+    DATA_KEY_CACHE_MAXSIZE: int = 10000
+
+    # Cache de usuarios autenticados en get_current_user. La invalidación (cambio
+    # de contraseña, desactivación) solo llega al proceso que la hace: con varios
+    # workers, los demás pueden aceptar al usuario hasta este TTL. Las rutas que
+    # devuelven contraseñas (detalle, reveal, export) consultan siempre la BD.
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    PRINCIPAL_CACHE_MAXSIZE: int = 10000
+
     model_config = SettingsConfigDict(env_file=".env")
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,40 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Sequence, TypeVar
+
+from app.core.config import settings
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Pool para cifrar/descifrar lotes grandes sin bloquear el event loop
+_executor = ThreadPoolExecutor(
+    max_workers=settings.CRYPTO_POOL_WORKERS, thread_name_prefix="crypto"
+)
+
+
+def _apply(fn: Callable[[T], R], chunk: Sequence[T]) -> list[R]:
+    return [fn(value) for value in chunk]
+
+
+async def map_in_chunks(fn: Callable[[T], R], values: Sequence[T], chunk_size: int) -> list[R]:
+    """
+    Apply `fn` to every value, running chunks of `chunk_size` values in parallel
+    on the crypto pool. Results keep the order of `values`.
+    """
+    loop = asyncio.get_running_loop()
+    chunks = [values[i:i + chunk_size] for i in range(0, len(values), chunk_size)]
+    results = await asyncio.gather(
+        *(loop.run_in_executor(_executor, _apply, fn, chunk) for chunk in chunks)
+    )
+    return [value for chunk in results for value in chunk]
+
+
+async def run(fn: Callable[..., R], *args) -> R:
+    """Run a single call of `fn` on the crypto pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, fn, *args)
+
+
+def shutdown() -> None:
+    _executor.shutdown(wait=False, cancel_futures=True)
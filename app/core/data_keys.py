@@ -0,0 +1,33 @@
+"""
+Cache of the unwrapped per-user data keys.
+
+Unwrapping a data key costs a DB read plus a master-key decryption, so hot
+users pay it once per TTL. The crud modules fill the cache (see
+`crud_user_async.get_data_keyring`); re-keying or shredding a user drops
+their entry.
+"""
+from app.core.cache import TTLCache
+from app.core.ciphers import DataKeyring
+from app.core.config import settings
+from app.core.security import unwrap_data_key
+
+# Claves de datos descifradas, indexadas por id de usuario.
+data_key_cache = TTLCache(
+    maxsize=settings.DATA_KEY_CACHE_MAXSIZE,
+    ttl=settings.DATA_KEY_CACHE_TTL_SECONDS,
+)
+
+
+def get_cached_data_keyring(user_id: int) -> DataKeyring | None:
+    return data_key_cache.get(user_id)
+
+
+def cache_data_keyring(user_id: int, wrapped_key: bytes) -> DataKeyring:
+    """Unwrap a user's data key and keep its keyring in the cache."""
+    keyring = unwrap_data_key(wrapped_key)
+    data_key_cache.set(user_id, keyring)
+    return keyring
+
+
+def invalidate_data_key(user_id: int) -> None:
+    data_key_cache.pop(user_id)
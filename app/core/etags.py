@@ -0,0 +1,25 @@
+"""
+Strong ETags for the vault reads, derived from the per-user vault version.
+
+The version is bumped by every write of the vault (see
+`crud_vault_item.bump_vault_version`), so the same version and the same
+request always produce the same body. A matching `If-None-Match` is
+answered with a 304 before any item is read.
+"""
+import hashlib
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag (quoted) for the given version, user and request parts."""
+    digest = hashlib.sha256("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Whether an `If-None-Match` header matches the ETag (weak comparison, as RFC 9110 asks for GETs)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates
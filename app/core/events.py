@@ -0,0 +1,173 @@
+"""
+Vault change notifications.
+
+The vault CRUD functions publish the new vault version of a user after each
+commit, and `/vault/events` streams it to every open session of that user as
+server-sent events. The clients then fetch the delta from `/vault/changes`,
+instead of polling the whole list.
+
+An event only carries the vault version, so a subscription keeps just the
+latest one: a slow client skips intermediate versions and never piles up a
+queue.
+
+`InProcessBroker` fans the events out inside one process. With several
+workers, `DatabaseBroker` also polls the vault version of the users subscribed
+to this worker, so a change committed by another worker arrives within
+`EVENT_BROKER_POLL_SECONDS`. Another broker (Redis pub/sub, Postgres
+LISTEN/NOTIFY...) only needs the same `publish` / `subscribe` / `start` /
+`stop` methods.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.config import settings
+
+
+class Subscription:
+    """Latest vault version published for one user, consumed by one stream."""
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.seq = 0
+        self._changed = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+
+    def notify(self, seq: int) -> None:
+        """Safe to call from any thread (the sync CRUD runs in worker threads)."""
+        try:
+            self._loop.call_soon_threadsafe(self._advance, seq)
+        except RuntimeError:
+            # El event loop del stream ya se ha cerrado
+            pass
+
+    def _advance(self, seq: int) -> None:
+        if seq > self.seq:
+            self.seq = seq
+            self._changed.set()
+
+    async def wait(self, timeout: float) -> int | None:
+        """The version after the last one returned, or None if `timeout` passes first."""
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self._changed.clear()
+        return self.seq
+
+
+class InProcessBroker:
+    """Fans the vault versions out to the subscriptions of this process."""
+
+    def __init__(self):
+        self._subscriptions: dict[int, set[Subscription]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, user_id: int, seq: int) -> None:
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.notify(seq)
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: int) -> AsyncIterator[Subscription]:
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                subscriptions = self._subscriptions.get(user_id)
+                if subscriptions is not None:
+                    subscriptions.discard(subscription)
+                    if not subscriptions:
+                        del self._subscriptions[user_id]
+
+    def subscribed_users(self) -> list[int]:
+        with self._lock:
+            return list(self._subscriptions)
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+
+class DatabaseBroker(InProcessBroker):
+    """
+    In-process broker that also picks up the changes committed by other
+    workers, polling `users.vault_version` for the subscribed users only.
+    """
+
+    def __init__(self, session_factory: Callable, poll_seconds: float):
+        super().__init__()
+        self._session_factory = session_factory
+        self._poll_seconds = poll_seconds
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._poll())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def poll_once(self) -> None:
+        from app.models.user import User
+
+        user_ids = self.subscribed_users()
+        if not user_ids:
+            return
+        async with self._session_factory() as db:
+            rows = await db.execute(select(User.id, User.vault_version).where(User.id.in_(user_ids)))
+        # Las versiones ya vistas las descarta cada suscripción
+        for user_id, version in rows:
+            self.publish(user_id, version)
+
+    async def _poll(self) -> None:
+        while True:
+            await asyncio.sleep(self._poll_seconds)
+            try:
+                await self.poll_once()
+            except SQLAlchemyError:
+                # Se reintenta en la siguiente vuelta
+                pass
+
+
+def create_broker(kind: str) -> InProcessBroker:
+    if kind == "memory":
+        return InProcessBroker()
+    if kind == "database":
+        from app.db.session import AsyncSessionLocal
+
+        return DatabaseBroker(AsyncSessionLocal, settings.EVENT_BROKER_POLL_SECONDS)
+    raise ValueError(f"Unknown event broker: {kind}")
+
+
+broker = create_broker(settings.EVENT_BROKER)
+
+
+def publish_vault_change(user_id: int, seq: int) -> None:
+    """Notify the open sessions of a user; call it after the commit."""
+    broker.publish(user_id, seq)
+
+
+def format_event(seq: int) -> bytes:
+    """SSE frame of a vault version; the id lets the client resume with Last-Event-ID."""
+    return f'id: {seq}\nevent: vault\ndata: {{"seq": {seq}}}\n\n'.encode()
+
+
+KEEPALIVE = b": keepalive\n\n"
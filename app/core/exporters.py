@@ -0,0 +1,45 @@
+"""
+Formats for the vault export. Rows are decrypted and encoded one partition
+at a time, so memory use does not depend on the size of the vault.
+"""
+import csv
+import io
+import json
+from typing import Iterable
+
+from app.core.ciphers import CipherKeyring
+from app.core.security import decrypt_data
+
+EXPORT_FIELDS = ("url", "username", "password", "notes")
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _decrypted(row, keyring: CipherKeyring | None) -> dict:
+    return {
+        "url": row.url,
+        "username": row.username,
+        "password": decrypt_data(row.encrypted_password, keyring),
+        "notes": row.notes,
+    }
+
+
+def csv_header() -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(EXPORT_FIELDS)
+    return buffer.getvalue()
+
+
+def format_csv(rows: Iterable, keyring: CipherKeyring | None = None) -> str:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    for row in rows:
+        writer.writerow(_decrypted(row, keyring))
+    return buffer.getvalue()
+
+
+def format_ndjson(rows: Iterable, keyring: CipherKeyring | None = None) -> str:
+    return "".join(json.dumps(_decrypted(row, keyring), ensure_ascii=False) + "\n" for row in rows)
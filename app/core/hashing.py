@@ -0,0 +1,79 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable
+
+from app.core.config import settings
+from app.core import security
+
+
+class HashingPoolBusy(Exception):
+    """Raised when the hashing queue is full and the request must be rejected."""
+
+
+class HashingPool:
+    """
+    Bounded executor for bcrypt work.
+
+    Hashing runs on its own thread or process pool so that a burst of logins
+    cannot starve Starlette's shared thread pool, which serves every other
+    sync endpoint. Requests beyond `queue_limit` (running + waiting) are
+    rejected with `HashingPoolBusy` instead of queueing without bound.
+    """
+
+    def __init__(self, kind: str = "thread", workers: int = 4, queue_limit: int = 64):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown hashing pool kind: {kind}")
+        self.kind = kind
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.pending = 0
+        self._executor: Executor | None = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="hashing"
+                )
+        return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run `fn(*args)` on the pool, or raise `HashingPoolBusy` if the queue is full."""
+        # Solo se modifica desde el event loop, no hace falta un lock.
+        if self.pending >= self.queue_limit:
+            raise HashingPoolBusy()
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hashing_pool = HashingPool(
+    kind=settings.HASHING_POOL_KIND,
+    workers=settings.HASHING_POOL_WORKERS,
+    queue_limit=settings.HASHING_QUEUE_LIMIT,
+)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the hashing pool."""
+    return await hashing_pool.run(security.verify_password, plain_password, hashed_password)
+
+
+async def verify_dummy_password(password: str) -> bool:
+    """Fail after the same bcrypt work as a real verification (unknown emails)."""
+    return await hashing_pool.run(security.verify_dummy_password, password)
+
+
+async def get_password_hash(password: str) -> str:
+    """Hash a password on the hashing pool."""
+    return await hashing_pool.run(security.get_password_hash, password)
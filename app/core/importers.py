@@ -0,0 +1,104 @@
+"""
+Parsers for the exports of other password managers.
+
+Each parser yields `(row_number, fields)` pairs, where `fields` uses the
+names of `VaultItemCreate` (url, username, password, notes). CSV and NDJSON
+files are read line by line; JSON documents are loaded at once.
+"""
+import csv
+import io
+import json
+from typing import IO, Iterator
+
+# Nombres de columna de las exportaciones más comunes (Chrome/Edge, Firefox,
+# Bitwarden, LastPass, 1Password, KeePass...) para cada campo del vault.
+COLUMN_ALIASES = {
+    "url": ("url", "login_uri", "website", "uri", "web site", "login url"),
+    "username": ("username", "login_username", "user name", "login", "email"),
+    "password": ("password", "login_password"),
+    "notes": ("notes", "note", "extra", "comments"),
+}
+
+
+class ImportFormatError(ValueError):
+    """Raised when the uploaded file is not a supported export."""
+
+
+def _normalize(record: dict) -> dict:
+    lowered = {str(key).strip().lower(): value for key, value in record.items() if key is not None}
+    fields = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            value = lowered.get(alias)
+            if value not in (None, ""):
+                fields[field] = value
+                break
+    return fields
+
+
+def _bitwarden_item(item: dict) -> dict:
+    """Flatten an item of a Bitwarden JSON export ({"login": {"uris": [...]}})."""
+    login = item.get("login") or {}
+    uris = login.get("uris")
+    # Los exports reales traen entradas nulas y "username": null
+    uri = next((entry.get("uri") for entry in uris if isinstance(entry, dict)), None) if isinstance(uris, list) else None
+    return {
+        "url": uri,
+        "username": login.get("username") or "",
+        "password": login.get("password"),
+        "notes": item.get("notes"),
+    }
+
+
+def iter_csv(stream: IO[str]) -> Iterator[tuple[int, dict]]:
+    reader = csv.DictReader(stream)
+    if not reader.fieldnames:
+        raise ImportFormatError("The CSV file has no header row")
+    # La fila 1 es la cabecera
+    for row_number, record in enumerate(reader, start=2):
+        yield row_number, _normalize(record)
+
+
+def iter_ndjson(stream: IO[str]) -> Iterator[tuple[int, dict]]:
+    for row_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield row_number, {"__error__": "Invalid JSON line"}
+            continue
+        yield row_number, _record(record)
+
+
+def iter_json(stream: IO[str]) -> Iterator[tuple[int, dict]]:
+    try:
+        document = json.load(stream)
+    except ValueError as e:
+        raise ImportFormatError("Invalid JSON document") from e
+    if isinstance(document, dict):
+        document = document.get("items", [])
+    if not isinstance(document, list):
+        raise ImportFormatError("Expected a list of items")
+    for row_number, record in enumerate(document, start=1):
+        yield row_number, _record(record)
+
+
+def _record(record) -> dict:
+    if not isinstance(record, dict):
+        return {"__error__": "Expected an object"}
+    # "login" también es un alias del usuario: solo un objeto es un item de Bitwarden
+    if isinstance(record.get("login"), dict):
+        return _bitwarden_item(record)
+    return _normalize(record)
+
+
+def iter_import_rows(binary: IO[bytes], filename: str | None) -> Iterator[tuple[int, dict]]:
+    """Pick the parser from the file extension (CSV by default) and yield its rows."""
+    stream = io.TextIOWrapper(binary, encoding="utf-8-sig", newline="")
+    name = (filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl")):
+        return iter_ndjson(stream)
+    if name.endswith(".json"):
+        return iter_json(stream)
+    return iter_csv(stream)
@@ -0,0 +1,102 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from app.core.config import settings
+from app.core.metrics import Counter
+
+login_throttled = Counter(
+    "login_throttled_total", "Login attempts rejected by the throttle, by the limit hit.", ("scope",)
+)
+
+
+class TokenBuckets:
+    """
+    Token buckets by key: each key holds up to `capacity` attempts and gets
+    `per_second` back over time. At most `maxsize` keys are tracked; the least
+    recently used is evicted first (an evicted key starts full again).
+    """
+
+    def __init__(self, capacity: float, per_second: float, maxsize: int):
+        self.capacity = capacity
+        self.per_second = per_second
+        self.maxsize = maxsize
+        # clave -> (tokens, instante de la última actualización)
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def peek(self, key: str, now: float) -> tuple[float, float]:
+        """Tokens available for `key` now, and seconds until one is available (0 if already)."""
+        tokens, updated = self._buckets.get(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated) * self.per_second)
+        wait = 0.0 if tokens >= 1 else (1 - tokens) / self.per_second
+        return tokens, wait
+
+    def take(self, key: str, tokens: float, now: float) -> None:
+        self._buckets[key] = (tokens - 1, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+
+    def reset(self, key: str) -> None:
+        self._buckets.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class LoginThrottle:
+    """
+    Limits login attempts per account and per client IP, checked before the
+    user lookup and bcrypt, so a credential-stuffing run cannot use up the
+    hashing pool. An attempt counts against both limits.
+    """
+
+    def __init__(
+        self,
+        account_burst: int,
+        account_per_minute: float,
+        ip_burst: int,
+        ip_per_minute: float,
+        maxsize: int,
+    ):
+        self.accounts = TokenBuckets(account_burst, account_per_minute / 60, maxsize)
+        self.ips = TokenBuckets(ip_burst, ip_per_minute / 60, maxsize)
+        self._lock = threading.Lock()
+
+    def check(self, email: str, ip: str) -> int | None:
+        """
+        Count an attempt. Returns None when it is allowed, or the seconds to
+        wait (for Retry-After) when a limit is exceeded; rejected attempts do
+        not consume tokens.
+        """
+        account = email.strip().lower()
+        now = time.monotonic()
+        with self._lock:
+            account_tokens, account_wait = self.accounts.peek(account, now)
+            ip_tokens, ip_wait = self.ips.peek(ip, now)
+            if account_wait or ip_wait:
+                login_throttled.labels("account" if account_wait >= ip_wait else "ip").inc()
+                return max(1, math.ceil(max(account_wait, ip_wait)))
+            self.accounts.take(account, account_tokens, now)
+            self.ips.take(ip, ip_tokens, now)
+        return None
+
+    def login_succeeded(self, email: str) -> None:
+        """A successful login clears the failed attempts of the account (not of the IP)."""
+        with self._lock:
+            self.accounts.reset(email.strip().lower())
+
+    def clear(self) -> None:
+        with self._lock:
+            self.accounts = TokenBuckets(self.accounts.capacity, self.accounts.per_second, self.accounts.maxsize)
+            self.ips = TokenBuckets(self.ips.capacity, self.ips.per_second, self.ips.maxsize)
+
+
+login_throttle = LoginThrottle(
+    account_burst=settings.LOGIN_THROTTLE_ACCOUNT_BURST,
+    account_per_minute=settings.LOGIN_THROTTLE_ACCOUNT_PER_MINUTE,
+    ip_burst=settings.LOGIN_THROTTLE_IP_BURST,
+    ip_per_minute=settings.LOGIN_THROTTLE_IP_PER_MINUTE,
+    maxsize=settings.LOGIN_THROTTLE_MAX_KEYS,
+)
@@ -0,0 +1,100 @@
+"""
+Email transports used by the outbox delivery worker (see app.core.outbox).
+
+A transport only needs an async `send(message)`. It raises
+`PermanentDeliveryError` when retrying cannot help (e.g. the server refuses
+the recipient); any other exception is retried with backoff.
+
+`ConsoleTransport` prints the message (development, and the old behaviour of
+the password recovery); `SmtpTransport` sends it with the standard library's
+smtplib, in a worker thread so the event loop never waits on the server.
+"""
+import asyncio
+import smtplib
+import ssl
+from email.message import EmailMessage
+
+from app.core.config import settings
+
+
+class PermanentDeliveryError(Exception):
+    """The message can never be delivered as it is; it is not retried."""
+
+
+class ConsoleTransport:
+    async def send(self, message: EmailMessage) -> None:
+        print("--- EMAIL (CONSOLE TRANSPORT) ---")
+        print(f"To: {message['To']}")
+        print(f"Subject: {message['Subject']}")
+        print(message.get_content())
+        print("---------------------------------")
+
+
+class SmtpTransport:
+    """Sends each message over its own SMTP connection (STARTTLS and login if configured)."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: str = "",
+        password: str = "",
+        starttls: bool = False,
+        timeout: float = 10.0,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+
+    async def send(self, message: EmailMessage) -> None:
+        await asyncio.to_thread(self._send, message)
+
+    def _send(self, message: EmailMessage) -> None:
+        try:
+            with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+                if self.starttls:
+                    smtp.starttls(context=ssl.create_default_context())
+                if self.username:
+                    smtp.login(self.username, self.password)
+                smtp.send_message(message)
+        except smtplib.SMTPRecipientsRefused as exc:
+            if all(code >= 500 for code, _ in exc.recipients.values()):
+                raise PermanentDeliveryError(f"Recipient refused: {exc.recipients}") from exc
+            raise
+        except smtplib.SMTPResponseException as exc:
+            # 5xx: error permanente del servidor; 4xx: temporal, se reintenta
+            if exc.smtp_code >= 500:
+                raise PermanentDeliveryError(f"{exc.smtp_code} {exc.smtp_error!r}") from exc
+            raise
+
+
+def create_transport(kind: str) -> ConsoleTransport | SmtpTransport:
+    if kind == "console":
+        return ConsoleTransport()
+    if kind == "smtp":
+        return SmtpTransport(
+            settings.SMTP_HOST,
+            settings.SMTP_PORT,
+            settings.SMTP_USERNAME,
+            settings.SMTP_PASSWORD,
+            settings.SMTP_STARTTLS,
+            settings.SMTP_TIMEOUT_SECONDS,
+        )
+    raise ValueError(f"Unknown email transport: {kind}")
+
+
+def password_recovery_message(email: str, token: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = settings.EMAIL_FROM
+    message["To"] = email
+    message["Subject"] = "Password recovery"
+    message.set_content(
+        "A password reset was requested for your account.\n\n"
+        f"Reset your password: {settings.PASSWORD_RESET_URL}?token={token}\n\n"
+        f"Token: {token}\n\n"
+        "If you did not request it, you can ignore this email.\n"
+    )
+    return message
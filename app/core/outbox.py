@@ -0,0 +1,262 @@
+"""
+Outbox of the emails sent by the API.
+
+Endpoints never talk to the mail server: they add a row to `email_outbox` in
+their own transaction and wake the delivery worker, so a request pays no SMTP
+latency. A password recovery only stores the address it was asked for: the
+worker looks the user up, drops the emails to unknown addresses and builds
+the token when it sends, so the endpoint does the same work whether or not
+the user exists and no reset token is ever stored. A recovery for an address
+that already has one pending is not queued again, so repeating the request
+cannot flood the outbox or a mailbox.
+
+The worker claims the due emails in batches with one UPDATE ... RETURNING
+that moves their next attempt one lease ahead (an email claimed by a worker
+that dies is retried after `OUTBOX_LEASE_SECONDS`), sends them with at most
+`OUTBOX_CONCURRENCY` in flight, deletes the sent ones and retries the others
+with exponential backoff up to `OUTBOX_MAX_ATTEMPTS`, after which they stay
+as "failed" for inspection during `OUTBOX_FAILED_RETENTION_DAYS`; the worker
+deletes the older ones about once an hour.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from typing import Callable
+
+from sqlalchemy import DateTime, Integer, String, delete, exists, insert, literal, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.mail import PermanentDeliveryError, create_transport, password_recovery_message
+from app.core.metrics import Counter
+from app.core.security import create_password_reset_token
+from app.models.email_outbox import OutboxEmail
+from app.models.user import User
+
+PASSWORD_RECOVERY = "password_recovery"
+# Cada cuánto borra el worker los emails fallidos más antiguos que la retención
+PURGE_INTERVAL_SECONDS = 3600
+
+outbox_emails = Counter(
+    "outbox_emails_total", "Emails processed by the outbox worker, by result.", ("result",)
+)
+
+
+async def enqueue_password_recovery(db: AsyncSession, email: str) -> bool:
+    """
+    Queue a password recovery email in the caller's transaction, unless one
+    for the same address is already pending. It is a single INSERT ... SELECT
+    either way, so the work does not depend on the address.
+    After the commit, `outbox_worker.wake()` sends it without waiting for the next poll.
+
+    :param db: The async database session.
+    :param email: The address the recovery was requested for.
+    :return: True if a new email was queued.
+    """
+    now = datetime.now(timezone.utc)
+    pending = exists().where(
+        OutboxEmail.kind == PASSWORD_RECOVERY,
+        OutboxEmail.recipient == email,
+        OutboxEmail.status == "pending",
+    )
+    # Dos peticiones simultáneas aún pueden encolar dos: solo evita acumularlos
+    result = await db.execute(
+        insert(OutboxEmail).from_select(
+            ["kind", "recipient", "status", "attempts", "next_attempt_at", "created_at"],
+            select(
+                literal(PASSWORD_RECOVERY, String),
+                literal(email, String),
+                literal("pending", String),
+                literal(0, Integer),
+                literal(now, DateTime(timezone=True)),
+                literal(now, DateTime(timezone=True)),
+            ).where(~pending),
+        )
+    )
+    return result.rowcount == 1
+
+
+class OutboxWorker:
+    """Delivers the emails of the outbox through a transport (see app.core.mail)."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        transport,
+        batch_size: int,
+        concurrency: int,
+        max_attempts: int,
+        backoff_seconds: float,
+        max_backoff_seconds: float,
+        lease_seconds: float,
+        poll_seconds: float,
+        failed_retention_days: float,
+    ):
+        self._session_factory = session_factory
+        self.transport = transport
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.failed_retention_days = failed_retention_days
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    def backoff(self, attempts: int) -> float:
+        """Seconds to wait after the `attempts`-th failed attempt."""
+        return min(self.backoff_seconds * 2 ** (attempts - 1), self.max_backoff_seconds)
+
+    async def deliver_once(self) -> int:
+        """Claim one batch of due emails and try to send them. Returns how many were claimed."""
+        now = datetime.now(timezone.utc)
+        async with self._session_factory() as db:
+            due = (
+                select(OutboxEmail.id)
+                .where(OutboxEmail.status == "pending", OutboxEmail.next_attempt_at <= now)
+                .order_by(OutboxEmail.id)
+                .limit(self.batch_size)
+            )
+            # La condición se repite en el UPDATE: dos workers no reclaman el mismo email
+            claimed = (await db.execute(
+                update(OutboxEmail)
+                .where(OutboxEmail.id.in_(due), OutboxEmail.next_attempt_at <= now)
+                .values(
+                    next_attempt_at=now + timedelta(seconds=self.lease_seconds),
+                    attempts=OutboxEmail.attempts + 1,
+                )
+                .returning(OutboxEmail.id, OutboxEmail.kind, OutboxEmail.recipient, OutboxEmail.attempts)
+                .execution_options(synchronize_session=False)
+            )).all()
+            await db.commit()
+            if not claimed:
+                return 0
+            recipients = {email.recipient for email in claimed if email.kind == PASSWORD_RECOVERY}
+            known = set(await db.scalars(select(User.email).where(User.email.in_(recipients))))
+
+        # Sin sesión abierta mientras se habla con el servidor de correo
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*(self._deliver(email, known, semaphore) for email in claimed))
+
+        now = datetime.now(timezone.utc)
+        async with self._session_factory() as db:
+            done = [email.id for email, (result, _) in zip(claimed, results) if result in ("sent", "dropped")]
+            if done:
+                await db.execute(delete(OutboxEmail).where(OutboxEmail.id.in_(done)))
+            for email, (result, error) in zip(claimed, results):
+                if result == "retry":
+                    values = {"next_attempt_at": now + timedelta(seconds=self.backoff(email.attempts))}
+                elif result == "failed":
+                    values = {"status": "failed"}
+                else:
+                    continue
+                await db.execute(
+                    update(OutboxEmail)
+                    .where(OutboxEmail.id == email.id)
+                    .values(last_error=error[:500], **values)
+                    .execution_options(synchronize_session=False)
+                )
+            await db.commit()
+        for result, _ in results:
+            outbox_emails.labels(result).inc()
+        return len(claimed)
+
+    async def purge_failed(self) -> int:
+        """Delete the failed emails queued more than `failed_retention_days` ago. Returns how many."""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.failed_retention_days)
+        async with self._session_factory() as db:
+            result = await db.execute(
+                delete(OutboxEmail)
+                .where(OutboxEmail.status == "failed", OutboxEmail.created_at < cutoff)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        return result.rowcount
+
+    def build_message(self, email, known: set[str]) -> EmailMessage | None:
+        """The message of an outbox email, or None if it has to be dropped."""
+        if email.kind == PASSWORD_RECOVERY:
+            if email.recipient not in known:
+                return None
+            return password_recovery_message(email.recipient, create_password_reset_token(email.recipient))
+        raise PermanentDeliveryError(f"Unknown email kind: {email.kind}")
+
+    async def _deliver(self, email, known: set[str], semaphore: asyncio.Semaphore) -> tuple[str, str | None]:
+        """Send one email: ("sent" | "dropped" | "retry" | "failed", error)."""
+        try:
+            message = self.build_message(email, known)
+            if message is None:
+                return "dropped", None
+            async with semaphore:
+                await self.transport.send(message)
+        except PermanentDeliveryError as exc:
+            return "failed", str(exc)
+        except Exception as exc:
+            # Cualquier otro error del transporte (red, 4xx...) se reintenta
+            result = "failed" if email.attempts >= self.max_attempts else "retry"
+            return result, f"{type(exc).__name__}: {exc}"
+        return "sent", None
+
+    def wake(self) -> None:
+        """Deliver now instead of at the next poll (call it after committing new emails)."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wakeup = None
+
+    async def _run(self) -> None:
+        last_purge = None
+        while True:
+            # Un wake() durante el envío hace que la espera termine enseguida
+            self._wakeup.clear()
+            try:
+                if last_purge is None or time.monotonic() - last_purge >= PURGE_INTERVAL_SECONDS:
+                    await self.purge_failed()
+                    last_purge = time.monotonic()
+                claimed = await self.deliver_once()
+            except SQLAlchemyError:
+                # Se reintenta en la siguiente vuelta
+                claimed = 0
+            # Con un lote lleno seguramente quedan más: se sigue sin esperar
+            if claimed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+
+
+def create_outbox_worker() -> OutboxWorker:
+    from app.db.session import AsyncSessionLocal
+
+    return OutboxWorker(
+        AsyncSessionLocal,
+        create_transport(settings.EMAIL_TRANSPORT),
+        batch_size=settings.OUTBOX_BATCH_SIZE,
+        concurrency=settings.OUTBOX_CONCURRENCY,
+        max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+        backoff_seconds=settings.OUTBOX_BACKOFF_SECONDS,
+        max_backoff_seconds=settings.OUTBOX_MAX_BACKOFF_SECONDS,
+        lease_seconds=settings.OUTBOX_LEASE_SECONDS,
+        poll_seconds=settings.OUTBOX_POLL_SECONDS,
+        failed_retention_days=settings.OUTBOX_FAILED_RETENTION_DAYS,
+    )
+
+
+outbox_worker = create_outbox_worker()
@@ -0,0 +1,39 @@
+import base64
+import json
+from typing import Any, Sequence
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(sort: str, values: tuple[Any, ...]) -> str:
+    """Build an opaque cursor from the sort key values of the last row of a page."""
+    raw = json.dumps({"s": sort, "k": list(values)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, key_types: Sequence[type]) -> tuple[Any, ...]:
+    """
+    Return the key values stored in `cursor`, checking that it was built for
+    `sort` and that it holds one value of each of `key_types` (ints must not
+    be negative), so a forged cursor never reaches the query.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        values = data["k"]
+        cursor_sort = data["s"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+    if cursor_sort != sort:
+        raise InvalidCursor("The cursor was built for a different sort order")
+    if not isinstance(values, list) or len(values) != len(key_types):
+        raise InvalidCursor("Invalid cursor")
+    for value, key_type in zip(values, key_types):
+        # bool es un int para isinstance, pero nunca es una clave válida
+        if isinstance(value, bool) or not isinstance(value, key_type):
+            raise InvalidCursor("Invalid cursor")
+        if key_type is int and value < 0:
+            raise InvalidCursor("Invalid cursor")
+    return tuple(values)
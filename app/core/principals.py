@@ -0,0 +1,34 @@
+import time
+from dataclasses import dataclass
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """Lightweight snapshot of the authenticated user, safe to share between requests."""
+    id: int
+    email: str
+    is_active: bool
+
+
+# Cache de usuarios autenticados, indexada por el token JWT.
+principal_cache = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_MAXSIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+
+def get_cached_principal(token: str) -> Principal | None:
+    return principal_cache.get(token)
+
+
+def cache_principal(token: str, principal: Principal, expires_at: float) -> None:
+    """Cache a principal, never beyond the expiry of its token (unix timestamp)."""
+    principal_cache.set(token, principal, ttl=expires_at - time.time())
+
+
+def invalidate_principal(email: str) -> None:
+    """Drop every cached session of a user (password change, deactivation...)."""
+    principal_cache.discard_where(lambda _, principal: principal.email == email)
@@ -0,0 +1,127 @@
+"""
+On-demand profiling of single requests.
+
+With `PROFILING_ENABLED`, a request carrying `X-Profile: <PROFILING_TOKEN>`
+runs under cProfile. The pstats file and the SQL statements it executed
+(with their parameters' shape and timings, from the sync and async engines)
+are saved to `PROFILING_DIR`, and the response names them in
+`X-Profile-Id`. Open a profile with `python -m pstats <file>.prof` or
+snakeviz.
+
+cProfile records the event loop thread, so other requests served at the same
+time may show up in the profile, and work sent to the hashing or crypto
+pools appears as the time spent awaiting it. One request is profiled at a
+time; others with the header are served normally.
+
+With the setting off (the default) neither the middleware nor the engine
+hooks are installed, so requests pay nothing.
+"""
+import cProfile
+import json
+import os
+import secrets
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Callable
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+HEADER = b"x-profile"
+
+# Consultas SQL de la petición que se está perfilando
+_profiled_sql: ContextVar[list | None] = ContextVar("profiled_sql", default=None)
+
+
+def instrument_engine(engine: Engine, name: str) -> Callable[[], None]:
+    """
+    Record the statements of `engine` run by a profiled request (AsyncEngine: pass `sync_engine`).
+    Returns a function that removes the hooks again.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _profiled_sql.get() is not None:
+            context._profiling_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        statements = _profiled_sql.get()
+        if statements is None:
+            return
+        # Solo el número de filas de parámetros: los valores pueden ser secretos
+        rows = len(parameters) if executemany else 1
+        statements.append({
+            "engine": name,
+            "statement": statement,
+            "parameter_rows": rows,
+            "duration_ms": round((time.perf_counter() - context._profiling_started) * 1000, 3),
+        })
+
+    def remove() -> None:
+        event.remove(engine, "before_cursor_execute", _before)
+        event.remove(engine, "after_cursor_execute", _after)
+
+    return remove
+
+
+class ProfilingMiddleware:
+    """Profiles the requests that carry the right `X-Profile` token."""
+
+    def __init__(self, app: ASGIApp, token: str, directory: str):
+        if not token:
+            raise ValueError("PROFILING_TOKEN is required when PROFILING_ENABLED is set")
+        self.app = app
+        self.token = token.encode()
+        self.directory = directory
+        self.busy = False
+
+    def _requested(self, scope: Scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == HEADER:
+                return secrets.compare_digest(value, self.token)
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or self.busy or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{secrets.token_hex(4)}"
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        statements: list[dict] = []
+        token = _profiled_sql.set(statements)
+        profiler = cProfile.Profile()
+        self.busy = True
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - started
+            self.busy = False
+            _profiled_sql.reset(token)
+            self._save(profile_id, profiler, statements, {
+                "method": scope["method"],
+                "path": scope["path"],
+                "query_string": scope["query_string"].decode("latin-1"),
+                "status": status_code,
+                "duration_ms": round(elapsed * 1000, 3),
+            })
+
+    def _save(self, profile_id: str, profiler: cProfile.Profile, statements: list[dict], request: dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        profiler.dump_stats(os.path.join(self.directory, f"{profile_id}.prof"))
+        with open(os.path.join(self.directory, f"{profile_id}.json"), "w") as f:
+            json.dump({"request": request, "sql": statements}, f, indent=2)
@@ -1,21 +1,72 @@
+import secrets
+import time
+from functools import cache
 from datetime import datetime, timedelta, timezone
-from passlib.context import CryptContext
+from typing import TYPE_CHECKING
 from jose import JWTError, jwt
 
 from app.core.config import settings
-from cryptography.fernet import Fernet
+from app.core.ciphers import CipherKeyring, DataKeyring, Keyring, new_data_key
+from app.core.metrics import crypto_time
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+# passlib y el keyring maestro se construyen en el primer uso, no al importar:
+# el arranque en frío no paga por ellos hasta que una petición los necesita.
+
+@cache
+def get_pwd_context() -> "CryptContext":
+    from passlib.context import CryptContext
+
+    # min = max = BCRYPT_ROUNDS: needs_update marca los hashes con cualquier otro coste
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+        bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+        bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+    )
+
+# Tiempos de las operaciones criptográficas para /metrics
+_bcrypt_verify_time = crypto_time.labels("bcrypt_verify")
+_bcrypt_hash_time = crypto_time.labels("bcrypt_hash")
+_encrypt_time = crypto_time.labels("encrypt")
+_decrypt_time = crypto_time.labels("decrypt")
 
 # --- Hashing de Passwords ---
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify whether a plaintext password matches a hashed one."""
-    return pwd_context.verify(plain_password, hashed_password)
+    started = time.perf_counter()
+    try:
+        return get_pwd_context().verify(plain_password, hashed_password)
+    finally:
+        _bcrypt_verify_time.observe(time.perf_counter() - started)
 
 def get_password_hash(password: str) -> str:
     """Generates the hash of a password."""
-    return pwd_context.hash(password)
+    started = time.perf_counter()
+    try:
+        return get_pwd_context().hash(password)
+    finally:
+        _bcrypt_hash_time.observe(time.perf_counter() - started)
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Whether a hash was made with another scheme or cost than the configured one (no hashing)."""
+    return get_pwd_context().needs_update(hashed_password)
+
+@cache
+def _dummy_password_hash() -> str:
+    return get_password_hash(secrets.token_urlsafe(16))
+
+def verify_dummy_password(plain_password: str) -> bool:
+    """
+    Run a bcrypt verification that always fails, so a login for an unknown
+    email costs the same as one with a wrong password.
+    """
+    verify_password(plain_password, _dummy_password_hash())
+    return False
 
 # --- Creación y verificación de tokens ---
 
@@ -32,21 +83,74 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-_cipher_suite = Fernet(settings.ENCRYPTION_KEY.encode('utf-8'))
+# --- Cifrado de datos del vault ---
+# La primera clave es la principal (cifra); las antiguas solo descifran,
+# hasta que el job de rotación (app.jobs.key_rotation) re-cifra sus datos.
+# El formato de los datos cifrados depende del motor (ver app.core.ciphers).
+# Las contraseñas del vault se cifran con la clave de datos de cada usuario,
+# guardada cifrada (wrapped) con la clave maestra.
+
+def _parse_keys(keys: str) -> list[str]:
+    return [key.strip() for key in keys.split(",") if key.strip()]
 
-def encrypt_data(data: str) -> str:
-    """Encodes a string and returns it as a string."""
+def configure_keys(
+    primary_key: str, old_keys: list[str] | None = None, engine: str | None = None
+) -> None:
+    """(Re)build the master keyring from a primary key, the decrypt-only old keys and the cipher engine."""
+    global _keyring
+    _keyring = Keyring([primary_key, *(old_keys or [])], engine or settings.CIPHER_ENGINE)
+
+_keyring: Keyring | None = None
+
+def get_master_keyring() -> Keyring:
+    if _keyring is None:
+        configure_keys(settings.ENCRYPTION_KEY, _parse_keys(settings.ENCRYPTION_OLD_KEYS))
+    return _keyring
+
+def _as_bytes(data: bytes | str) -> bytes:
+    # Los tokens Fernet antiguos pueden llegar como str
+    return data.encode('utf-8') if isinstance(data, str) else data
+
+def encrypt_data(data: str, keyring: CipherKeyring | None = None) -> bytes:
+    """Encrypts a string (with the master keyring unless another is given) and returns the ciphertext bytes."""
     if not data:
-        return data
-    encrypted_bytes = _cipher_suite.encrypt(data.encode('utf-8'))
-    return encrypted_bytes.decode('utf-8')
+        return b""
+    started = time.perf_counter()
+    encrypted = (keyring or get_master_keyring()).encrypt(data.encode('utf-8'))
+    _encrypt_time.observe(time.perf_counter() - started)
+    return encrypted
+
+def decrypt_data(encrypted_data: bytes | str, keyring: CipherKeyring | None = None) -> str:
+    """Decrypts a ciphertext (any supported format) and returns it as a string."""
+    if not encrypted_data:
+        return ""
+    started = time.perf_counter()
+    decrypted = (keyring or get_master_keyring()).decrypt(_as_bytes(encrypted_data)).decode('utf-8')
+    _decrypt_time.observe(time.perf_counter() - started)
+    return decrypted
+
+def is_encrypted_with_primary_key(
+    encrypted_data: bytes | str, keyring: CipherKeyring | None = None
+) -> bool:
+    """Whether a value is already encrypted with the primary (or data) key and the current engine."""
+    if not encrypted_data:
+        return True
+    return (keyring or get_master_keyring()).is_current(_as_bytes(encrypted_data))
 
-def decrypt_data(encrypted_data: str) -> str:
-    """Decrypts a string and returns it as a string."""
+def rotate_data(encrypted_data: bytes | str, keyring: CipherKeyring | None = None) -> bytes:
+    """Re-encrypts a value with the primary (or data) key; it may be encrypted with any known key."""
     if not encrypted_data:
-        return encrypted_data
-    decrypted_bytes = _cipher_suite.decrypt(encrypted_data.encode('utf-8'))
-    return decrypted_bytes.decode('utf-8')
+        return b""
+    return (keyring or get_master_keyring()).rotate(_as_bytes(encrypted_data))
+
+def new_wrapped_data_key() -> bytes:
+    """Generates a new data key, wrapped with the master key."""
+    return get_master_keyring().encrypt(new_data_key())
+
+def unwrap_data_key(wrapped_key: bytes) -> DataKeyring:
+    """Decrypts a wrapped data key and returns its keyring."""
+    master = get_master_keyring()
+    return DataKeyring(master.decrypt(_as_bytes(wrapped_key)), master)
 
 # --- Funciones para Reseteo de Contraseña ---
 
@@ -0,0 +1,89 @@
+import ipaddress
+from urllib.parse import urlsplit
+
+# Sufijos públicos de dos niveles más habituales. No es la Public Suffix List
+# completa, pero cubre los casos comunes sin añadir dependencias.
+_MULTI_LABEL_SUFFIXES = {
+    "co.uk", "org.uk", "ac.uk", "gov.uk", "me.uk", "ltd.uk", "plc.uk",
+    "com.au", "net.au", "org.au", "edu.au", "gov.au",
+    "co.nz", "org.nz", "co.jp", "ne.jp", "or.jp", "ac.jp",
+    "com.br", "net.br", "org.br", "com.mx", "com.ar", "com.co", "com.es",
+    "co.in", "co.za", "co.kr", "com.cn", "com.tw", "com.hk", "com.sg", "com.tr",
+    "github.io", "gitlab.io", "herokuapp.com", "netlify.app", "onrender.com",
+    "vercel.app", "pages.dev", "web.app", "firebaseapp.com", "azurewebsites.net",
+    "cloudfront.net", "blogspot.com",
+}
+
+
+def normalize_host(url: str | None) -> str | None:
+    """Lowercased host of a URL (IDNA-encoded, without port or trailing dot)."""
+    if not url:
+        return None
+    if "://" not in url:
+        url = f"//{url}"
+    try:
+        host = urlsplit(url).hostname
+    except ValueError:
+        return None
+    if not host:
+        return None
+    host = host.rstrip(".").lower()
+    try:
+        host = host.encode("idna").decode("ascii")
+    except UnicodeError:
+        pass
+    return host or None
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+def registrable_domain(host: str | None) -> str | None:
+    """
+    Registrable domain of a host (accounts.example.co.uk -> example.co.uk).
+    IP addresses and single-label hosts are returned as they are.
+    """
+    if not host:
+        return None
+    if _is_ip(host):
+        return host
+    labels = host.split(".")
+    if len(labels) <= 2:
+        return host
+    if ".".join(labels[-2:]) in _MULTI_LABEL_SUFFIXES:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+def reverse_host(host: str | None) -> str | None:
+    """accounts.example.com -> com.example.accounts, so subdomains share a prefix."""
+    if not host:
+        return None
+    if _is_ip(host):
+        return host
+    return ".".join(reversed(host.split(".")))
+
+
+def parent_hosts(host: str) -> list[str]:
+    """The host and its parents down to its registrable domain (a.b.example.com -> [a.b.example.com, b.example.com, example.com])."""
+    domain = registrable_domain(host)
+    hosts = [host]
+    while host != domain and "." in host:
+        host = host.split(".", 1)[1]
+        hosts.append(host)
+    return hosts
+
+
+def url_host_fields(url: str | None) -> dict:
+    """Normalized host columns stored next to a vault item URL."""
+    host = normalize_host(url)
+    return {
+        "host": host,
+        "registrable_domain": registrable_domain(host),
+        "reversed_host": reverse_host(host),
+    }
@@ -1,7 +1,18 @@
+from sqlalchemy import insert, select, update
 from sqlalchemy.orm import Session
 from app.models.user import User
 from app.schemas.user import UserCreate
-from app.core.security import get_password_hash, verify_password
+from app.core.ciphers import DataKeyring
+from app.core.data_keys import cache_data_keyring, get_cached_data_keyring, invalidate_data_key
+from app.core.security import (
+    get_master_keyring,
+    get_password_hash,
+    new_wrapped_data_key,
+    password_needs_rehash,
+    verify_dummy_password,
+    verify_password,
+)
+from app.core.principals import invalidate_principal
 
 def get_user_by_email(db: Session, email: str) -> User | None:
     """
@@ -22,15 +33,142 @@ def create_user(db: Session, user: UserCreate) -> User:
     :return: The newly created User object.
     """
     hashed_password = get_password_hash(user.password)
-    db_user = User(
-        email=user.email,
-        hashed_password=hashed_password,
+    # INSERT ... RETURNING: la fila vuelve en el mismo round-trip, sin refresh
+    db_user = db.scalar(
+        insert(User)
+        .values(email=user.email, hashed_password=hashed_password, encrypted_data_key=new_wrapped_data_key())
+        .returning(User)
     )
-    db.add(db_user)
     db.commit()
-    db.refresh(db_user)
     return db_user
 
+def update_user_password(db: Session, user: User, hashed_password: str) -> User:
+    """
+    Store a new password hash for a user.
+
+    :param db: The database session.
+    :param user: The user whose password changes.
+    :param hashed_password: The new password hash.
+    :return: The updated User object.
+    """
+    user.hashed_password = hashed_password
+    db.add(user)
+    db.commit()
+    invalidate_principal(user.email)
+    return user
+
+def set_user_active(db: Session, user: User, is_active: bool) -> User:
+    """
+    Activate or deactivate a user.
+
+    :param db: The database session.
+    :param user: The user to update.
+    :param is_active: The new active flag.
+    :return: The updated User object.
+    """
+    user.is_active = is_active
+    db.add(user)
+    db.commit()
+    invalidate_principal(user.email)
+    return user
+
+def get_data_keyring(db: Session, user_id: int) -> DataKeyring:
+    """
+    Get the keyring of a user's data key, from the cache or unwrapping the stored key.
+    Users created before the data keys get one here.
+
+    :param db: The database session.
+    :param user_id: The id of the user.
+    :return: The DataKeyring of the user.
+    """
+    keyring = get_cached_data_keyring(user_id)
+    if keyring is not None:
+        return keyring
+    wrapped_key = db.scalar(select(User.encrypted_data_key).where(User.id == user_id))
+    if wrapped_key is None:
+        # Solo si sigue vacía: dos procesos concurrentes no deben pisarse la clave
+        db.execute(
+            update(User)
+            .where(User.id == user_id, User.encrypted_data_key.is_(None))
+            .values(encrypted_data_key=new_wrapped_data_key())
+        )
+        db.commit()
+        wrapped_key = db.scalar(select(User.encrypted_data_key).where(User.id == user_id))
+    return cache_data_keyring(user_id, wrapped_key)
+
+def find_data_keyring(db: Session, user_id: int) -> DataKeyring | None:
+    """
+    Get the keyring of a user's data key like `get_data_keyring`, but never
+    create one: a user without a data key (e.g. after `shred_data_key`) gets None.
+
+    :param db: The database session.
+    :param user_id: The id of the user.
+    :return: The DataKeyring of the user, or None if they have no data key.
+    """
+    keyring = get_cached_data_keyring(user_id)
+    if keyring is not None:
+        return keyring
+    wrapped_key = db.scalar(select(User.encrypted_data_key).where(User.id == user_id))
+    if wrapped_key is None:
+        return None
+    return cache_data_keyring(user_id, wrapped_key)
+
+def rewrap_data_key(db: Session, user: User) -> User:
+    """
+    Re-encrypt a user's data key with the current master key.
+    The vault items of the user are not touched.
+
+    :param db: The database session.
+    :param user: The user to re-key.
+    :return: The updated User object.
+    """
+    if user.encrypted_data_key:
+        user.encrypted_data_key = get_master_keyring().rotate(user.encrypted_data_key)
+        db.add(user)
+        db.commit()
+        invalidate_data_key(user.id)
+    return user
+
+def shred_data_key(db: Session, user: User) -> User:
+    """
+    Crypto-shred a user's vault: deletes their data key, so the secrets
+    encrypted with it can no longer be decrypted. In the same transaction
+    their vault items become tombstones (one change seq each), so the API and
+    the key rotation never meet a ciphertext without its key.
+
+    :param db: The database session.
+    :param user: The user whose data key is destroyed.
+    :return: The updated User object.
+    """
+    # crud_vault_item importa este módulo
+    from app.core.events import publish_vault_change
+    from app.crud.crud_vault_item import bump_vault_version, change_values, tombstone_values
+    from app.models.vault_item import VaultItem
+
+    item_ids = db.scalars(
+        select(VaultItem.id)
+        .where(VaultItem.owner_id == user.id, VaultItem.deleted_at.is_(None))
+        .order_by(VaultItem.id)
+    ).all()
+    seq = None
+    if item_ids:
+        seq = db.scalar(bump_vault_version(user.id, len(item_ids)))
+        first_seq = seq - len(item_ids) + 1
+        db.execute(
+            update(VaultItem),
+            [
+                {"id": item_id, **tombstone_values(), **change_values(first_seq + offset)}
+                for offset, item_id in enumerate(item_ids)
+            ],
+        )
+    user.encrypted_data_key = None
+    db.add(user)
+    db.commit()
+    invalidate_data_key(user.id)
+    if seq is not None:
+        publish_vault_change(user.id, seq)
+    return user
+
 def authenticate_user(db: Session, email: str, password: str) -> User | None:
     """
      Authenticate a user.
@@ -42,7 +180,13 @@ def authenticate_user(db: Session, email: str, password: str) -> User | None:
     """
     user = get_user_by_email(db, email=email)
     if not user:
+        # Mismo coste que una contraseña incorrecta: el tiempo no revela si el email existe
+        verify_dummy_password(password)
         return None
     if not verify_password(password, user.hashed_password):
         return None
+    if password_needs_rehash(user.hashed_password):
+        # Sin event loop, el hash con el coste configurado se hace aquí mismo
+        user.hashed_password = get_password_hash(password)
+        db.commit()
     return user    
\ No newline at end of file
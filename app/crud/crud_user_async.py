@@ -0,0 +1,159 @@
+from fastapi import BackgroundTasks
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.user import User
+from app.schemas.user import UserCreate
+from app.core import hashing
+from app.core.ciphers import DataKeyring
+from app.core.data_keys import cache_data_keyring, get_cached_data_keyring
+from app.core.principals import invalidate_principal
+from app.core.security import new_wrapped_data_key, password_needs_rehash
+from app.db.session import AsyncSessionLocal
+
+# Versión async de crud_user, usada por los endpoints.
+# El hashing con bcrypt se delega en el pool de hashing.
+
+async def get_user_by_email(db: AsyncSession, email: str) -> User | None:
+    """
+    Search for a user by their email address.
+
+    :param db: The async database session.
+    :param email: The email address of the user to search for.
+    :return: The User object if found, otherwise None.
+    """
+    return (await db.scalars(select(User).where(User.email == email))).first()
+
+async def create_user(db: AsyncSession, user: UserCreate) -> User:
+    """
+    Creates a new user in the database.
+
+    :param db: The async database session.
+    :param user: The data for the user to be created (UserCreate schema).
+    :return: The newly created User object.
+    """
+    # Liberamos la conexión mientras bcrypt trabaja.
+    await db.close()
+    hashed_password = await hashing.get_password_hash(user.password)
+    # INSERT ... RETURNING: la fila vuelve en el mismo round-trip, sin refresh
+    db_user = await db.scalar(
+        insert(User)
+        .values(email=user.email, hashed_password=hashed_password, encrypted_data_key=new_wrapped_data_key())
+        .returning(User)
+    )
+    await db.commit()
+    return db_user
+
+async def get_data_keyring(db: AsyncSession, user_id: int) -> DataKeyring:
+    """
+    Get the keyring of a user's data key, from the cache or unwrapping the stored key.
+    Users created before the data keys get one here.
+
+    :param db: The async database session.
+    :param user_id: The id of the user.
+    :return: The DataKeyring of the user.
+    """
+    keyring = get_cached_data_keyring(user_id)
+    if keyring is not None:
+        return keyring
+    wrapped_key = await db.scalar(select(User.encrypted_data_key).where(User.id == user_id))
+    if wrapped_key is None:
+        # Solo si sigue vacía: dos peticiones concurrentes no deben pisarse la clave
+        await db.execute(
+            update(User)
+            .where(User.id == user_id, User.encrypted_data_key.is_(None))
+            .values(encrypted_data_key=new_wrapped_data_key())
+        )
+        await db.commit()
+        wrapped_key = await db.scalar(select(User.encrypted_data_key).where(User.id == user_id))
+    return cache_data_keyring(user_id, wrapped_key)
+
+async def get_vault_version(db: AsyncSession, user_id: int) -> int:
+    """
+    Current version of a user's vault (primary key lookup, no item is read).
+
+    :param db: The async database session.
+    :param user_id: The id of the user.
+    :return: The vault version.
+    """
+    return await db.scalar(select(User.vault_version).where(User.id == user_id)) or 0
+
+async def get_vault_sync_state(db: AsyncSession, user_id: int) -> tuple[int, int]:
+    """
+    Vault version and compacted seq of a user, for the delta sync.
+
+    :param db: The async database session.
+    :param user_id: The id of the user.
+    :return: (vault_version, vault_compacted_seq).
+    """
+    row = (await db.execute(
+        select(User.vault_version, User.vault_compacted_seq).where(User.id == user_id)
+    )).one()
+    return row.vault_version, row.vault_compacted_seq
+
+async def update_user_password(db: AsyncSession, user: User, password: str) -> User:
+    """
+    Hash and store a new password for a user.
+
+    :param db: The async database session.
+    :param user: The user whose password changes.
+    :param password: The new password in plain text.
+    :return: The updated User object.
+    """
+    # Liberamos la conexión mientras bcrypt trabaja.
+    await db.close()
+    user.hashed_password = await hashing.get_password_hash(password)
+    db.add(user)
+    await db.commit()
+    invalidate_principal(user.email)
+    return user
+
+async def authenticate_user(
+    db: AsyncSession, email: str, password: str, background_tasks: BackgroundTasks | None = None
+) -> User | None:
+    """
+    Authenticate a user.
+    When the stored hash uses another cost than BCRYPT_ROUNDS, it is rehashed
+    after the response, in `background_tasks`.
+
+    :param db: The async database session.
+    :param email: The user's email address.
+    :param password: The password in plain text.
+    :param background_tasks: Where to schedule the rehash, if one is needed.
+    :return: The User object if authentication is successful, otherwise None.
+    """
+    user = await get_user_by_email(db, email=email)
+    # Devolvemos la conexión al pool antes del hashing: si no, una ráfaga de
+    # logins retiene todas las conexiones mientras bcrypt trabaja.
+    await db.close()
+    if not user:
+        # Mismo coste que una contraseña incorrecta: el tiempo no revela si el email existe
+        await hashing.verify_dummy_password(password)
+        return None
+    if not await hashing.verify_password(password, user.hashed_password):
+        return None
+    if background_tasks is not None and password_needs_rehash(user.hashed_password):
+        background_tasks.add_task(rehash_password, user.id, user.hashed_password, password)
+    return user
+
+async def rehash_password(user_id: int, old_hash: str, password: str) -> bool:
+    """
+    Replace a user's hash with one made with the configured cost.
+    The UPDATE only applies if the hash is still `old_hash`, so a password
+    changed in the meantime is never overwritten. It runs after the response,
+    so it opens its own session instead of using the request's.
+
+    :param user_id: The user's id.
+    :param old_hash: The hash the password was verified against.
+    :param password: The password in plain text.
+    :return: True if the hash was replaced.
+    """
+    new_hash = await hashing.get_password_hash(password)
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            update(User)
+            .where(User.id == user_id, User.hashed_password == old_hash)
+            .values(hashed_password=new_hash)
+        )
+        await db.commit()
+    return result.rowcount == 1
@@ -1,102 +1,403 @@
-from typing import List
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from datetime import datetime, timezone
+from typing import Any, List, Sequence
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy import Insert, Select, Update, and_, func, insert, literal_column, or_, select, union_all, update
 
+from app.models.user import User
 from app.models.vault_item import VaultItem
+from app.db import fulltext
 from app.schemas.vault_item import VaultItemCreate, VaultItemUpdate
+from app.core.ciphers import CipherKeyring
 from app.core.security import encrypt_data
+from app.core.events import publish_vault_change
+from app.crud import crud_user
+from app.core.urls import normalize_host, parent_hosts, reverse_host, url_host_fields
 
-def get_vault_item(db: Session, item_id: int, owner_id: int) -> VaultItem | None:
-    """Retrieves an item from the vault by its ID, ensuring that it belongs to the owner_id."""
-    return db.query(VaultItem).filter(VaultItem.id == item_id, VaultItem.owner_id == owner_id).first()
+# Órdenes disponibles para el listado, todos con `id` como desempate.
+# "relevance" (solo con búsqueda) ordena por el rank del índice full-text.
+SORT_KEYS = {
+    "id": (VaultItem.id,),
+    "url": (VaultItem.url, VaultItem.id),
+}
+RELEVANCE = "relevance"
+# Tipos de los valores de un cursor por orden (con relevance, la posición)
+CURSOR_KEY_TYPES = {
+    "id": (int,),
+    "url": (str, int),
+    RELEVANCE: (int,),
+}
 
-def get_vault_items_by_owner(
-    db: Session, 
-    owner_id: int, 
-    skip: int = 0, 
+# Campos que se pueden pedir con ?fields=, y su columna
+FIELD_COLUMNS = {
+    "id": VaultItem.id,
+    "owner_id": VaultItem.owner_id,
+    "username": VaultItem.username,
+    "url": VaultItem.url,
+    "notes": VaultItem.notes,
+    "icon": VaultItem.icon,
+}
+# Campos del listado por defecto: las notas (Text) solo se leen si se piden
+DEFAULT_LIST_FIELDS = ("id", "owner_id", "username", "url", "icon")
+
+# Columnas de /vault/changes: las del item (sin el password) y las del cambio
+CHANGE_COLUMNS = (*FIELD_COLUMNS.values(), VaultItem.seq, VaultItem.updated_at, VaultItem.deleted_at)
+
+# Filas por lectura al exportar en streaming
+EXPORT_PARTITION_SIZE = 500
+
+# --- Construcción de consultas y objetos (compartido con crud_vault_item_async) ---
+
+def vault_item_query(item_id: int, owner_id: int, fields: Sequence[str] | None = None) -> Select:
+    """
+    Statement that selects one item, ensuring that it belongs to the owner_id.
+    With `fields`, only those columns are loaded (plus the encrypted password
+    when "password" is among them); the rest are never read.
+    """
+    query = select(VaultItem).where(
+        VaultItem.id == item_id, VaultItem.owner_id == owner_id, VaultItem.deleted_at.is_(None)
+    )
+    if fields is not None:
+        columns = [FIELD_COLUMNS[field] for field in fields if field in FIELD_COLUMNS]
+        if "password" in fields:
+            columns.append(VaultItem.encrypted_password)
+        query = query.options(load_only(*columns))
+    return query
+
+def bump_vault_version(owner_id: int, count: int = 1) -> Update:
+    """
+    Statement that increments the vault version of the owner, in the same
+    transaction as the write, and returns the new version. Each written item
+    takes one of the `count` new versions as its change `seq`.
+    """
+    return (
+        update(User)
+        .where(User.id == owner_id)
+        .values(vault_version=User.vault_version + count)
+        .returning(User.vault_version)
+    )
+
+def vault_item_changes_query(owner_id: int, since: int, limit: int) -> Select:
+    """Statement with the items (and tombstones) of an owner changed after `since`, in seq order."""
+    return (
+        select(*CHANGE_COLUMNS)
+        .where(VaultItem.owner_id == owner_id, VaultItem.seq > since)
+        .order_by(VaultItem.seq)
+        .limit(limit)
+    )
+
+def list_columns(fields: Sequence[str], sort: str) -> tuple:
+    """Columns to select for a list of `fields`, plus the sort key needed for the next cursor."""
+    columns = [FIELD_COLUMNS[field] for field in fields]
+    for column in SORT_KEYS.get(sort, ()):
+        if column.key not in fields:
+            columns.append(column)
+    return tuple(columns)
+
+def vault_items_by_ids_query(item_ids: List[int], owner_id: int) -> Select:
+    """Statement that selects several items with one IN query, only those that belong to the owner_id."""
+    return (
+        select(VaultItem)
+        .where(VaultItem.id.in_(item_ids), VaultItem.owner_id == owner_id, VaultItem.deleted_at.is_(None))
+        .order_by(VaultItem.id)
+    )
+
+def vault_items_by_owner_query(
+    owner_id: int,
+    skip: int = 0,
     limit: int = 100,
     search: str | None = None,
-    url_filter: str | None = None
-) -> List[VaultItem]:
+    url_filter: str | None = None,
+    sort: str = "id",
+    after: tuple[Any, ...] | None = None,
+    dialect: str = "sqlite",
+    domain: str | None = None,
+    columns: tuple | None = None
+) -> Select:
     """
-    Get a list of vault items for a specific user,
-    with search and filter options.
+    Statement that lists the items of an owner, with search and filter options.
+    Rows are ordered by `sort`; `after` holds the sort key of the last row already
+    seen, so the next page starts right after it (keyset pagination).
+    `search` uses the full-text index of the `dialect` when there is one.
+    `domain` keeps the items that match that host (see `domain_condition`).
+    `columns` selects those columns (Core rows) instead of VaultItem objects.
     """
-    query = db.query(VaultItem).filter(VaultItem.owner_id == owner_id)
+    query = select(*columns) if columns else select(VaultItem)
+    query = query.where(VaultItem.owner_id == owner_id, VaultItem.deleted_at.is_(None))
+    rank = None
     
     if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                VaultItem.username.ilike(search_term),
-                VaultItem.url.ilike(search_term),
-                VaultItem.notes.ilike(search_term)
-            )
-        )
+        query, rank = _apply_search(query, search, dialect, ranked=sort == RELEVANCE)
         
     if url_filter:
         url_filter_term = f"%{url_filter}%"
-        query = query.filter(VaultItem.url.ilike(url_filter_term))
-        
-    return query.offset(skip).limit(limit).all()
+        query = query.where(VaultItem.url.ilike(url_filter_term))
 
-def create_vault_item(db: Session, item: VaultItemCreate, owner_id: int) -> VaultItem:
-    """Crea un nuevo item en la bóveda."""
-    encrypted_password = encrypt_data(item.password)
-    
+    if domain:
+        query = query.where(domain_condition(owner_id, domain))
+
+    if sort == RELEVANCE:
+        # El rank cambia con cada escritura, así que aquí se pagina por posición
+        if rank is not None:
+            query = query.order_by(rank, VaultItem.id)
+        else:
+            query = query.order_by(VaultItem.id)
+        offset = after[0] if after else skip
+    else:
+        columns = SORT_KEYS[sort]
+        if after is not None:
+            query = query.where(_after_key(columns, after))
+        query = query.order_by(*columns)
+        offset = skip
+
+    if offset:
+        query = query.offset(offset)
+    return query.limit(limit)
+
+def vault_items_export_query(owner_id: int) -> Select:
+    """Statement with the columns of the export, streamed in `yield_per` partitions."""
+    return (
+        select(
+            VaultItem.id,
+            VaultItem.url,
+            VaultItem.username,
+            VaultItem.encrypted_password,
+            VaultItem.notes,
+        )
+        .where(VaultItem.owner_id == owner_id, VaultItem.deleted_at.is_(None))
+        .order_by(VaultItem.id)
+        .execution_options(yield_per=EXPORT_PARTITION_SIZE)
+    )
+
+def domain_condition(owner_id: int, domain: str):
+    """
+    Items whose host is `domain`, one of its subdomains, or one of its parents
+    down to the registrable domain. For `accounts.example.com` this matches
+    items saved for accounts.example.com, login.accounts.example.com and
+    example.com, but not mail.example.com.
+    Both parts are lookups on the (owner_id, reversed_host) index; they are
+    combined with UNION ALL because SQLite does not use the index for an OR of them.
+    """
+    host = normalize_host(domain)
+    if host is None:
+        return VaultItem.id.is_(None)
+    reversed_host = reverse_host(host)
+    same_or_parent = select(VaultItem.id).where(
+        VaultItem.owner_id == owner_id,
+        VaultItem.reversed_host.in_([reverse_host(parent) for parent in parent_hosts(host)]),
+    )
+    # Subdominios: todos empiezan por "<host invertido>." ("/" es el carácter siguiente a ".")
+    subdomains = select(VaultItem.id).where(
+        VaultItem.owner_id == owner_id,
+        VaultItem.reversed_host > f"{reversed_host}.",
+        VaultItem.reversed_host < f"{reversed_host}/",
+    )
+    return VaultItem.id.in_(union_all(same_or_parent, subdomains))
+
+def _apply_search(query: Select, search: str, dialect: str, ranked: bool = False):
+    """
+    Adds the free-text search to `query`.
+    Returns the query and the rank expression to order by (None when not `ranked`
+    or when the backend has no full-text index).
+    """
+    if dialect == "sqlite":
+        match = fulltext.fts5_match_query(search)
+        if match is not None:
+            fts = fulltext.vault_items_fts
+            condition = fts.c[fulltext.FTS_TABLE].op("MATCH")(match)
+            if not ranked:
+                # El MATCH se resuelve una sola vez; con un JOIN SQLite puede
+                # acabar lanzando una búsqueda FTS por cada fila del usuario.
+                return query.where(VaultItem.id.in_(select(fts.c.rowid).where(condition))), None
+            # `rowid + 0` impide usar el rowid de la tabla FTS como índice del JOIN,
+            # así que SQLite recorre primero los resultados del MATCH.
+            query = query.join(fts, fts.c.rowid + 0 == VaultItem.id).where(condition)
+            return query, fts.c.rank
+    elif dialect == "postgresql":
+        ts_query = fulltext.tsquery(search)
+        if ts_query is not None:
+            vector = fulltext.postgres_search_vector(VaultItem)
+            condition = func.to_tsquery(literal_column("'simple'"), ts_query)
+            query = query.where(vector.op("@@")(condition))
+            return query, func.ts_rank(vector, condition).desc() if ranked else None
+
+    # Sin índice full-text: búsqueda por subcadena
+    search_term = f"%{search}%"
+    query = query.where(
+        or_(
+            VaultItem.username.ilike(search_term),
+            VaultItem.url.ilike(search_term),
+            VaultItem.notes.ilike(search_term)
+        )
+    )
+    return query, None
+
+def _after_key(columns: tuple, values: tuple[Any, ...]):
+    """(c1, c2) > (v1, v2) written without row values, so that any backend can use the index."""
+    column, value = columns[0], values[0]
+    if len(columns) == 1:
+        return column > value
+    return or_(column > value, and_(column == value, _after_key(columns[1:], values[1:])))
+
+def next_page_key(
+    items: Sequence[Any], sort: str, after: tuple[Any, ...] | None = None, skip: int = 0
+) -> tuple[Any, ...]:
+    """Sort key of the page that follows `items`, used to build the next cursor."""
+    if sort == RELEVANCE:
+        start = after[0] if after else skip
+        return (start + len(items),)
+    return tuple(getattr(items[-1], column.key) for column in SORT_KEYS[sort])
+
+def vault_item_values(item: VaultItemCreate, owner_id: int, encrypted_password: bytes) -> dict:
+    """Column values of a new vault item, ready for `VaultItem(**values)` or a bulk insert."""
     item_data = item.model_dump(exclude={"password"})
     
     # Convertimos la URL a string si existe.
     if item_data.get("url"):
         item_data["url"] = str(item_data["url"])
+    item_data.update(url_host_fields(item_data.get("url")))
+
+    return {
+        **item_data,
+        "encrypted_password": encrypted_password,
+        "owner_id": owner_id,
+    }
+
+def vault_item_update_values(item_in: VaultItemUpdate, keyring: CipherKeyring | None) -> dict:
+    """Column values for the fields set in `item_in`, re-encrypting the password if given."""
+    update_data = item_in.model_dump(exclude_unset=True)
+    password = update_data.pop("password", None)
+    if password:
+        update_data["encrypted_password"] = encrypt_data(password, keyring)
+
+    if "url" in update_data:
+        if update_data["url"] is not None:
+            update_data["url"] = str(update_data["url"])
+        update_data.update(url_host_fields(update_data["url"]))
+    return update_data
+
+def change_values(seq: int) -> dict:
+    """Change seq (see `bump_vault_version`) and time stamped on every write of an item."""
+    return {"seq": seq, "updated_at": datetime.now(timezone.utc)}
+
+def tombstone_values() -> dict:
+    """
+    Soft-delete of an item: only the id, owner and change fields are kept, so
+    that /vault/changes can report the deletion until the tombstone is compacted.
+    """
+    return {
+        "deleted_at": datetime.now(timezone.utc),
+        "username": "",
+        "url": "",
+        "encrypted_password": b"",
+        "notes": None,
+        "icon": None,
+        **url_host_fields(None),
+    }
+
+# Escrituras en una sola sentencia: INSERT/UPDATE ... RETURNING, sin SELECT
+# previo ni refresh posterior. Los UPDATE van acotados al dueño y a items vivos.
+
+def insert_vault_item(values: dict) -> Insert:
+    return insert(VaultItem).values(values).returning(VaultItem)
+
+def update_live_vault_item(item_id: int, owner_id: int, values: dict) -> Update:
+    return (
+        update(VaultItem)
+        .where(VaultItem.id == item_id, VaultItem.owner_id == owner_id, VaultItem.deleted_at.is_(None))
+        .values(values)
+        .execution_options(synchronize_session=False)
+    )
+
+def delete_live_vault_item(item_id: int, owner_id: int, seq: int, deleted_at: datetime) -> Update:
+    """
+    First step of a delete: marks the item as deleted and returns it as it was.
+    `blank_vault_item` then empties its fields, which RETURNING cannot report
+    from before the change.
+    """
+    return (
+        update_live_vault_item(item_id, owner_id, {"deleted_at": deleted_at, **change_values(seq)})
+        .returning(VaultItem)
+    )
+
+def blank_vault_item(item_id: int, values: dict) -> Update:
+    return (
+        update(VaultItem)
+        .where(VaultItem.id == item_id)
+        .values(values)
+        .execution_options(synchronize_session=False)
+    )
+
+# --- CRUD sync ---
+
+def get_vault_item(db: Session, item_id: int, owner_id: int) -> VaultItem | None:
+    """Retrieves an item from the vault by its ID, ensuring that it belongs to the owner_id."""
+    return db.scalars(vault_item_query(item_id, owner_id)).first()
 
-    db_item = VaultItem(
-        **item_data, 
-        encrypted_password=encrypted_password, 
-        owner_id=owner_id
+def get_vault_items_by_owner(
+    db: Session, 
+    owner_id: int, 
+    skip: int = 0, 
+    limit: int = 100,
+    search: str | None = None,
+    url_filter: str | None = None,
+    sort: str = "id",
+    after: tuple[Any, ...] | None = None,
+    domain: str | None = None
+) -> List[VaultItem]:
+    """
+    Get a list of vault items for a specific user,
+    with search, filter and keyset pagination options.
+    """
+    query = vault_items_by_owner_query(
+        owner_id, skip=skip, limit=limit, search=search, url_filter=url_filter,
+        sort=sort, after=after, dialect=db.get_bind().dialect.name, domain=domain
     )
-    db.add(db_item)
+    return list(db.scalars(query).all())
+
+def create_vault_item(db: Session, item: VaultItemCreate, owner_id: int) -> VaultItem:
+    """Crea un nuevo item en la bóveda."""
+    keyring = crud_user.get_data_keyring(db, owner_id)
+    values = vault_item_values(item, owner_id, encrypt_data(item.password, keyring))
+    seq = db.scalar(bump_vault_version(owner_id))
+    db_item = db.scalar(insert_vault_item({**values, **change_values(seq)}))
     db.commit()
-    db.refresh(db_item)
+    publish_vault_change(owner_id, seq)
     return db_item
 
 
 def update_vault_item(
-    db: Session, db_item: VaultItem, item_in: VaultItemUpdate
-) -> VaultItem:
+    db: Session, item_id: int, owner_id: int, item_in: VaultItemUpdate
+) -> VaultItem | None:
     """
-    Update an item in the vault.
+    Update an item in the vault. Returns None if the owner has no such item.
     """
-    update_data = item_in.model_dump(exclude_unset=True)
-
-    if "password" in update_data and update_data["password"]:
-        new_encrypted_password = encrypt_data(update_data["password"])
-        db_item.encrypted_password = new_encrypted_password
-        del update_data["password"]
-    else:
-        print("A new password has not been provided.")
-
-    for field, value in update_data.items():
-        if field == "url" and value is not None:
-            value = str(value)
-        setattr(db_item, field, value)
-        
-    try:
-        db.add(db_item)
-        db.commit()
-        db.refresh(db_item)
-    except Exception as e:
+    keyring = crud_user.get_data_keyring(db, owner_id) if item_in.password else None
+    values = vault_item_update_values(item_in, keyring)
+    seq = db.scalar(bump_vault_version(owner_id))
+    db_item = db.scalar(
+        update_live_vault_item(item_id, owner_id, {**values, **change_values(seq)}).returning(VaultItem)
+    )
+    if db_item is None:
         db.rollback()
-        raise e
-    
+        return None
+    db.commit()
+    publish_vault_change(owner_id, seq)
     return db_item
 
-def remove_vault_item(db: Session, item_id: int) -> VaultItem | None:
+def remove_vault_item(db: Session, item_id: int, owner_id: int) -> VaultItem | None:
     """
-    Remove an item from the vault.
+    Remove an item from the vault, leaving a tombstone for the delta sync.
+    Returns the item as it was before the delete, or None if the owner has no such item.
     """
-    db_item = db.query(VaultItem).filter(VaultItem.id == item_id).first()
-    if db_item:
-        db.delete(db_item)
-        db.commit()
-    return db_item    
\ No newline at end of file
+    seq = db.scalar(bump_vault_version(owner_id))
+    values = tombstone_values()
+    db_item = db.scalar(delete_live_vault_item(item_id, owner_id, seq, values["deleted_at"]))
+    if db_item is None:
+        db.rollback()
+        return None
+    db.execute(blank_vault_item(item_id, values))
+    # Fuera de la sesión conserva los valores de antes del borrado
+    db.expunge(db_item)
+    db.commit()
+    publish_vault_change(owner_id, seq)
+    return db_item
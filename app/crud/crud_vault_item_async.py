@@ -0,0 +1,235 @@
+from datetime import datetime, timezone
+from functools import partial
+from typing import Any, AsyncIterator, Iterable, List, Sequence
+from pydantic import ValidationError
+from sqlalchemy import Row, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.vault_item import VaultItem
+from app.schemas.vault_item import VaultImportError, VaultImportResult, VaultItemCreate, VaultItemUpdate
+from app.core import crypto_pool
+from app.core.events import publish_vault_change
+from app.core.config import settings
+from app.core.security import encrypt_data
+from app.crud import crud_user_async
+from app.crud.crud_vault_item import (
+    DEFAULT_LIST_FIELDS,
+    blank_vault_item,
+    bump_vault_version,
+    change_values,
+    delete_live_vault_item,
+    insert_vault_item,
+    list_columns,
+    tombstone_values,
+    update_live_vault_item,
+    vault_item_changes_query,
+    vault_item_query,
+    vault_item_update_values,
+    vault_item_values,
+    vault_items_by_ids_query,
+    vault_items_by_owner_query,
+    vault_items_export_query,
+)
+
+# Versión async de crud_vault_item, usada por los endpoints.
+# Las consultas y la construcción de objetos se comparten con el módulo sync.
+
+async def get_vault_item(
+    db: AsyncSession, item_id: int, owner_id: int, fields: Sequence[str] | None = None
+) -> VaultItem | None:
+    """
+    Retrieves an item from the vault by its ID, ensuring that it belongs to the owner_id.
+    With `fields`, only those columns are loaded (see `vault_item_query`).
+    """
+    return (await db.scalars(vault_item_query(item_id, owner_id, fields))).first()
+
+async def get_vault_items_by_ids(
+    db: AsyncSession, item_ids: List[int], owner_id: int
+) -> List[VaultItem]:
+    """Retrieves several items of the owner_id with a single query. Unknown ids are skipped."""
+    return list((await db.scalars(vault_items_by_ids_query(item_ids, owner_id))).all())
+
+async def get_vault_items_by_owner(
+    db: AsyncSession,
+    owner_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    search: str | None = None,
+    url_filter: str | None = None,
+    sort: str = "id",
+    after: tuple[Any, ...] | None = None,
+    domain: str | None = None
+) -> List[VaultItem]:
+    """
+    Get a list of vault items for a specific user,
+    with search, filter and keyset pagination options.
+    """
+    query = vault_items_by_owner_query(
+        owner_id, skip=skip, limit=limit, search=search, url_filter=url_filter,
+        sort=sort, after=after, dialect=db.bind.dialect.name, domain=domain
+    )
+    return list((await db.scalars(query)).all())
+
+async def get_vault_item_rows_by_owner(
+    db: AsyncSession,
+    owner_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    search: str | None = None,
+    url_filter: str | None = None,
+    sort: str = "id",
+    after: tuple[Any, ...] | None = None,
+    domain: str | None = None,
+    fields: Sequence[str] = DEFAULT_LIST_FIELDS
+) -> Sequence[Row]:
+    """
+    Same listing as `get_vault_items_by_owner`, but returns Core rows with only
+    the columns of `fields` (and the sort key): no ORM objects are built and
+    the other columns are never read.
+    """
+    query = vault_items_by_owner_query(
+        owner_id, skip=skip, limit=limit, search=search, url_filter=url_filter,
+        sort=sort, after=after, dialect=db.bind.dialect.name, domain=domain,
+        columns=list_columns(fields, sort)
+    )
+    return (await db.execute(query)).all()
+
+async def get_vault_item_changes(
+    db: AsyncSession, owner_id: int, since: int, limit: int
+) -> Sequence[Row]:
+    """Items and tombstones of the owner changed after the `since` seq, in seq order."""
+    return (await db.execute(vault_item_changes_query(owner_id, since, limit))).all()
+
+async def stream_vault_items_for_export(
+    db: AsyncSession, owner_id: int
+) -> AsyncIterator[Sequence[Row]]:
+    """
+    Yields the items of an owner in partitions, reading them with a server-side
+    cursor instead of loading the whole vault in memory.
+    """
+    result = await db.stream(vault_items_export_query(owner_id))
+    async for partition in result.partitions():
+        yield partition
+
+async def create_vault_item(db: AsyncSession, item: VaultItemCreate, owner_id: int) -> VaultItem:
+    """Crea un nuevo item en la bóveda."""
+    keyring = await crud_user_async.get_data_keyring(db, owner_id)
+    values = vault_item_values(item, owner_id, encrypt_data(item.password, keyring))
+    seq = await db.scalar(bump_vault_version(owner_id))
+    db_item = await db.scalar(insert_vault_item({**values, **change_values(seq)}))
+    await db.commit()
+    publish_vault_change(owner_id, seq)
+    return db_item
+
+async def update_vault_item(
+    db: AsyncSession, item_id: int, owner_id: int, item_in: VaultItemUpdate
+) -> VaultItem | None:
+    """
+    Update an item in the vault: the version bump and one UPDATE ... RETURNING.
+    Returns None (and bumps nothing) if the owner has no such item.
+    """
+    keyring = await crud_user_async.get_data_keyring(db, owner_id) if item_in.password else None
+    values = vault_item_update_values(item_in, keyring)
+    seq = await db.scalar(bump_vault_version(owner_id))
+    db_item = await db.scalar(
+        update_live_vault_item(item_id, owner_id, {**values, **change_values(seq)}).returning(VaultItem)
+    )
+    if db_item is None:
+        await db.rollback()
+        return None
+    await db.commit()
+    publish_vault_change(owner_id, seq)
+    return db_item
+
+async def remove_vault_item(db: AsyncSession, item_id: int, owner_id: int) -> VaultItem | None:
+    """
+    Remove an item from the vault, leaving a tombstone for the delta sync.
+    Returns the item as it was before the delete, or None (and bumps nothing)
+    if the owner has no such item.
+    """
+    seq = await db.scalar(bump_vault_version(owner_id))
+    values = tombstone_values()
+    db_item = await db.scalar(delete_live_vault_item(item_id, owner_id, seq, values["deleted_at"]))
+    if db_item is None:
+        await db.rollback()
+        return None
+    await db.execute(blank_vault_item(item_id, values))
+    # Fuera de la sesión conserva los valores de antes del borrado
+    db.expunge(db_item)
+    await db.commit()
+    publish_vault_change(owner_id, seq)
+    return db_item
+
+
+async def import_vault_items(
+    db: AsyncSession,
+    owner_id: int,
+    rows: Iterable[tuple[int, dict]],
+    batch_size: int | None = None
+) -> VaultImportResult:
+    """
+    Bulk import of vault items in a single transaction.
+    Rows are validated one by one (invalid rows are reported, not fatal),
+    passwords are encrypted in parallel chunks and each batch is written
+    with one executemany INSERT.
+    """
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    imported = 0
+    last_seq = 0
+    errors: List[VaultImportError] = []
+    batch: List[VaultItemCreate] = []
+    keyring = await crud_user_async.get_data_keyring(db, owner_id)
+    encrypt = partial(encrypt_data, keyring=keyring)
+
+    async def flush():
+        nonlocal imported, last_seq
+        encrypted = await crypto_pool.map_in_chunks(
+            encrypt, [item.password for item in batch], settings.CRYPTO_CHUNK_SIZE
+        )
+        values = [
+            vault_item_values(item, owner_id, encrypted_password)
+            for item, encrypted_password in zip(batch, encrypted)
+        ]
+        # Una versión por item: el lote ocupa los seq (last - n, last]
+        last_seq = await db.scalar(bump_vault_version(owner_id, len(values)))
+        updated_at = datetime.now(timezone.utc)
+        for offset, item_values in enumerate(values, start=last_seq - len(values) + 1):
+            item_values.update(seq=offset, updated_at=updated_at)
+        await db.execute(insert(VaultItem), values)
+        imported += len(values)
+        batch.clear()
+
+    try:
+        for row_number, fields in rows:
+            error = _import_row_error(fields)
+            if error is None:
+                try:
+                    batch.append(VaultItemCreate(**fields))
+                except ValidationError as e:
+                    first = e.errors()[0]
+                    error = f"{'.'.join(str(part) for part in first['loc'])}: {first['msg']}"
+            if error is not None:
+                errors.append(VaultImportError(row=row_number, error=error))
+            if len(batch) >= batch_size:
+                await flush()
+        if batch:
+            await flush()
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    if imported:
+        publish_vault_change(owner_id, last_seq)
+
+    return VaultImportResult(imported=imported, errors=errors)
+
+def _import_row_error(fields: dict) -> str | None:
+    if "__error__" in fields:
+        return fields["__error__"]
+    for required in ("url", "password"):
+        if not fields.get(required):
+            return f"{required}: Field required"
+    # La columna username no admite NULL: los exports sin usuario se guardan vacíos
+    if fields.get("username") is None:
+        fields["username"] = ""
+    return None
@@ -0,0 +1,120 @@
+"""
+Full-text index over the searchable columns of `vault_items`.
+
+- SQLite: an FTS5 external-content table (`vault_items_fts`) kept in sync with
+  triggers, so every write to `vault_items` also updates the index.
+- PostgreSQL: a GIN index over a `tsvector` expression of the same columns.
+- Other backends keep the plain ILIKE search.
+"""
+import re
+
+from sqlalchemy import column, event, func, literal_column, table, text
+from sqlalchemy.engine import Connection
+
+FTS_TABLE = "vault_items_fts"
+
+vault_items_fts = table(FTS_TABLE, column("rowid"), column("rank"), column(FTS_TABLE))
+
+_SQLITE_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        username, url, notes,
+        content='vault_items', content_rowid='id', tokenize='unicode61'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON vault_items BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, username, url, notes)
+        VALUES (new.id, new.username, new.url, new.notes);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON vault_items BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, username, url, notes)
+        VALUES ('delete', old.id, old.username, old.url, old.notes);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF username, url, notes ON vault_items BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, username, url, notes)
+        VALUES ('delete', old.id, old.username, old.url, old.notes);
+        INSERT INTO {FTS_TABLE}(rowid, username, url, notes)
+        VALUES (new.id, new.username, new.url, new.notes);
+    END
+    """,
+]
+
+# concat_ws es STABLE y Postgres solo admite funciones IMMUTABLE en un índice:
+# se concatena con coalesce y ||, igual que en postgres_search_vector
+_POSTGRES_DDL = [
+    """
+    CREATE INDEX IF NOT EXISTS ix_vault_items_search ON vault_items
+    USING GIN (to_tsvector('simple', coalesce(username, '') || ' ' || coalesce(url, '') || ' ' || coalesce(notes, '')))
+    """,
+]
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def search_terms(search: str) -> list[str]:
+    """Words of a free-text search, lowercased."""
+    return [token.lower() for token in _TOKEN_RE.findall(search)]
+
+
+def fts5_match_query(search: str) -> str | None:
+    """Prefix query for FTS5 ("foo"* "bar"*), or None if the search has no words."""
+    terms = search_terms(search)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def tsquery(search: str) -> str | None:
+    """Prefix query for PostgreSQL (foo:* & bar:*), or None if the search has no words."""
+    terms = search_terms(search)
+    if not terms:
+        return None
+    return " & ".join(f"{term}:*" for term in terms)
+
+
+def postgres_search_vector(vault_item):
+    """The expression of the GIN index; it must match it exactly (literals, not bound parameters) to use it."""
+    empty, space = literal_column("''"), literal_column("' '")
+    document = func.coalesce(vault_item.username, empty)
+    for field in (vault_item.url, vault_item.notes):
+        document = document.op("||")(space).op("||")(func.coalesce(field, empty))
+    return func.to_tsvector(literal_column("'simple'"), document)
+
+
+def ensure_fulltext_index(connection: Connection) -> None:
+    """Create the full-text index if it is missing, indexing the existing rows."""
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": FTS_TABLE},
+        ).first()
+        for statement in _SQLITE_DDL:
+            connection.execute(text(statement))
+        if not exists:
+            connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    elif dialect == "postgresql":
+        for statement in _POSTGRES_DDL:
+            connection.execute(text(statement))
+
+
+def drop_fulltext_index(connection: Connection) -> None:
+    if connection.dialect.name == "sqlite":
+        connection.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+
+
+def register(vault_items_table) -> None:
+    """Create/drop the full-text index together with the `vault_items` table."""
+    event.listen(
+        vault_items_table, "after_create",
+        lambda target, connection, **kw: ensure_fulltext_index(connection),
+    )
+    event.listen(
+        vault_items_table, "before_drop",
+        lambda target, connection, **kw: drop_fulltext_index(connection),
+    )
@@ -1,14 +1,58 @@
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+from sqlalchemy.exc import DBAPIError
+
+from app.core.config import settings
 from app.db.session import engine
 from app.db.base_class import Base
+from app.db.migrations import schema_fingerprint, upgrade
+from app.models import email_outbox, job_checkpoint, schema_version, user, vault_item  # noqa: F401  (registra los modelos en Base.metadata)
+from app.models.schema_version import SchemaVersion
+
+def get_stored_schema_version() -> str | None:
+    """The schema fingerprint stored by the last upgrade, or None (e.g. a new database)."""
+    try:
+        with engine.connect() as connection:
+            return connection.scalar(select(SchemaVersion.version).where(SchemaVersion.id == 1))
+    except DBAPIError:
+        # La tabla schema_version todavía no existe
+        return None
 
-def create_db_and_tables():
+def create_db_and_tables(mode: str | None = None) -> bool:
     """
-    Create the tables in DB if they do not exist.
+    Create the tables in DB if they do not exist,
+    and upgrade the existing ones to the current models.
+
+    :param mode: "check" (SCHEMA_STARTUP_MODE by default) only does it when the
+        stored schema fingerprint differs from the models'; "migrate" always
+        does it; "skip" does nothing.
+    :return: Whether the schema was created or upgraded.
     """
+    mode = mode or settings.SCHEMA_STARTUP_MODE
+    if mode not in ("check", "migrate", "skip"):
+        raise ValueError(f"Unknown schema startup mode: {mode}")
+    if mode == "skip":
+        return False
+
+    started = time.perf_counter()
+    fingerprint = schema_fingerprint()
+    if mode == "check" and get_stored_schema_version() == fingerprint:
+        print(f"Database schema {fingerprint} is up to date ({(time.perf_counter() - started) * 1000:.1f} ms)")
+        return False
+
     print("Attempting to create database tables...")
     Base.metadata.create_all(bind=engine)
-    print("Database tables creation complete.")
+    with engine.begin() as connection:
+        upgrade(connection)
+        # La versión se guarda en la misma transacción que el upgrade
+        values = {"version": fingerprint, "updated_at": datetime.now(timezone.utc)}
+        if connection.execute(SchemaVersion.__table__.update().values(values)).rowcount == 0:
+            connection.execute(SchemaVersion.__table__.insert().values(id=1, **values))
+    print(f"Database tables creation complete ({(time.perf_counter() - started) * 1000:.1f} ms).")
+    return True
 
 
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    create_db_and_tables("migrate")
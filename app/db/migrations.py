@@ -0,0 +1,205 @@
+"""
+Lightweight schema upgrades for existing databases.
+
+`Base.metadata.create_all` only creates missing tables, so columns and
+indexes added to existing models are created here, followed by the data
+backfills that fill the new columns for rows written before them.
+It runs from `create_db_and_tables` (`python -m app.db.init_db`).
+
+`schema_fingerprint` identifies the models and the upgrade steps, so boots
+on an already upgraded database can skip all of this (see init_db).
+"""
+import hashlib
+from collections import defaultdict
+
+from sqlalchemy import LargeBinary, bindparam, inspect, select, text, update
+from sqlalchemy.engine import Connection
+
+from app.core.security import new_wrapped_data_key
+from app.core.urls import url_host_fields
+from app.crud.crud_vault_item import bump_vault_version
+from app.db.base_class import Base
+from app.db.fulltext import ensure_fulltext_index
+from app.db.types import Ciphertext
+from app.models.user import User
+from app.models.vault_item import VaultItem
+
+
+def add_missing_columns(connection: Connection) -> list[str]:
+    """ALTER TABLE ... ADD COLUMN for every model column missing in the database."""
+    inspector = inspect(connection)
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=connection.dialect)}"
+            if column.server_default is not None:
+                ddl += f" DEFAULT {column.server_default.arg}"
+            connection.execute(text(ddl))
+            added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def convert_ciphertext_columns(connection: Connection) -> list[str]:
+    """
+    Turn the text columns that now hold binary ciphertexts into binary columns.
+
+    SQLite stores the bytes in the old column as they are; PostgreSQL needs the
+    type change, keeping the legacy Fernet tokens as their UTF-8 bytes.
+    """
+    if connection.dialect.name != "postgresql":
+        return []
+    inspector = inspect(connection)
+    converted = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"]: column["type"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if not isinstance(column.type, Ciphertext) or column.name not in existing:
+                continue
+            if isinstance(existing[column.name], LargeBinary):
+                continue
+            connection.execute(text(
+                f"ALTER TABLE {table.name} ALTER COLUMN {column.name} TYPE BYTEA "
+                f"USING convert_to({column.name}, 'UTF8')"
+            ))
+            converted.append(f"{table.name}.{column.name}")
+    return converted
+
+
+def create_missing_indexes(connection: Connection) -> None:
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        # Las tablas nuevas (con sus índices) las crea create_all
+        if not inspector.has_table(table.name):
+            continue
+        for index in table.indexes:
+            index.create(bind=connection, checkfirst=True)
+
+
+def update_by_id(connection: Connection, model, rows: list[dict]) -> None:
+    """
+    executemany UPDATE of `rows` (dicts with the "id" and the new values) by primary key.
+    On a Connection, `update(Model)` with a list of dicts has no WHERE clause.
+    """
+    table = model.__table__
+    columns = [key for key in rows[0] if key != "id"]
+    statement = (
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values({column: bindparam(f"b_{column}") for column in columns})
+    )
+    connection.execute(
+        statement, [{"b_id": row["id"], **{f"b_{column}": row[column] for column in columns}} for row in rows]
+    )
+
+
+def backfill_url_hosts(connection: Connection, batch_size: int = 1000) -> int:
+    """Fill the normalized host columns of vault items written before they existed."""
+    updated = 0
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            select(VaultItem.id, VaultItem.url)
+            .where(VaultItem.id > last_id, VaultItem.host.is_(None), VaultItem.url.is_not(None))
+            .order_by(VaultItem.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return updated
+        update_by_id(connection, VaultItem, [{"id": row.id, **url_host_fields(row.url)} for row in rows])
+        updated += len(rows)
+        last_id = rows[-1].id
+
+
+def backfill_data_keys(connection: Connection, batch_size: int = 1000) -> int:
+    """
+    Give a wrapped data key to the users created before the per-user keys.
+    Their existing secrets stay readable with the master key until the
+    key rotation job moves them to the data key.
+    """
+    updated = 0
+    while True:
+        ids = connection.scalars(
+            select(User.id).where(User.encrypted_data_key.is_(None)).order_by(User.id).limit(batch_size)
+        ).all()
+        if not ids:
+            return updated
+        update_by_id(
+            connection, User, [{"id": user_id, "encrypted_data_key": new_wrapped_data_key()} for user_id in ids]
+        )
+        updated += len(ids)
+
+
+def backfill_vault_item_seq(connection: Connection, batch_size: int = 1000) -> int:
+    """
+    Give a change seq to the vault items written before the delta sync, taking
+    new versions of their owner's vault so that every seq stays unique.
+    """
+    updated = 0
+    while True:
+        rows = connection.execute(
+            select(VaultItem.id, VaultItem.owner_id)
+            .where(VaultItem.seq.is_(None), VaultItem.owner_id.is_not(None))
+            .order_by(VaultItem.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return updated
+        by_owner = defaultdict(list)
+        for row in rows:
+            by_owner[row.owner_id].append(row.id)
+        changes = []
+        for owner_id, ids in by_owner.items():
+            last_seq = connection.scalar(bump_vault_version(owner_id, len(ids)))
+            changes += [
+                {"id": item_id, "seq": seq}
+                for seq, item_id in enumerate(ids, start=last_seq - len(ids) + 1)
+            ]
+        update_by_id(connection, VaultItem, changes)
+        updated += len(rows)
+
+
+BACKFILLS = [backfill_url_hosts, backfill_data_keys, backfill_vault_item_seq]
+
+# Subir cuando cambie upgrade() sin que cambien los modelos (p. ej. el índice full-text)
+UPGRADE_REVISION = 1
+
+
+def schema_fingerprint() -> str:
+    """
+    Hash of the tables, columns and indexes of the models and of the upgrade
+    steps. It is computed from the metadata alone, without touching the database.
+    """
+    parts = [f"revision {UPGRADE_REVISION}", *(backfill.__name__ for backfill in BACKFILLS)]
+    for table in Base.metadata.sorted_tables:
+        parts.append(f"table {table.name}")
+        for column in table.columns:
+            default = column.server_default.arg if column.server_default is not None else None
+            parts.append(
+                f"column {column.name} {column.type!r} nullable={column.nullable} "
+                f"pk={column.primary_key} default={default}"
+            )
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            parts.append(f"index {index.name} {[column.name for column in index.columns]} unique={index.unique}")
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()[:16]
+
+
+def upgrade(connection: Connection) -> None:
+    """Bring an existing database up to the current models."""
+    for column in add_missing_columns(connection):
+        print(f"Added column {column}")
+    for column in convert_ciphertext_columns(connection):
+        print(f"Converted column {column} to binary")
+    create_missing_indexes(connection)
+    ensure_fulltext_index(connection)
+    for backfill in BACKFILLS:
+        count = backfill(connection)
+        if count:
+            print(f"{backfill.__name__}: {count} rows updated")
+
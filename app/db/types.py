@@ -0,0 +1,23 @@
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+
+
+class Ciphertext(TypeDecorator):
+    """
+    Binary column for encrypted values (see app.core.ciphers).
+
+    Rows written before the binary format hold Fernet tokens as text; they
+    are read back as bytes too, so callers always get `bytes`.
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if isinstance(value, str):
+            return value.encode("utf-8")
+        return value
+
+    def process_result_value(self, value, dialect):
+        if isinstance(value, str):
+            return value.encode("utf-8")
+        return value
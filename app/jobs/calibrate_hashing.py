@@ -0,0 +1,79 @@
+"""
+Calibration of the bcrypt cost for the machine the API runs on.
+
+Measures the hashing time of each cost (rounds) on this machine and
+recommends the highest one that fits `PASSWORD_HASH_BUDGET_MS`. Each extra
+round doubles both the work of an attacker and the CPU of every login, so
+the table also shows the logins per second the hashing pool can sustain.
+Set the chosen value as `BCRYPT_ROUNDS`; existing hashes are upgraded as
+their users log in.
+
+    python -m app.jobs.calibrate_hashing
+    python -m app.jobs.calibrate_hashing --budget-ms 100 --samples 5
+"""
+import argparse
+import statistics
+import time
+
+from passlib.hash import bcrypt
+
+from app.core.config import settings
+
+# Por debajo de 10 rondas bcrypt ya no se considera seguro
+MIN_ROUNDS = 10
+MAX_ROUNDS = 16
+
+
+def measure_rounds(rounds: int, samples: int = 3) -> float:
+    """Median time, in milliseconds, of hashing a password with `rounds`."""
+    handler = bcrypt.using(rounds=rounds)
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        handler.hash("calibration-password")
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate(
+    budget_ms: float, samples: int = 3, min_rounds: int = MIN_ROUNDS, max_rounds: int = MAX_ROUNDS
+) -> tuple[int, dict[int, float]]:
+    """
+    Measure the costs from `min_rounds` up, stopping once one goes over the budget.
+
+    :param budget_ms: Maximum time of one hash, in milliseconds.
+    :param samples: Hashes measured per cost.
+    :param min_rounds: Lowest cost considered (recommended even if it is over the budget).
+    :param max_rounds: Highest cost considered.
+    :return: The recommended rounds and the time measured for each cost.
+    """
+    timings: dict[int, float] = {}
+    recommended = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        timings[rounds] = measure_rounds(rounds, samples)
+        if timings[rounds] > budget_ms:
+            break
+        recommended = rounds
+    return recommended, timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pick the bcrypt cost that fits a latency budget on this machine.")
+    parser.add_argument("--budget-ms", type=float, default=settings.PASSWORD_HASH_BUDGET_MS)
+    parser.add_argument("--samples", type=int, default=3, help="hashes measured per cost")
+    parser.add_argument("--min-rounds", type=int, default=MIN_ROUNDS)
+    parser.add_argument("--max-rounds", type=int, default=MAX_ROUNDS)
+    args = parser.parse_args()
+
+    recommended, timings = calibrate(args.budget_ms, args.samples, args.min_rounds, args.max_rounds)
+    workers = settings.HASHING_POOL_WORKERS
+    print(f"{'rounds':>6} {'ms/hash':>9} {f'logins/s ({workers} workers)':>24}")
+    for rounds, ms in timings.items():
+        marker = "  <- recommended" if rounds == recommended else ""
+        current = "  (current)" if rounds == settings.BCRYPT_ROUNDS else ""
+        print(f"{rounds:>6} {ms:>9.1f} {workers * 1000 / ms:>24.1f}{marker}{current}")
+    print(f"\nBCRYPT_ROUNDS={recommended}  (budget {args.budget_ms:g} ms per hash)")
+
+
+if __name__ == "__main__":
+    main()
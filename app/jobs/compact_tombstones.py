@@ -0,0 +1,83 @@
+"""
+Compaction of the vault item tombstones.
+
+Deleted items stay as tombstones so that `GET /vault/changes` can report the
+deletion to every client. Once they are older than
+`TOMBSTONE_RETENTION_DAYS`, this job deletes them in small chunks and raises
+the owner's `vault_compacted_seq`; a client that asks for changes since an
+older seq gets a 410 and does a full sync.
+
+    python -m app.jobs.compact_tombstones
+    python -m app.jobs.compact_tombstones --retention-days 7
+"""
+import argparse
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from sqlalchemy import case, delete, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.user import User
+from app.models.vault_item import VaultItem
+
+
+def compact_tombstones(
+    session_factory: Callable[[], Session] = SessionLocal,
+    retention_days: int | None = None,
+    chunk_size: int | None = None,
+) -> int:
+    """
+    Delete the tombstones older than the retention, one transaction per chunk.
+
+    :param session_factory: Factory of the sync sessions used by the job.
+    :param retention_days: Days a tombstone is kept (TOMBSTONE_RETENTION_DAYS by default).
+    :param chunk_size: Tombstones per transaction (TOMBSTONE_COMPACTION_CHUNK_SIZE by default).
+    :return: Number of tombstones deleted.
+    """
+    if retention_days is None:
+        retention_days = settings.TOMBSTONE_RETENTION_DAYS
+    chunk_size = chunk_size or settings.TOMBSTONE_COMPACTION_CHUNK_SIZE
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+
+    deleted = 0
+    with session_factory() as db:
+        while True:
+            rows = db.execute(
+                select(VaultItem.id, VaultItem.owner_id, VaultItem.seq)
+                .where(VaultItem.deleted_at.is_not(None), VaultItem.deleted_at < cutoff)
+                .order_by(VaultItem.id)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                return deleted
+            compacted: dict[int, int] = {}
+            for row in rows:
+                if row.owner_id is not None:
+                    compacted[row.owner_id] = max(compacted.get(row.owner_id, 0), row.seq or 0)
+            # El seq compactado solo sube, en la misma transacción que el borrado
+            for owner_id, seq in compacted.items():
+                db.execute(
+                    update(User)
+                    .where(User.id == owner_id)
+                    .values(vault_compacted_seq=case(
+                        (User.vault_compacted_seq < seq, seq), else_=User.vault_compacted_seq
+                    ))
+                )
+            db.execute(delete(VaultItem).where(VaultItem.id.in_([row.id for row in rows])))
+            db.commit()
+            deleted += len(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Delete the vault item tombstones older than the retention.")
+    parser.add_argument("--retention-days", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=None)
+    args = parser.parse_args()
+    count = compact_tombstones(retention_days=args.retention_days, chunk_size=args.chunk_size)
+    print(f"Compacted {count} tombstones")
+
+
+if __name__ == "__main__":
+    main()
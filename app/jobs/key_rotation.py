@@ -0,0 +1,259 @@
+"""
+Online, resumable rotation of the vault encryption key.
+
+Deploy the new key as `ENCRYPTION_KEY` and move the previous one to
+`ENCRYPTION_OLD_KEYS` (or switch `CIPHER_ENGINE`): the API keeps decrypting
+old rows while this job
+
+- re-wraps the per-user data keys with the new master key, which is all a
+  master key change needs for the secrets already under a data key, and
+- moves the remaining `vault_items.encrypted_password` values (written with
+  the master key before the data keys, or with an older engine) to the data
+  key of their owner.
+
+Vault items are processed in small keyset chunks, one transaction per chunk,
+throttled to a target rate so the job does not compete with live traffic.
+Progress is checkpointed in `job_checkpoints`, so a stopped or crashed run
+resumes where it left off.
+
+    python -m app.jobs.key_rotation            # run (or resume) the rotation
+    python -m app.jobs.key_rotation --status   # progress of the current run
+    python -m app.jobs.key_rotation --restart  # start a new pass from the first row
+"""
+import argparse
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable
+
+from sqlalchemy import LargeBinary, bindparam, cast, func, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.security import get_master_keyring, is_encrypted_with_primary_key, rotate_data
+from app.crud import crud_user
+from app.db.session import SessionLocal
+from app.models.job_checkpoint import JobCheckpoint
+from app.models.user import User
+from app.models.vault_item import VaultItem
+
+JOB_NAME = "key_rotation"
+
+# Solo se reescribe la fila si nadie la ha modificado desde que se leyó:
+# una escritura concurrente de la API ya usa la clave principal.
+# El CAST compara como bytes también los tokens Fernet guardados como texto.
+def _guarded_update(column):
+    table = column.table
+    return (
+        update(table)
+        .where(
+            table.c.id == bindparam("b_id"),
+            cast(column, LargeBinary) == bindparam("b_old", type_=LargeBinary),
+        )
+        .values({column.name: bindparam("b_new")})
+    )
+
+_rotate_statement = _guarded_update(VaultItem.__table__.c.encrypted_password)
+_rewrap_statement = _guarded_update(User.__table__.c.encrypted_data_key)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _get_checkpoint(db: Session, restart: bool = False) -> JobCheckpoint:
+    checkpoint = db.get(JobCheckpoint, JOB_NAME)
+    if checkpoint is None:
+        checkpoint = JobCheckpoint(name=JOB_NAME, last_id=0, processed=0, updated=0)
+        db.add(checkpoint)
+    if restart or checkpoint.status in (None, "pending", "done"):
+        checkpoint.last_id = 0
+        checkpoint.processed = 0
+        checkpoint.updated = 0
+        checkpoint.started_at = _now()
+        checkpoint.finished_at = None
+    checkpoint.status = "running"
+    checkpoint.updated_at = _now()
+    db.commit()
+    return checkpoint
+
+
+def rewrap_data_keys(db: Session, chunk_size: int) -> int:
+    """
+    Re-wrap with the primary master key every data key wrapped with an old one.
+
+    :return: Number of data keys re-wrapped.
+    """
+    master = get_master_keyring()
+    rewrapped = 0
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(User.id, User.encrypted_data_key)
+            .where(User.id > last_id, User.encrypted_data_key.is_not(None))
+            .order_by(User.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return rewrapped
+        params = [
+            {"b_id": row.id, "b_old": row.encrypted_data_key, "b_new": master.rotate(row.encrypted_data_key)}
+            for row in rows
+            if not master.is_current(row.encrypted_data_key)
+        ]
+        if params:
+            db.execute(_rewrap_statement, params)
+        db.commit()
+        rewrapped += len(params)
+        last_id = rows[-1].id
+
+
+def rotate_chunk(db: Session, last_id: int, chunk_size: int) -> tuple[int, int, int]:
+    """
+    Re-encrypt the next chunk of vault items after `last_id` with their owner's data key.
+
+    :return: (new last_id, rows read, rows re-encrypted); rows read is 0 at the end.
+    """
+    rows = db.execute(
+        select(VaultItem.id, VaultItem.owner_id, VaultItem.encrypted_password)
+        .where(VaultItem.id > last_id)
+        .order_by(VaultItem.id)
+        .limit(chunk_size)
+    ).all()
+    if not rows:
+        return last_id, 0, 0
+    # Los tombstones (y valores vacíos) no tienen nada que cifrar: sus dueños
+    # no necesitan keyring. Nunca se crean claves aquí, así que un usuario con
+    # la clave destruida no recibe otra; sin clave se usa la maestra.
+    pending = [row for row in rows if row.encrypted_password]
+    keyrings = {
+        owner_id: crud_user.find_data_keyring(db, owner_id) if owner_id is not None else None
+        for owner_id in {row.owner_id for row in pending}
+    }
+    params = [
+        {
+            "b_id": row.id,
+            "b_old": row.encrypted_password,
+            "b_new": rotate_data(row.encrypted_password, keyrings[row.owner_id]),
+        }
+        for row in pending
+        if not is_encrypted_with_primary_key(row.encrypted_password, keyrings[row.owner_id])
+    ]
+    if params:
+        db.execute(_rotate_statement, params)
+    return rows[-1].id, len(rows), len(params)
+
+
+def run_key_rotation(
+    session_factory: Callable[[], Session] = SessionLocal,
+    chunk_size: int | None = None,
+    rows_per_second: int | None = None,
+    restart: bool = False,
+    stop_event: threading.Event | None = None,
+) -> dict:
+    """
+    Re-wrap the data keys, then run (or resume) the re-encryption of the vault
+    items until all of them use their owner's data key.
+
+    :param session_factory: Factory of the sync sessions used by the job.
+    :param chunk_size: Rows per transaction (KEY_ROTATION_CHUNK_SIZE by default).
+    :param rows_per_second: Throttle target, 0 disables it (KEY_ROTATION_ROWS_PER_SECOND by default).
+    :param restart: Start a new pass from the first row instead of resuming.
+    :param stop_event: Set it to stop the job after the current chunk; the next run resumes.
+    :return: The final progress, as returned by `get_rotation_status`, plus
+        the number of `data_keys_rewrapped`.
+    """
+    chunk_size = chunk_size or settings.KEY_ROTATION_CHUNK_SIZE
+    if rows_per_second is None:
+        rows_per_second = settings.KEY_ROTATION_ROWS_PER_SECOND
+
+    with session_factory() as db:
+        rewrapped = rewrap_data_keys(db, chunk_size)
+        checkpoint = _get_checkpoint(db, restart=restart)
+        while True:
+            if stop_event is not None and stop_event.is_set():
+                checkpoint.status = "stopped"
+                checkpoint.updated_at = _now()
+                db.commit()
+                break
+            started = time.perf_counter()
+            last_id, read, rotated = rotate_chunk(db, checkpoint.last_id, chunk_size)
+            # El checkpoint se guarda en la misma transacción que el chunk
+            checkpoint.last_id = last_id
+            checkpoint.processed += read
+            checkpoint.updated += rotated
+            checkpoint.updated_at = _now()
+            if not read:
+                checkpoint.status = "done"
+                checkpoint.finished_at = _now()
+            db.commit()
+            if not read:
+                break
+            if rows_per_second:
+                # Throttling: cada chunk ocupa al menos read / rows_per_second segundos
+                remaining = read / rows_per_second - (time.perf_counter() - started)
+                if remaining > 0:
+                    if stop_event is not None:
+                        stop_event.wait(remaining)
+                    else:
+                        time.sleep(remaining)
+        return {**get_rotation_status(db), "data_keys_rewrapped": rewrapped}
+
+
+def start_key_rotation_thread(**kwargs) -> tuple[threading.Thread, threading.Event]:
+    """Run the rotation in a daemon thread; set the returned event to stop it."""
+    stop_event = threading.Event()
+    thread = threading.Thread(
+        target=run_key_rotation,
+        kwargs={**kwargs, "stop_event": stop_event},
+        name="key-rotation",
+        daemon=True,
+    )
+    thread.start()
+    return thread, stop_event
+
+
+def get_rotation_status(db: Session) -> dict:
+    """Progress of the current (or last) rotation run."""
+    checkpoint = db.get(JobCheckpoint, JOB_NAME)
+    total = db.scalar(select(func.count()).select_from(VaultItem))
+    if checkpoint is None:
+        return {"status": "pending", "processed": 0, "updated": 0, "total": total, "progress": 0.0}
+    db.refresh(checkpoint)
+    remaining = db.scalar(
+        select(func.count()).select_from(VaultItem).where(VaultItem.id > checkpoint.last_id)
+    )
+    done = total - remaining
+    return {
+        "status": checkpoint.status,
+        "last_id": checkpoint.last_id,
+        "processed": checkpoint.processed,
+        "updated": checkpoint.updated,
+        "total": total,
+        "progress": 1.0 if checkpoint.status == "done" or not total else round(done / total, 4),
+        "started_at": checkpoint.started_at,
+        "updated_at": checkpoint.updated_at,
+        "finished_at": checkpoint.finished_at,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Re-encrypt the vault with the primary encryption key.")
+    parser.add_argument("--status", action="store_true", help="print the progress and exit")
+    parser.add_argument("--restart", action="store_true", help="start a new pass from the first row")
+    parser.add_argument("--chunk-size", type=int, default=None)
+    parser.add_argument("--rate", type=int, default=None, help="target rows per second (0 = unthrottled)")
+    args = parser.parse_args()
+
+    JobCheckpoint.__table__.create(bind=SessionLocal.kw["bind"], checkfirst=True)
+    if args.status:
+        with SessionLocal() as db:
+            status = get_rotation_status(db)
+    else:
+        status = run_key_rotation(chunk_size=args.chunk_size, rows_per_second=args.rate, restart=args.restart)
+    for key, value in status.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,31 @@
+import secrets
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from app.api.endpoints import users, login, vault
 from app.core.config import settings
+from app.core import crypto_pool, events, metrics, outbox, profiling
+from app.core.hashing import HashingPoolBusy, hashing_pool
 from app.db.init_db import create_db_and_tables
+from app.db.session import async_engine, engine
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Código que se ejecuta ANTES de que la aplicación empiece a aceptar peticiones
     print("--- Application starting up ---")
     create_db_and_tables()
+    await events.broker.start()
+    if settings.OUTBOX_WORKER_ENABLED:
+        await outbox.outbox_worker.start()
     yield
     print("--- Application shutting down ---")
+    await outbox.outbox_worker.stop()
+    await events.broker.stop()
+    hashing_pool.shutdown()
+    crypto_pool.shutdown()
+    await async_engine.dispose()
 
 app = FastAPI(
     title="Password Manager API",
@@ -36,8 +49,39 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+if settings.METRICS_ENABLED:
+    metrics.instrument_engine(engine, "sync")
+    metrics.instrument_engine(async_engine.sync_engine, "async")
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    def read_metrics(request: Request):
+        expected = f"Bearer {settings.METRICS_TOKEN}"
+        if settings.METRICS_TOKEN and not secrets.compare_digest(
+            request.headers.get("authorization", ""), expected
+        ):
+            return PlainTextResponse("Unauthorized", status_code=status.HTTP_401_UNAUTHORIZED)
+        return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+if settings.PROFILING_ENABLED:
+    profiling.instrument_engine(engine, "sync")
+    profiling.instrument_engine(async_engine.sync_engine, "async")
+    app.add_middleware(
+        profiling.ProfilingMiddleware, token=settings.PROFILING_TOKEN, directory=settings.PROFILING_DIR
+    )
+
+@app.exception_handler(HashingPoolBusy)
+async def hashing_pool_busy_handler(request: Request, exc: HashingPoolBusy):
+    # El pool de hashing está saturado: mejor rechazar que encolar sin límite.
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Too many authentication requests, try again later."},
+        headers={"Retry-After": "1"},
+    )
+
 @app.get("/", tags=["Root"])
 def read_root():
     return {"message": "Welcome to your Password Manager API!"}
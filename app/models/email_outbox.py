@@ -0,0 +1,26 @@
+from sqlalchemy import Column, DateTime, Index, Integer, String
+
+from app.db.base_class import Base
+
+class OutboxEmail(Base):
+    """
+    An email waiting to be sent by the delivery worker (app.core.outbox).
+    Only the kind and the recipient are stored: the message (and any token in
+    it) is built when it is sent.
+    """
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    recipient = Column(String, nullable=False)
+    # "pending" hasta que se envía (y se borra) o se agotan los intentos ("failed")
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    # Próximo intento; al reclamarlo el worker lo adelanta el tiempo del lease
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_email_outbox_due", "status", "next_attempt_at"),
+    )
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, DateTime, Integer, String
+
+from app.db.base_class import Base
+
+class JobCheckpoint(Base):
+    """Progress of the resumable background jobs (e.g. the key rotation)."""
+    __tablename__ = "job_checkpoints"
+
+    name = Column(String, primary_key=True)
+    status = Column(String, nullable=False, default="pending")
+
+    # Último id procesado: el job continúa a partir de aquí
+    last_id = Column(Integer, nullable=False, default=0)
+    processed = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
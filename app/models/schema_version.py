@@ -0,0 +1,11 @@
+from sqlalchemy import Column, DateTime, Integer, String
+
+from app.db.base_class import Base
+
+class SchemaVersion(Base):
+    """Fingerprint of the schema the database was last upgraded to (a single row)."""
+    __tablename__ = "schema_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(String, nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=True)
@@ -2,6 +2,7 @@ from sqlalchemy import Column, Integer, String, Boolean
 from sqlalchemy.orm import relationship
 
 from app.db.base_class import Base
+from app.db.types import Ciphertext
 
 class User(Base):
     __tablename__ = "users"
@@ -11,5 +12,13 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean(), default=True)
 
+    # Clave de datos del usuario, cifrada con la clave maestra (envelope encryption)
+    encrypted_data_key = Column(Ciphertext, nullable=True)
+
+    # Versión del vault: sube con cada escritura de sus items (ETag de las lecturas)
+    vault_version = Column(Integer, nullable=False, default=0, server_default="0")
+    # Los tombstones con seq <= este valor ya se han borrado (ver /vault/changes)
+    vault_compacted_seq = Column(Integer, nullable=False, default=0, server_default="0")
+
     # Relación con las contraseñas (VaultItem)
     vault_items = relationship("VaultItem", back_populates="owner", cascade="all, delete-orphan")
\ No newline at end of file
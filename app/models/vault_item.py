@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text
+from sqlalchemy import Column, DateTime, Integer, String, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 
 from app.db.base_class import Base
+from app.db import fulltext
+from app.db.types import Ciphertext
 
 class VaultItem(Base):
     __tablename__ = "vault_items"
@@ -9,11 +11,36 @@ class VaultItem(Base):
     id = Column(Integer, primary_key=True, index=True)
     
     username = Column(String, index=True, nullable=False)
-    encrypted_password = Column(String, nullable=False)
+    # Bytes con cabecera de versión; las filas antiguas guardan tokens Fernet como texto
+    encrypted_password = Column(Ciphertext, nullable=False)
     url = Column(String, index=True, nullable=False)
+
+    # Campos normalizados de la URL, calculados al escribir (ver app.core.urls)
+    host = Column(String, nullable=True)
+    registrable_domain = Column(String, nullable=True)
+    reversed_host = Column(String, nullable=True)
     
     notes = Column(Text, nullable=True)
     icon = Column(String, nullable=True)
     
     owner_id = Column(Integer, ForeignKey("users.id"))
-    owner = relationship("User", back_populates="vault_items")
\ No newline at end of file
+    owner = relationship("User", back_populates="vault_items")
+
+    # Seguimiento de cambios para la sincronización incremental (/vault/changes):
+    # `seq` es la vault_version del dueño tras la última escritura del item.
+    # Los borrados dejan un tombstone (deleted_at) hasta que se compacta.
+    seq = Column(Integer, nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Índices compuestos para la paginación por cursor (keyset) del listado
+    __table_args__ = (
+        Index("ix_vault_items_owner_id_id", "owner_id", "id"),
+        Index("ix_vault_items_owner_id_url_id", "owner_id", "url", "id"),
+        # Búsquedas por dominio (autofill): rango sobre el host invertido
+        Index("ix_vault_items_owner_id_reversed_host", "owner_id", "reversed_host"),
+        Index("ix_vault_items_owner_id_registrable_domain", "owner_id", "registrable_domain"),
+        Index("ix_vault_items_owner_id_seq", "owner_id", "seq"),
+    )
+
+fulltext.register(VaultItem.__table__)
@@ -1,4 +1,6 @@
-from pydantic import BaseModel, HttpUrl, ConfigDict
+from datetime import datetime
+from typing import List
+from pydantic import BaseModel, HttpUrl, ConfigDict, Field
 
 class VaultItemBase(BaseModel):
     username: str | None = None
@@ -23,4 +25,28 @@ class VaultItem(VaultItemInDBBase):
 
 # Schema que puede incluir la contraseña descifrada (para el modal con el detalle)
 class VaultItemWithPassword(VaultItem):
-    password: str
\ No newline at end of file
+    password: str
+
+# Petición para descifrar varios items a la vez
+class VaultRevealRequest(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=500)
+
+# Resultado de la importación masiva
+class VaultImportError(BaseModel):
+    row: int
+    error: str
+
+class VaultImportResult(BaseModel):
+    imported: int
+    errors: List[VaultImportError]
+
+# Sincronización incremental (/vault/changes)
+class VaultItemChange(VaultItem):
+    seq: int
+    updated_at: datetime | None = None
+
+class VaultChanges(BaseModel):
+    items: List[VaultItemChange]
+    deleted: List[int]
+    seq: int
+    has_more: bool
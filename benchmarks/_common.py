@@ -0,0 +1,119 @@
+"""
+Shared helpers for the benchmark scripts.
+
+The scripts drive the app in process through `httpx.ASGITransport`, like the
+test suite does, against a throwaway SQLite database.
+"""
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from contextlib import asynccontextmanager
+
+
+def configure_environment() -> str:
+    """
+    Point the app at a temporary database before it is imported.
+    Returns the path of the database file.
+    """
+    db_dir = tempfile.mkdtemp(prefix="pm-bench-")
+    db_path = os.path.join(db_dir, "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+    # Clave Fernet fija, solo para benchmarks.
+    os.environ.setdefault("ENCRYPTION_KEY", "omB0esaioi2J6jOphJmlVOHVGlU0-Ri5F-dxNMNhy8k=")
+    return db_path
+
+
+@asynccontextmanager
+async def app_client():
+    """Create the tables and yield an in-process client for the app."""
+    from httpx import AsyncClient, ASGITransport
+
+    from app.main import app
+    from app.db.init_db import create_db_and_tables
+
+    create_db_and_tables()
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        yield client
+
+
+def disable_login_throttle() -> None:
+    """
+    Lift the login throttle: the benchmarks log in from one IP and for a few
+    accounts, so it would answer 429 before bcrypt and skew the figures.
+    """
+    from app.api.endpoints import login
+    from app.core.login_throttle import LoginThrottle
+
+    unlimited = 10**9
+    login.login_throttle = LoginThrottle(unlimited, unlimited, unlimited, unlimited, maxsize=1000)
+
+
+async def register(client, email: str, password: str = "benchmark-password") -> dict:
+    """Register a user and return the Authorization header for it."""
+    response = await client.post("/users/", json={"email": email, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def timed(coro) -> float:
+    """Await `coro` and return the elapsed time in milliseconds."""
+    start = time.perf_counter()
+    response = await coro
+    elapsed = (time.perf_counter() - start) * 1000
+    if hasattr(response, "raise_for_status") and response.status_code != 503:
+        response.raise_for_status()
+    return elapsed
+
+
+async def run_load(send, requests: int, concurrency: int) -> tuple[list[float], float, int]:
+    """
+    Call `send()` `requests` times from `concurrency` workers.
+    Returns the latency samples (ms) of the successful calls, the wall time (s)
+    and the number of failed calls.
+    """
+    samples: list[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            try:
+                samples.append(await timed(send()))
+            except Exception:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, time.perf_counter() - start, errors
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples: list[float]) -> dict:
+    """Return count, mean and p50/p95/p99 latencies (ms) for a list of samples."""
+    return {
+        "count": len(samples),
+        "mean_ms": round(statistics.fmean(samples), 3) if samples else 0.0,
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+    }
+
+
+def print_summary(label: str, summary: dict) -> None:
+    print(
+        f"{label:<32} n={summary['count']:<6} mean={summary['mean_ms']:>9.2f}ms "
+        f"p50={summary['p50_ms']:>9.2f}ms p95={summary['p95_ms']:>9.2f}ms "
+        f"p99={summary['p99_ms']:>9.2f}ms"
+    )
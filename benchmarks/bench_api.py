@@ -0,0 +1,231 @@
+"""
+Throughput and p50/p95/p99 latency of the main API operations: login, list,
+search, reveal, create, update and delete.
+
+Seeds synthetic users with vaults of the given size, then runs each scenario
+in turn. By default the app runs in process on a throwaway SQLite database;
+with `--base-url` the same load goes to a running server (e.g. uvicorn). In
+process the login throttle is lifted; a running server keeps its own, so raise
+its LOGIN_THROTTLE_* settings for the login scenario.
+
+The results are written as JSON (with the commit they were measured on), and
+`--compare` prints the change against a previous run:
+
+    python -m benchmarks.bench_api --users 5 --items 500 --output before.json
+    python -m benchmarks.bench_api --users 5 --items 500 --compare before.json
+    python -m benchmarks.bench_api --base-url http://localhost:8000 --users 2
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+from benchmarks._common import configure_environment, print_summary, register, run_load, summarize
+
+PASSWORD = "benchmark-password"
+SCENARIOS = ("login", "list", "search", "reveal", "create", "update", "delete")
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+@asynccontextmanager
+async def bench_client(base_url: str | None):
+    """Client for a running server, or for the app in process when `base_url` is None."""
+    if base_url:
+        from httpx import AsyncClient
+
+        async with AsyncClient(base_url=base_url, timeout=None) as client:
+            yield client
+    else:
+        configure_environment()
+        from benchmarks._common import app_client, disable_login_throttle
+
+        disable_login_throttle()
+        async with app_client() as client:
+            yield client
+
+
+async def seed_user(client, email: str, items: int) -> dict:
+    """Register a user, import `items` synthetic items and return its headers and item ids."""
+    headers = await register(client, email, PASSWORD)
+    rows = ["name,url,username,password,note"] + [
+        f"Site {i},https://site{i}.example.com/login,user{i},password-{i},note {i}" for i in range(items)
+    ]
+    response = await client.post(
+        "/vault/import", headers=headers, files={"file": ("items.csv", "\n".join(rows), "text/csv")}
+    )
+    response.raise_for_status()
+
+    ids: list[int] = []
+    params = {"limit": 1000, "fields": "id"}
+    while True:
+        response = await client.get("/vault/", params=params, headers=headers)
+        response.raise_for_status()
+        ids.extend(item["id"] for item in response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            break
+        params["cursor"] = cursor
+    return {"email": email, "headers": headers, "ids": ids, "created": []}
+
+
+def build_scenarios(client, users: list[dict], args: argparse.Namespace) -> dict:
+    """Map each scenario to a `send()` returning one request for a random user."""
+    pick = random.Random(args.seed).choice
+    rng = random.Random(args.seed)
+    counter = itertools.count()
+
+    def login():
+        user = pick(users)
+        return client.post("/login/token", data={"username": user["email"], "password": PASSWORD})
+
+    def list_items():
+        return client.get("/vault/", params={"limit": args.page_size}, headers=pick(users)["headers"])
+
+    def search():
+        term = f"site{rng.randrange(max(args.items, 1))}"
+        return client.get("/vault/", params={"q": term, "limit": 20}, headers=pick(users)["headers"])
+
+    def reveal():
+        user = pick(users)
+        ids = rng.sample(user["ids"], min(args.reveal_size, len(user["ids"])))
+        return client.post("/vault/reveal", json={"ids": ids}, headers=user["headers"])
+
+    async def create():
+        user = pick(users)
+        n = next(counter)
+        response = await client.post(
+            "/vault/",
+            json={"username": f"new{n}", "password": f"secret-{n}", "url": f"https://new{n}.example.com"},
+            headers=user["headers"],
+        )
+        if response.status_code == 201:
+            user["created"].append(response.json()["id"])
+        return response
+
+    def update():
+        user = pick(users)
+        item_id = pick(user["ids"])
+        return client.put(
+            f"/vault/{item_id}", json={"username": f"updated{next(counter)}"}, headers=user["headers"]
+        )
+
+    def delete():
+        # Solo se borran los items creados por el escenario create
+        user = pick([user for user in users if user["created"]])
+        return client.delete(f"/vault/{user['created'].pop()}", headers=user["headers"])
+
+    return {
+        "login": login,
+        "list": list_items,
+        "search": search,
+        "reveal": reveal,
+        "create": create,
+        "update": update,
+        "delete": delete,
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, previous: dict) -> None:
+    """Print the change of throughput and latency percentiles against a previous run."""
+    print(f"\nAgainst {previous.get('commit') or 'previous run'} ({previous.get('timestamp')}):")
+    for name, current in results["scenarios"].items():
+        before = previous.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        changes = []
+        for key in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+            if before.get(key):
+                changes.append(f"{key}={(current[key] - before[key]) / before[key] * 100:+.1f}%")
+        print(f"{name:<10} {' '.join(changes)}")
+
+
+async def main(args: argparse.Namespace) -> dict:
+    scenarios = [name for name in SCENARIOS if name in args.scenarios]
+    # Emails únicos por ejecución, para poder repetirla contra el mismo servidor
+    run_id = uuid.uuid4().hex[:8]
+    async with bench_client(args.base_url) as client:
+        users = [
+            await seed_user(client, f"bench-{run_id}-{n}@example.com", args.items)
+            for n in range(args.users)
+        ]
+        senders = build_scenarios(client, users, args)
+        results = {}
+        for name in scenarios:
+            requests = args.login_requests if name == "login" else args.requests
+            if name == "delete":
+                requests = min(requests, sum(len(user["created"]) for user in users))
+            elif name not in ("login", "create"):
+                await run_load(senders[name], args.warmup, 1)
+            samples, wall, errors = await run_load(senders[name], requests, args.concurrency)
+            summary = summarize(samples)
+            summary.update(rps=round(len(samples) / wall, 1) if wall else 0.0, errors=errors)
+            results[name] = summary
+            print_summary(name, summary)
+            print(f"{'':<32} {summary['rps']:,.1f} req/s, {errors} errors")
+
+    return {
+        "benchmark": "bench_api",
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "target": args.base_url or "in-process",
+        "python": platform.python_version(),
+        "config": {
+            key: getattr(args, key)
+            for key in ("users", "items", "requests", "login_requests", "concurrency", "page_size", "reveal_size")
+        },
+        "scenarios": results,
+    }
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", help="Benchmark a running server instead of the app in process")
+    parser.add_argument("--users", type=int, default=3)
+    parser.add_argument("--items", type=int, default=500, help="Items seeded per user")
+    parser.add_argument("--requests", type=int, default=300, help="Requests per scenario")
+    parser.add_argument("--login-requests", type=int, default=50, help="Logins run bcrypt: keep them fewer")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--reveal-size", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--output", help="JSON file for the results (default: benchmarks/results/)")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare with")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    started = time.perf_counter()
+    results = asyncio.run(main(args))
+    results["duration_s"] = round(time.perf_counter() - started, 1)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"bench_api-{results['commit'] or 'unknown'}.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
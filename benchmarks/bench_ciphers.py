@@ -0,0 +1,52 @@
+"""
+Compare encrypt/decrypt throughput and stored size of the cipher engines.
+
+    python -m benchmarks.bench_ciphers --rows 20000 --length 16 --length 64
+"""
+import argparse
+import time
+
+from cryptography.fernet import Fernet
+
+from app.core.ciphers import AEAD_ENGINES, FERNET, Keyring
+
+
+def bench_engine(engine: str, plaintexts: list[bytes]) -> dict:
+    keyring = Keyring([Fernet.generate_key().decode()], engine)
+
+    start = time.perf_counter()
+    ciphertexts = [keyring.encrypt(value) for value in plaintexts]
+    encrypt_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for value in ciphertexts:
+        keyring.decrypt(value)
+    decrypt_s = time.perf_counter() - start
+
+    return {
+        "encrypt_ops": len(plaintexts) / encrypt_s,
+        "decrypt_ops": len(plaintexts) / decrypt_s,
+        "bytes_per_row": sum(map(len, ciphertexts)) / len(ciphertexts),
+    }
+
+
+def main(args: argparse.Namespace) -> None:
+    for length in args.length:
+        plaintexts = [(b"p%07d" % i).ljust(length, b"x")[:length] for i in range(args.rows)]
+        print(f"plaintext: {length} bytes, {args.rows} rows")
+        for engine in [FERNET, *AEAD_ENGINES]:
+            result = bench_engine(engine, plaintexts)
+            print(
+                f"  {engine:<20} encrypt={result['encrypt_ops']:>10,.0f}/s "
+                f"decrypt={result['decrypt_ops']:>10,.0f}/s "
+                f"stored={result['bytes_per_row']:>6.1f} B/row"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--length", type=int, action="append", help="plaintext length in bytes (repeatable)")
+    args = parser.parse_args()
+    args.length = args.length or [16, 64, 256]
+    main(args)
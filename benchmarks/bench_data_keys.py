@@ -0,0 +1,54 @@
+"""
+Latency of the list and reveal endpoints with the per-user data-key cache
+warm (the normal case) and cold (cache cleared before every request, so each
+one reads and unwraps the data key).
+
+    python -m benchmarks.bench_data_keys --items 200 --requests 500
+"""
+import argparse
+import asyncio
+
+from benchmarks._common import configure_environment, print_summary, run_load, summarize
+
+configure_environment()
+
+from app.core.data_keys import data_key_cache  # noqa: E402
+from benchmarks._common import app_client, register  # noqa: E402
+
+
+async def main(args: argparse.Namespace) -> None:
+    async with app_client() as client:
+        headers = await register(client, "data-keys@example.com")
+        for i in range(args.items):
+            await client.post(
+                "/vault/",
+                headers=headers,
+                json={"username": f"user{i}", "password": f"secret-{i}", "url": f"https://site{i}.example.com"},
+            )
+        ids = [item["id"] for item in (await client.get("/vault/", headers=headers)).json()]
+
+        requests = {
+            "GET /vault/": lambda: client.get("/vault/", headers=headers),
+            "GET /vault/{id}": lambda: client.get(f"/vault/{ids[0]}", headers=headers),
+            f"POST /vault/reveal ({args.reveal} ids)": lambda: client.post(
+                "/vault/reveal", headers=headers, json={"ids": ids[:args.reveal]}
+            ),
+        }
+        for label, send in requests.items():
+            for cache in ("warm", "cold"):
+                def request(send=send, cache=cache):
+                    if cache == "cold":
+                        data_key_cache.clear()
+                    return send()
+
+                await run_load(request, 20, 1)
+                samples, _, _ = await run_load(request, args.requests, 1)
+                print_summary(f"{label} [{cache}]", summarize(samples))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--reveal", type=int, default=50, help="ids per reveal request")
+    asyncio.run(main(parser.parse_args()))
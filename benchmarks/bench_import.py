@@ -0,0 +1,57 @@
+"""
+Time `POST /vault/import` against one `POST /vault/` per entry.
+
+    python -m benchmarks.bench_import --items 10000
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks._common import configure_environment
+
+configure_environment()
+
+from benchmarks._common import app_client, register  # noqa: E402
+
+
+def build_csv(items: int) -> str:
+    lines = ["name,url,username,password,note"]
+    for i in range(items):
+        lines.append(f"Site {i},https://site{i}.example.com/login,user{i},password-{i},imported row {i}")
+    return "\n".join(lines) + "\n"
+
+
+async def main(args: argparse.Namespace) -> None:
+    async with app_client() as client:
+        headers = await register(client, "importer@example.com")
+
+        start = time.perf_counter()
+        response = await client.post(
+            "/vault/import",
+            headers=headers,
+            files={"file": ("export.csv", build_csv(args.items), "text/csv")},
+        )
+        response.raise_for_status()
+        elapsed = time.perf_counter() - start
+        print(f"POST /vault/import: {response.json()['imported']} items in {elapsed:.2f}s")
+
+        headers = await register(client, "one-by-one@example.com")
+        start = time.perf_counter()
+        for i in range(args.single):
+            await client.post(
+                "/vault/",
+                headers=headers,
+                json={"url": f"https://site{i}.example.com/login", "username": f"user{i}", "password": f"password-{i}"},
+            )
+        elapsed = time.perf_counter() - start
+        print(
+            f"POST /vault/ x{args.single}: {elapsed:.2f}s "
+            f"(~{elapsed / args.single * args.items:.1f}s for {args.items} items)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--single", type=int, default=200, help="individual POSTs to extrapolate from")
+    asyncio.run(main(parser.parse_args()))
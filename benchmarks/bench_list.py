@@ -0,0 +1,71 @@
+"""
+Requests per second of a 1,000-item `GET /vault/` page: the Core-row +
+orjson path of the endpoint against the previous one (ORM objects validated
+through `response_model=List[VaultItem]`), served by a throwaway app.
+
+    python -m benchmarks.bench_list --items 1000 --requests 200 --concurrency 1 8
+"""
+import argparse
+import asyncio
+from typing import List
+
+from benchmarks._common import configure_environment, print_summary, run_load, summarize
+
+configure_environment()
+
+from fastapi import Depends, FastAPI  # noqa: E402
+from httpx import ASGITransport, AsyncClient  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+
+from app.api import deps  # noqa: E402
+from app.core.principals import Principal  # noqa: E402
+from app.crud import crud_vault_item_async  # noqa: E402
+from app.schemas.vault_item import VaultItem  # noqa: E402
+from benchmarks._common import app_client, register  # noqa: E402
+
+
+def build_orm_app() -> FastAPI:
+    orm_app = FastAPI()
+
+    @orm_app.get("/vault/", response_model=List[VaultItem])
+    async def read_vault_items(
+        limit: int = 100,
+        db: AsyncSession = Depends(deps.get_async_db),
+        current_user: Principal = Depends(deps.get_current_user),
+    ):
+        return await crud_vault_item_async.get_vault_items_by_owner(db, owner_id=current_user.id, limit=limit)
+
+    return orm_app
+
+
+async def main(args: argparse.Namespace) -> None:
+    async with app_client() as client:
+        headers = await register(client, "list@example.com")
+        rows = ["name,url,username,password,note"] + [
+            f"Site {i},https://site{i}.example.com/login,user{i},password-{i},note {i}" for i in range(args.items)
+        ]
+        response = await client.post(
+            "/vault/import", headers=headers, files={"file": ("items.csv", "\n".join(rows), "text/csv")}
+        )
+        response.raise_for_status()
+
+        transport = ASGITransport(app=build_orm_app())
+        async with AsyncClient(transport=transport, base_url="http://bench", timeout=None) as orm_client:
+            targets = {"orm + response_model": orm_client, "core rows + orjson": client}
+            for concurrency in args.concurrency:
+                for label, target in targets.items():
+                    def send(target=target):
+                        return target.get("/vault/", params={"limit": args.items}, headers=headers)
+
+                    await run_load(send, 10, 1)
+                    samples, wall, errors = await run_load(send, args.requests, concurrency)
+                    print_summary(f"{label} c={concurrency}", summarize(samples))
+                    print(f"{'':<32} {len(samples) / wall:,.1f} req/s, {errors} errors")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,73 @@
+"""
+Measure `/vault/` latency while `/login/token` is saturated.
+
+bcrypt work runs on the dedicated hashing pool, so the p99 of the vault
+listing should stay roughly flat between the idle and saturated phases. The
+login throttle is lifted so that every login reaches bcrypt; the run fails if
+any login of the measured phase gets another status than 200.
+
+    python -m benchmarks.bench_login_isolation --login-concurrency 64 --requests 300
+"""
+import argparse
+import asyncio
+
+from benchmarks._common import configure_environment, print_summary, run_load, summarize
+
+configure_environment()
+
+from benchmarks._common import app_client, disable_login_throttle, register  # noqa: E402
+
+
+async def _measure_vault(client, headers: dict, requests: int, concurrency: int) -> list[float]:
+    samples, _, _ = await run_load(lambda: client.get("/vault/", headers=headers), requests, concurrency)
+    return samples
+
+
+async def _hammer_login(client, stop: asyncio.Event, counters: dict) -> None:
+    form = {"username": "login-target@example.com", "password": "benchmark-password"}
+    while not stop.is_set():
+        response = await client.post("/login/token", data=form)
+        counters[response.status_code] = counters.get(response.status_code, 0) + 1
+
+
+async def main(args: argparse.Namespace) -> None:
+    disable_login_throttle()
+    async with app_client() as client:
+        headers = await register(client, "vault-reader@example.com")
+        await register(client, "login-target@example.com")
+        for i in range(args.items):
+            await client.post(
+                "/vault/",
+                headers=headers,
+                json={"username": f"user{i}", "password": "secret", "url": f"https://site{i}.example.com"},
+            )
+
+        idle = await _measure_vault(client, headers, args.requests, args.vault_concurrency)
+        print_summary("/vault/ (idle)", summarize(idle))
+
+        stop = asyncio.Event()
+        counters: dict = {}
+        hammers = [
+            asyncio.create_task(_hammer_login(client, stop, counters))
+            for _ in range(args.login_concurrency)
+        ]
+        await asyncio.sleep(0.5)
+        # Solo cuentan las respuestas de la fase medida
+        counters.clear()
+        saturated = await _measure_vault(client, headers, args.requests, args.vault_concurrency)
+        stop.set()
+        await asyncio.gather(*hammers)
+
+        print_summary("/vault/ (login saturated)", summarize(saturated))
+        print(f"/login/token responses by status: {counters}")
+        if set(counters) - {200}:
+            raise SystemExit(f"Logins answered {counters} during the measured phase, expected only 200")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--vault-concurrency", type=int, default=8)
+    parser.add_argument("--login-concurrency", type=int, default=64)
+    asyncio.run(main(parser.parse_args()))
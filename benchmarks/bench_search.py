@@ -0,0 +1,86 @@
+"""
+Compare the full-text search of `GET /vault/?q=` with the old ILIKE scan.
+
+Seeds one user with N synthetic items (100k by default) and times the
+statements built by `vault_items_by_owner_query` with the FTS5 index and
+with the ILIKE fallback.
+
+    python -m benchmarks.bench_search --items 100000
+"""
+import argparse
+import random
+import time
+
+from benchmarks._common import configure_environment, print_summary, summarize
+
+configure_environment()
+
+from sqlalchemy import insert  # noqa: E402
+
+from app.crud.crud_vault_item import vault_items_by_owner_query  # noqa: E402
+from app.db.init_db import create_db_and_tables  # noqa: E402
+from app.db.session import engine  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.models.vault_item import VaultItem  # noqa: E402
+
+WORDS = [
+    "mail", "bank", "shop", "cloud", "forum", "news", "travel", "music", "video", "games",
+    "work", "home", "school", "health", "sports", "photo", "code", "chat", "docs", "maps",
+]
+
+
+def seed(items: int, owners: int) -> None:
+    rng = random.Random(42)
+    with engine.begin() as connection:
+        connection.execute(
+            insert(User),
+            [{"email": f"owner{i}@example.com", "hashed_password": "x", "is_active": True} for i in range(owners)],
+        )
+        batch = []
+        for i in range(items):
+            word, other = rng.choice(WORDS), rng.choice(WORDS)
+            batch.append({
+                "owner_id": 1 + i % owners,
+                "username": f"{other}user{i}",
+                "url": f"https://{word}{i % 997}.example.com/login",
+                "notes": f"{word} {other} account number {i}",
+                "encrypted_password": "x",
+            })
+            if len(batch) == 5000:
+                connection.execute(insert(VaultItem), batch)
+                batch = []
+        if batch:
+            connection.execute(insert(VaultItem), batch)
+
+
+def run(dialect: str, term: str, repeat: int, sort: str = "id") -> list[float]:
+    query = vault_items_by_owner_query(1, search=term, limit=100, dialect=dialect, sort=sort)
+    samples = []
+    with engine.connect() as connection:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            connection.execute(query).all()
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main(args: argparse.Namespace) -> None:
+    create_db_and_tables()
+    start = time.perf_counter()
+    seed(args.items, args.owners)
+    print(f"seeded {args.items} items in {time.perf_counter() - start:.1f}s")
+
+    for term in args.terms:
+        # "generic" no tiene índice full-text: es la búsqueda ILIKE de siempre
+        print_summary(f"ILIKE q={term!r}", summarize(run("generic", term, args.repeat)))
+        print_summary(f"FTS5  q={term!r}", summarize(run("sqlite", term, args.repeat)))
+        print_summary(f"FTS5  q={term!r} ranked", summarize(run("sqlite", term, args.repeat, "relevance")))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--owners", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--terms", nargs="+", default=["travel", "user4242", "number 99999"])
+    main(parser.parse_args())
@@ -0,0 +1,72 @@
+"""
+Cold start breakdown: import time of `app.main` by package (from
+`python -X importtime`) and time of the schema step of the startup, with the
+schema-version check against running create_all + upgrade on every boot.
+
+    python -m benchmarks.bench_startup --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from benchmarks._common import configure_environment
+
+
+def import_times(env: dict) -> tuple[list[tuple[str, int, int]], float]:
+    """
+    Import `app.main` in a fresh interpreter with `-X importtime`.
+    Returns (module, self us, cumulative us) rows and the wall time of the import (ms).
+    """
+    code = "import time; s = time.perf_counter(); import app.main; print((time.perf_counter() - s) * 1000)"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], env=env, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows, float(result.stdout.strip().splitlines()[-1])
+
+
+def group(module: str) -> str:
+    """Top-level package, or the module itself for the app's own code."""
+    parts = module.split(".")
+    return ".".join(parts[:3]) if parts[0] == "app" else parts[0]
+
+
+def time_schema_step(mode: str) -> float:
+    from app.db.init_db import create_db_and_tables
+
+    started = time.perf_counter()
+    create_db_and_tables(mode)
+    return (time.perf_counter() - started) * 1000
+
+
+def main(args: argparse.Namespace) -> None:
+    configure_environment()
+    env = {**os.environ, "PYTHONPATH": os.getcwd()}
+    rows, wall_ms = import_times(env)
+
+    by_group: dict[str, int] = defaultdict(int)
+    for module, self_us, _ in rows:
+        by_group[group(module)] += self_us
+    total_ms = sum(by_group.values()) / 1000
+    print(f"import app.main: {wall_ms:.1f} ms wall, {total_ms:.1f} ms in {len(rows)} modules")
+    for name, self_us in sorted(by_group.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {name:<36} {self_us / 1000:>8.1f} ms")
+
+    print("\nschema step of the startup:")
+    print(f"  {'new database (migrate)':<36} {time_schema_step('migrate'):>8.1f} ms")
+    print(f"  {'every boot before (migrate)':<36} {time_schema_step('migrate'):>8.1f} ms")
+    print(f"  {'every boot now (check)':<36} {time_schema_step('check'):>8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--top", type=int, default=15, help="packages to list")
+    main(parser.parse_args())
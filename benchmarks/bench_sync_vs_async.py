@@ -0,0 +1,84 @@
+"""
+Compare the async endpoints against the equivalent sync (thread pool) path.
+
+The sync variant is a throwaway app that serves the same reads through
+`deps.get_db` and `crud_vault_item`, like the endpoints did before the move
+to AsyncSession. Both run the same workload at increasing concurrency.
+Above ~40 concurrent requests the sync path exhausts Starlette's thread pool
+and the connection pool together and requests start timing out; those are
+reported as errors.
+
+    python -m benchmarks.bench_sync_vs_async --requests 500 --concurrency 1 8 32
+"""
+import argparse
+import asyncio
+from typing import List
+
+from benchmarks._common import configure_environment, print_summary, run_load, summarize
+
+configure_environment()
+
+from fastapi import Depends, FastAPI, HTTPException  # noqa: E402
+from httpx import ASGITransport, AsyncClient  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.api import deps  # noqa: E402
+from app.core.principals import Principal  # noqa: E402
+from app.crud import crud_vault_item  # noqa: E402
+from app.schemas.vault_item import VaultItem  # noqa: E402
+from benchmarks._common import app_client, register  # noqa: E402
+
+
+def build_sync_app() -> FastAPI:
+    sync_app = FastAPI()
+
+    @sync_app.get("/vault/", response_model=List[VaultItem])
+    def read_vault_items(
+        db: Session = Depends(deps.get_db),
+        current_user: Principal = Depends(deps.get_current_user),
+    ):
+        return crud_vault_item.get_vault_items_by_owner(db, owner_id=current_user.id)
+
+    @sync_app.get("/vault/{item_id}", response_model=VaultItem)
+    def read_vault_item(
+        item_id: int,
+        db: Session = Depends(deps.get_db),
+        current_user: Principal = Depends(deps.get_current_user),
+    ):
+        item = crud_vault_item.get_vault_item(db, item_id=item_id, owner_id=current_user.id)
+        if not item:
+            raise HTTPException(status_code=404, detail="Vault item not found")
+        return item
+
+    return sync_app
+
+
+async def main(args: argparse.Namespace) -> None:
+    async with app_client() as async_client:
+        headers = await register(async_client, "sync-vs-async@example.com")
+        for i in range(args.items):
+            await async_client.post(
+                "/vault/",
+                headers=headers,
+                json={"username": f"user{i}", "password": "secret", "url": f"https://site{i}.example.com"},
+            )
+        item_id = (await async_client.get("/vault/", headers=headers)).json()[0]["id"]
+
+        transport = ASGITransport(app=build_sync_app())
+        async with AsyncClient(transport=transport, base_url="http://bench", timeout=None) as sync_client:
+            for path in ("/vault/", f"/vault/{item_id}"):
+                for concurrency in args.concurrency:
+                    for label, client in (("sync", sync_client), ("async", async_client)):
+                        samples, wall, errors = await run_load(
+                            lambda: client.get(path, headers=headers), args.requests, concurrency
+                        )
+                        print_summary(f"{label:<5} GET {path} c={concurrency}", summarize(samples))
+                        print(f"{'':<32} {len(samples) / wall:.1f} req/s, {errors} errors")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    asyncio.run(main(parser.parse_args()))
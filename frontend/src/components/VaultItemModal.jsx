@@ -8,6 +8,8 @@ function VaultItemModal({ item, onClose, onSaved }) {
   const [isSaving, setIsSaving] = useState(false);
   const [showPassword, setShowPassword] = useState(false);
 
+  const [notesLoaded, setNotesLoaded] = useState(false);
+
   const isEditing = item && item.id;
 
   useEffect(() => {
@@ -19,9 +21,18 @@ function VaultItemModal({ item, onClose, onSaved }) {
         notes: item.notes || '',
       });
       setShowPassword(false);
+      setNotesLoaded(false);
+      // El listado no incluye las notas: se piden solo al abrir el item
+      apiClient.get(`/vault/${item.id}`, { params: { fields: 'notes' } })
+        .then(response => {
+          setForm(prevForm => ({ ...prevForm, notes: response.data.notes || '' }));
+          setNotesLoaded(true);
+        })
+        .catch(() => setError('Notes could not be loaded.'));
     } else {
       setForm({ url: '', username: '', password: '', notes: '' });
       setShowPassword(true);
+      setNotesLoaded(true);
     }
     setError('');
   }, [item]);
@@ -40,6 +51,10 @@ function VaultItemModal({ item, onClose, onSaved }) {
     if (isEditing && !payload.password) {
       delete payload.password;
     }
+    // Sin las notas cargadas no se envían, para no borrarlas
+    if (isEditing && !notesLoaded) {
+      delete payload.notes;
+    }
 
     try {
       if (isEditing) {
@@ -102,7 +117,7 @@ function VaultItemModal({ item, onClose, onSaved }) {
           
           <div className="input-group">
             <label htmlFor="notes">Notes</label>
-            <textarea name="notes" value={form.notes} onChange={handleChange} rows="3" />
+            <textarea name="notes" value={form.notes} onChange={handleChange} rows="3" disabled={!notesLoaded} />
           </div>
 
           {error && <p className="error-message">{error}</p>}
@@ -1,9 +1,18 @@
-import { useState, useEffect, useCallback } from 'react';
+import { useState, useEffect, useCallback, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import apiClient from '../services/api.js';
 import VaultItemModal from '../components/VaultItemModal.jsx';
+import { subscribeToVaultEvents } from '../services/vaultEvents.js';
 import './VaultPage.css';
 
+// Aplica una respuesta de /vault/changes a la lista (ordenada por id)
+function mergeChanges(items, changes) {
+  const byId = new Map(items.map(item => [item.id, item]));
+  changes.deleted.forEach(id => byId.delete(id));
+  changes.items.forEach(item => byId.set(item.id, item));
+  return [...byId.values()].sort((a, b) => a.id - b.id);
+}
+
 function VaultPage() {
   const [items, setItems] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -44,6 +53,42 @@ function VaultPage() {
     return () => clearTimeout(delayDebounceFn);
   }, [searchQuery, fetchItems]);
 
+  // Última versión del vault aplicada a la lista, y la cola de sincronizaciones
+  const syncedSeq = useRef(null);
+  const syncing = useRef(Promise.resolve());
+
+  // Cambios hechos desde otras pestañas o dispositivos: solo se piden los
+  // cambios desde la última versión, no la lista entera
+  const applyChanges = useCallback((seq, previousSeq) => {
+    if (searchQuery) {
+      // Los resultados de una búsqueda los decide el servidor
+      fetchItems();
+      return;
+    }
+    // En cola: una respuesta antigua nunca pisa a una más reciente
+    syncing.current = syncing.current.then(async () => {
+      if (syncedSeq.current === null) syncedSeq.current = previousSeq;
+      if (seq <= syncedSeq.current) return;
+      try {
+        let hasMore = true;
+        while (hasMore) {
+          const { data } = await apiClient.get('/vault/changes', {
+            params: { since: syncedSeq.current }
+          });
+          setItems(current => mergeChanges(current, data));
+          syncedSeq.current = data.seq;
+          hasMore = data.has_more;
+        }
+      } catch (err) {
+        // 410: los borrados ya se compactaron; se recarga la lista entera
+        syncedSeq.current = null;
+        fetchItems();
+      }
+    });
+  }, [searchQuery, fetchItems]);
+
+  useEffect(() => subscribeToVaultEvents(applyChanges), [applyChanges]);
+
   const handleOpenCreateModal = () => {
     setCurrentItem(null);
     setIsModalOpen(true);
@@ -0,0 +1,50 @@
+import apiClient from './api.js';
+
+// Suscripción a /vault/events. EventSource no permite enviar la cabecera
+// Authorization, así que el stream SSE se lee con fetch.
+export function subscribeToVaultEvents(onChange) {
+    const controller = new AbortController();
+    let lastSeq = null;
+    let retryDelay = 1000;
+
+    const handleFrame = (frame) => {
+        const data = frame.split('\n').find(line => line.startsWith('data: '));
+        if (!data) return; // keepalive
+        const { seq } = JSON.parse(data.slice(6));
+        // El primer evento solo fija la versión de partida; después se avisa
+        // con la versión nueva y la anterior (el `since` de /vault/changes)
+        if (lastSeq !== null && seq > lastSeq) onChange(seq, lastSeq);
+        lastSeq = seq;
+    };
+
+    const connect = async () => {
+        while (!controller.signal.aborted) {
+            try {
+                const response = await fetch(`${apiClient.defaults.baseURL}/vault/events`, {
+                    headers: { Authorization: `Bearer ${localStorage.getItem('token')}` },
+                    signal: controller.signal,
+                });
+                if (response.status === 401) return;
+                const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+                let buffer = '';
+                retryDelay = 1000;
+                for (;;) {
+                    const { value, done } = await reader.read();
+                    if (done) break;
+                    buffer += value;
+                    const frames = buffer.split('\n\n');
+                    buffer = frames.pop();
+                    frames.forEach(handleFrame);
+                }
+            } catch (err) {
+                if (controller.signal.aborted) return;
+            }
+            // Reconexión con espera creciente (máximo 30 s)
+            await new Promise(resolve => setTimeout(resolve, retryDelay));
+            retryDelay = Math.min(retryDelay * 2, 30000);
+        }
+    };
+
+    connect();
+    return () => controller.abort();
+}
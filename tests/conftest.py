@@ -3,12 +3,18 @@ import asyncio
 from typing import Generator, AsyncGenerator
 from httpx import AsyncClient, ASGITransport
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
 from app.main import app
 from app.api import deps
 from app.db.base_class import Base
+from app.core.principals import principal_cache
+from app.core.data_keys import data_key_cache
+from app.core import metrics
+from app.core.login_throttle import login_throttle
 
 # --- DB de prueba
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -18,6 +24,16 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Sin pool: cada test puede correr en un event loop distinto.
+testing_async_engine = create_async_engine(
+    "sqlite+aiosqlite:///./test.db", poolclass=NullPool
+)
+TestingAsyncSessionLocal = async_sessionmaker(
+    testing_async_engine, autoflush=False, expire_on_commit=False
+)
+# Instrumentada como la de la app, para que /metrics cuente sus consultas
+metrics.instrument_engine(testing_async_engine.sync_engine, "async")
+
 
 # --- SOBREESCRITURA DE DEPENDENCIAS ---
 def override_get_db() -> Generator:
@@ -27,7 +43,12 @@ def override_get_db() -> Generator:
     finally:
         db.close()
 
+async def override_get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
 app.dependency_overrides[deps.get_db] = override_get_db
+app.dependency_overrides[deps.get_async_db] = override_get_async_db
 
 
 # --- FIXTURES ---
@@ -47,10 +68,41 @@ def db_setup_and_teardown():
     The ‘function’ scope ensures a clean state for each test.
     """
     Base.metadata.create_all(bind=engine)
+    principal_cache.clear()
+    data_key_cache.clear()
+    login_throttle.clear()
     yield
     Base.metadata.drop_all(bind=engine)
 
 
+@pytest.fixture(scope="function")
+def db() -> Generator:
+    """
+    Direct DB session for tests that need to read or modify rows.
+    """
+    session = TestingSessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture(scope="session")
+def async_engine() -> AsyncEngine:
+    """
+    The async engine behind the API in the tests.
+    """
+    return testing_async_engine
+
+
+@pytest.fixture(scope="session")
+def async_session_factory() -> async_sessionmaker[AsyncSession]:
+    """
+    Factory of async sessions on the test database, for code that opens its own sessions.
+    """
+    return TestingAsyncSessionLocal
+
+
 @pytest.fixture(scope="session")
 async def client() -> AsyncGenerator[AsyncClient, None]:
     """
@@ -77,4 +129,18 @@ async def authenticated_client(client: AsyncClient) -> AsyncClient:
     yield client
 
     # Limpieza
-    del client.headers["Authorization"]
\ No newline at end of file
+    del client.headers["Authorization"]
+
+@pytest.fixture(scope="function")
+def sql_statements(async_engine: AsyncEngine) -> Generator[list[str], None, None]:
+    """
+    The SQL statements the API runs while the test runs.
+    """
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "after_cursor_execute", record)
+    yield statements
+    event.remove(async_engine.sync_engine, "after_cursor_execute", record)
@@ -0,0 +1,35 @@
+from cryptography.fernet import Fernet
+import pytest
+
+from app.core.ciphers import AEAD_ENGINES, FERNET, InvalidCiphertext, Keyring
+
+OLD_KEY = Fernet.generate_key().decode()
+NEW_KEY = Fernet.generate_key().decode()
+
+@pytest.mark.parametrize("engine", [*AEAD_ENGINES, FERNET])
+def test_keyring_reads_every_engine_and_key(engine):
+    """
+    Test that a keyring decrypts what any engine wrote with any of its keys.
+    """
+    keyring = Keyring([NEW_KEY, OLD_KEY], engine)
+    ciphertext = keyring.encrypt(b"secret")
+    assert keyring.is_current(ciphertext)
+
+    for old_engine in [*AEAD_ENGINES, FERNET]:
+        old_ciphertext = Keyring([OLD_KEY], old_engine).encrypt(b"secret")
+        assert keyring.decrypt(old_ciphertext) == b"secret"
+        assert not keyring.is_current(old_ciphertext)
+        assert keyring.is_current(keyring.rotate(old_ciphertext))
+
+def test_keyring_rejects_tampered_ciphertext():
+    """
+    Test that the AEAD header and body are authenticated.
+    """
+    keyring = Keyring([NEW_KEY])
+    ciphertext = keyring.encrypt(b"secret")
+    assert len(ciphertext) == len(b"secret") + 33
+
+    with pytest.raises(InvalidCiphertext):
+        keyring.decrypt(ciphertext[:-1] + bytes([ciphertext[-1] ^ 1]))
+    with pytest.raises(InvalidCiphertext):
+        Keyring([OLD_KEY]).decrypt(ciphertext)
@@ -0,0 +1,83 @@
+from httpx import AsyncClient
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.ciphers import HEADER_SIZE, InvalidCiphertext
+from app.core.data_keys import data_key_cache
+from app.core.security import decrypt_data
+from app.crud import crud_user
+from app.jobs.key_rotation import run_key_rotation
+from app.models.user import User
+from app.models.vault_item import VaultItem
+
+pytestmark = pytest.mark.asyncio
+
+async def test_each_user_has_its_own_data_key(client: AsyncClient, authenticated_client: AsyncClient, db):
+    """
+    Test that the secrets of two users are encrypted with different data keys.
+    """
+    await authenticated_client.post(
+        "/vault/", json={"username": "a", "password": "secret-a", "url": "https://a.com"}
+    )
+    other = await client.post("/users/", json={"email": "other@example.com", "password": "testpassword"})
+    await client.post(
+        "/vault/",
+        json={"username": "b", "password": "secret-b", "url": "https://b.com"},
+        headers={"Authorization": f"Bearer {other.json()['access_token']}"},
+    )
+
+    rows = db.execute(select(VaultItem.owner_id, VaultItem.encrypted_password).order_by(VaultItem.id)).all()
+    assert rows[0].encrypted_password[:HEADER_SIZE] != rows[1].encrypted_password[:HEADER_SIZE]
+    keyring = crud_user.get_data_keyring(db, rows[0].owner_id)
+    with pytest.raises(InvalidCiphertext):
+        decrypt_data(rows[1].encrypted_password, keyring)
+
+async def test_rewrap_and_shred_touch_only_the_key_row(authenticated_client: AsyncClient, db):
+    """
+    Test that re-wrapping a data key keeps the secrets readable and shredding it makes them unreadable.
+    """
+    response = await authenticated_client.post(
+        "/vault/", json={"username": "a", "password": "secret-a", "url": "https://a.com"}
+    )
+    item_id = response.json()["id"]
+    user = db.scalars(select(User)).one()
+    stored = db.scalar(select(VaultItem.encrypted_password))
+    wrapped_key = user.encrypted_data_key
+
+    crud_user.rewrap_data_key(db, user)
+    assert user.encrypted_data_key != wrapped_key
+    response = await authenticated_client.get(f"/vault/{item_id}")
+    assert response.json()["password"] == "secret-a"
+
+    crud_user.shred_data_key(db, user)
+    assert data_key_cache.get(user.id) is None
+    with pytest.raises(InvalidCiphertext):
+        decrypt_data(stored, crud_user.get_data_keyring(db, user.id))
+
+async def test_shred_tombstones_the_vault_and_rotation_still_runs(authenticated_client: AsyncClient, db):
+    """
+    Test that shredding a data key turns the user's items into tombstones, so
+    the API answers 404 instead of failing to decrypt, and the key rotation
+    goes past them without giving the user a new data key.
+    """
+    ids = []
+    for name in ("a", "b"):
+        response = await authenticated_client.post(
+            "/vault/", json={"username": name, "password": f"secret-{name}", "url": f"https://{name}.com"}
+        )
+        ids.append(response.json()["id"])
+    user = db.scalars(select(User)).one()
+
+    crud_user.shred_data_key(db, user)
+
+    assert (await authenticated_client.get(f"/vault/{ids[0]}")).status_code == 404
+    assert (await authenticated_client.get("/vault/")).json() == []
+    changes = (await authenticated_client.get("/vault/changes", params={"since": 2})).json()
+    assert sorted(changes["deleted"]) == ids
+
+    status = run_key_rotation(sessionmaker(bind=db.get_bind()), rows_per_second=0, restart=True)
+    assert status["status"] == "done"
+    # La rotación no le crea una clave nueva: el vault sigue destruido
+    db.expire_all()
+    assert db.get(User, user.id).encrypted_data_key is None
@@ -0,0 +1,90 @@
+import asyncio
+
+from httpx import AsyncClient
+from sqlalchemy import update
+
+from app.core.events import DatabaseBroker, InProcessBroker
+from app.main import app
+from app.models.user import User
+
+
+async def test_subscription_keeps_only_the_latest_version():
+    """
+    Test that a slow subscriber gets the latest version once, not every intermediate one.
+    """
+    broker = InProcessBroker()
+    async with broker.subscribe(1) as subscription:
+        for seq in (1, 3, 2):
+            broker.publish(1, seq)
+        broker.publish(2, 10)
+        assert await subscription.wait(1) == 3
+        assert await subscription.wait(0.05) is None
+    assert broker.subscribed_users() == []
+
+
+async def test_vault_events_stream(authenticated_client: AsyncClient):
+    """
+    Test that /vault/events sends the current version and then one event per change.
+    """
+    chunks: list[bytes] = []
+    received = asyncio.Event()
+    disconnected = asyncio.Event()
+
+    async def receive():
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            chunks.append(message["body"])
+            received.set()
+
+    # httpx espera a que termine la respuesta, así que el stream se lee con ASGI directamente
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.3"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/vault/events",
+        "raw_path": b"/vault/events",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [
+            (b"host", b"test"),
+            (b"authorization", authenticated_client.headers["Authorization"].encode()),
+        ],
+        "client": ("127.0.0.1", 1234),
+        "server": ("test", 80),
+    }
+    stream = asyncio.create_task(app(scope, receive, send))
+
+    await asyncio.wait_for(received.wait(), 5)
+    assert chunks == [b'id: 0\nevent: vault\ndata: {"seq": 0}\n\n']
+
+    received.clear()
+    response = await authenticated_client.post(
+        "/vault/", json={"username": "user", "password": "secret", "url": "https://example.com"}
+    )
+    assert response.status_code == 201
+    await asyncio.wait_for(received.wait(), 5)
+    assert chunks[1] == b'id: 1\nevent: vault\ndata: {"seq": 1}\n\n'
+
+    disconnected.set()
+    await asyncio.wait_for(stream, 5)
+
+
+async def test_database_broker_picks_up_other_workers(authenticated_client: AsyncClient, db, async_session_factory):
+    """
+    Test that the database broker notifies a change committed outside this process.
+    """
+    user_id = (await authenticated_client.get("/users/me")).json()["id"]
+    broker = DatabaseBroker(async_session_factory, poll_seconds=60)
+    async with broker.subscribe(user_id) as subscription:
+        # Otro worker escribe en el vault: aquí solo cambia la fila del usuario
+        db.execute(update(User).where(User.id == user_id).values(vault_version=User.vault_version + 5))
+        db.commit()
+        await broker.poll_once()
+        assert await subscription.wait(1) == 5
+        await broker.poll_once()
+        assert await subscription.wait(0.05) is None
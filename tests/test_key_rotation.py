@@ -0,0 +1,106 @@
+from cryptography.fernet import Fernet
+from httpx import AsyncClient
+import pytest
+from sqlalchemy import select, text, update
+from sqlalchemy.orm import sessionmaker
+
+from app.core import security
+from app.core.config import settings
+from app.core.data_keys import data_key_cache
+from app.crud import crud_user
+from app.jobs.key_rotation import JOB_NAME, get_rotation_status, run_key_rotation
+from app.models.job_checkpoint import JobCheckpoint
+from app.models.vault_item import VaultItem
+
+pytestmark = pytest.mark.asyncio
+
+@pytest.fixture
+def new_key():
+    """
+    New primary key for the test; the original keys are restored afterwards.
+    """
+    key = Fernet.generate_key().decode()
+    yield key
+    security.configure_keys(settings.ENCRYPTION_KEY)
+
+async def _create_items(client: AsyncClient, count: int) -> list[int]:
+    ids = []
+    for i in range(count):
+        response = await client.post(
+            "/vault/",
+            json={"username": f"user{i}", "password": f"secret{i}", "url": f"https://site{i}.com"},
+        )
+        ids.append(response.json()["id"])
+    return ids
+
+def _store_with_master_key(db, item_id: int, password: str) -> None:
+    # Simula una fila escrita antes de las claves de datos por usuario
+    db.execute(
+        update(VaultItem).where(VaultItem.id == item_id).values(encrypted_password=security.encrypt_data(password))
+    )
+    db.commit()
+
+async def test_master_key_rotation_only_rewraps_data_keys(authenticated_client: AsyncClient, db, new_key):
+    """
+    Test that changing the master key re-wraps the data keys without touching the vault items.
+    """
+    ids = await _create_items(authenticated_client, 5)
+    before = db.scalars(select(VaultItem.encrypted_password).order_by(VaultItem.id)).all()
+    security.configure_keys(new_key, [settings.ENCRYPTION_KEY])
+
+    status = run_key_rotation(sessionmaker(bind=db.get_bind()), chunk_size=2, rows_per_second=0)
+    assert status["status"] == "done"
+    assert (status["data_keys_rewrapped"], status["processed"], status["updated"]) == (1, 5, 0)
+    assert db.scalars(select(VaultItem.encrypted_password).order_by(VaultItem.id)).all() == before
+
+    # Sin la clave antigua, todo sigue legible con la nueva
+    security.configure_keys(new_key)
+    data_key_cache.clear()
+    response = await authenticated_client.get(f"/vault/{ids[4]}")
+    assert response.json()["password"] == "secret4"
+
+async def test_key_rotation_resumes_from_checkpoint(authenticated_client: AsyncClient, db):
+    """
+    Test that a stopped rotation continues after the last checkpointed id.
+    """
+    ids = await _create_items(authenticated_client, 4)
+    for i, item_id in enumerate(ids):
+        _store_with_master_key(db, item_id, f"secret{i}")
+
+    db.add(JobCheckpoint(name=JOB_NAME, status="stopped", last_id=ids[1], processed=2, updated=2))
+    db.commit()
+    assert get_rotation_status(db)["progress"] == 0.5
+
+    status = run_key_rotation(sessionmaker(bind=db.get_bind()), rows_per_second=0)
+    assert (status["processed"], status["updated"]) == (4, 4)
+
+    stored = db.execute(select(VaultItem.owner_id, VaultItem.encrypted_password).order_by(VaultItem.id)).all()
+    keyring = crud_user.get_data_keyring(db, stored[0].owner_id)
+    assert [security.is_encrypted_with_primary_key(row.encrypted_password, keyring) for row in stored] == [
+        False, False, True, True
+    ]
+    assert [security.decrypt_data(row.encrypted_password, keyring) for row in stored] == [
+        f"secret{i}" for i in range(4)
+    ]
+
+async def test_key_rotation_converts_legacy_fernet_rows(authenticated_client: AsyncClient, db):
+    """
+    Test that Fernet tokens stored as text stay readable and are moved to the owner's data key.
+    """
+    item_id = (await _create_items(authenticated_client, 1))[0]
+    legacy_token = Fernet(settings.ENCRYPTION_KEY.encode()).encrypt(b"legacy-secret").decode()
+    db.execute(
+        text("UPDATE vault_items SET encrypted_password = :token WHERE id = :id"),
+        {"token": legacy_token, "id": item_id},
+    )
+    db.commit()
+
+    response = await authenticated_client.get(f"/vault/{item_id}")
+    assert response.json()["password"] == "legacy-secret"
+
+    status = run_key_rotation(sessionmaker(bind=db.get_bind()), rows_per_second=0, restart=True)
+    assert status["updated"] == 1
+    row = db.execute(select(VaultItem.owner_id, VaultItem.encrypted_password).where(VaultItem.id == item_id)).one()
+    keyring = crud_user.get_data_keyring(db, row.owner_id)
+    assert security.is_encrypted_with_primary_key(row.encrypted_password, keyring)
+    assert security.decrypt_data(row.encrypted_password, keyring) == "legacy-secret"
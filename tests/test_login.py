@@ -0,0 +1,169 @@
+from httpx import AsyncClient
+from passlib.hash import bcrypt
+import pytest
+
+from app.api.endpoints import login
+from app.core.hashing import hashing_pool
+from app.core.login_throttle import LoginThrottle
+from app.core.metrics import crypto_time
+from app.core.config import settings
+from app.crud import crud_user_async
+from app.jobs.calibrate_hashing import calibrate
+from app.models.user import User
+
+pytestmark = pytest.mark.asyncio
+
+async def test_login_for_access_token(client: AsyncClient):
+    """
+    Test that a registered user can log in and receives a bearer token.
+    """
+    await client.post(
+        "/users/",
+        json={"email": "login@example.com", "password": "testpassword"},
+    )
+
+    response = await client.post(
+        "/login/token",
+        data={"username": "login@example.com", "password": "testpassword"},
+    )
+    assert response.status_code == 200
+    assert response.json()["token_type"] == "bearer"
+
+async def test_login_wrong_password(client: AsyncClient):
+    """
+    Test that a wrong password is rejected.
+    """
+    await client.post(
+        "/users/",
+        json={"email": "wrongpass@example.com", "password": "testpassword"},
+    )
+
+    response = await client.post(
+        "/login/token",
+        data={"username": "wrongpass@example.com", "password": "not-the-password"},
+    )
+    assert response.status_code == 401
+
+async def test_login_rejected_when_hashing_pool_is_full(client: AsyncClient, monkeypatch):
+    """
+    Test that logins are rejected with 503 instead of queueing when the hashing pool is saturated.
+    """
+    await client.post(
+        "/users/",
+        json={"email": "busy@example.com", "password": "testpassword"},
+    )
+    monkeypatch.setattr(hashing_pool, "queue_limit", 0)
+
+    response = await client.post(
+        "/login/token",
+        data={"username": "busy@example.com", "password": "testpassword"},
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+async def test_login_unknown_email_costs_a_bcrypt_verification(client: AsyncClient):
+    """
+    Test that a login for an unknown email still runs bcrypt, so its timing does not reveal the account.
+    """
+    verifications = crypto_time.labels("bcrypt_verify")
+    before = verifications.snapshot()[0]
+    response = await client.post(
+        "/login/token",
+        data={"username": "nobody@example.com", "password": "testpassword"},
+    )
+    assert response.status_code == 401
+    assert sum(verifications.snapshot()[0]) == sum(before) + 1
+
+async def test_login_throttle(client: AsyncClient, monkeypatch):
+    """
+    Test that attempts over the per-account or per-IP limit get a 429 without hashing,
+    and that a successful login clears the account's failed attempts.
+    """
+    await client.post(
+        "/users/",
+        json={"email": "throttled@example.com", "password": "testpassword"},
+    )
+    throttle = LoginThrottle(account_burst=2, account_per_minute=1, ip_burst=4, ip_per_minute=1, maxsize=100)
+    monkeypatch.setattr(login, "login_throttle", throttle)
+    wrong = {"username": "throttled@example.com", "password": "not-the-password"}
+
+    assert (await client.post("/login/token", data=wrong)).status_code == 401
+    right = {"username": "throttled@example.com", "password": "testpassword"}
+    assert (await client.post("/login/token", data=right)).status_code == 200
+    assert (await client.post("/login/token", data=wrong)).status_code == 401
+    assert (await client.post("/login/token", data=wrong)).status_code == 401
+
+    monkeypatch.setattr(hashing_pool, "queue_limit", 0)  # un intento que llegue a bcrypt daría 503
+    response = await client.post("/login/token", data=wrong)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+
+    # El límite por IP también aplica a otras cuentas
+    response = await client.post("/login/token", data={"username": "other@example.com", "password": "x"})
+    assert response.status_code == 429
+
+async def test_token_buckets_are_bounded():
+    """
+    Test that the throttle state keeps at most `maxsize` keys.
+    """
+    throttle = LoginThrottle(account_burst=1, account_per_minute=1, ip_burst=1000, ip_per_minute=1, maxsize=3)
+    for n in range(10):
+        assert throttle.check(f"user{n}@example.com", "10.0.0.1") is None
+    assert len(throttle.accounts) == 3
+    assert throttle.check("user9@example.com", "10.0.0.1") is not None
+
+async def test_login_rehashes_outdated_hash(client: AsyncClient, db, async_session_factory, monkeypatch):
+    """
+    Test that a successful login upgrades a hash made with another cost to BCRYPT_ROUNDS.
+    """
+    monkeypatch.setattr(crud_user_async, "AsyncSessionLocal", async_session_factory)
+    await client.post(
+        "/users/",
+        json={"email": "rehash@example.com", "password": "testpassword"},
+    )
+    user = db.query(User).filter(User.email == "rehash@example.com").one()
+    user.hashed_password = bcrypt.using(rounds=4).hash("testpassword")
+    db.commit()
+
+    response = await client.post(
+        "/login/token",
+        data={"username": "rehash@example.com", "password": "testpassword"},
+    )
+    assert response.status_code == 200
+    db.refresh(user)
+    assert bcrypt.from_string(user.hashed_password).rounds == settings.BCRYPT_ROUNDS
+    assert bcrypt.verify("testpassword", user.hashed_password)
+
+async def test_calibrate_hashing():
+    """
+    Test that the calibration recommends the highest cost within the budget.
+    """
+    recommended, timings = calibrate(budget_ms=10_000, samples=1, min_rounds=4, max_rounds=5)
+    assert recommended == 5 and list(timings) == [4, 5]
+    recommended, _ = calibrate(budget_ms=0, samples=1, min_rounds=4, max_rounds=5)
+    assert recommended == 4
+
+async def test_client_ip_behind_trusted_proxies(monkeypatch):
+    """
+    Test that X-Forwarded-For is only used when the peer is a trusted proxy,
+    and that the forged entries on its left are ignored.
+    """
+    from starlette.requests import Request
+
+    from app.api.deps import get_client_ip
+
+    def request(peer: str, forwarded: str | None = None) -> Request:
+        headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+        return Request({"type": "http", "client": (peer, 1234), "headers": headers})
+
+    monkeypatch.setattr(settings, "TRUSTED_PROXIES", "")
+    assert get_client_ip(request("10.0.0.2", "203.0.113.7")) == "10.0.0.2"
+
+    monkeypatch.setattr(settings, "TRUSTED_PROXIES", "10.0.0.0/8")
+    assert get_client_ip(request("10.0.0.2", "1.1.1.1, 203.0.113.7, 10.0.0.3")) == "203.0.113.7"
+    assert get_client_ip(request("198.51.100.1", "203.0.113.7")) == "198.51.100.1"
+    assert get_client_ip(request("10.0.0.2")) == "10.0.0.2"
+
+    monkeypatch.setattr(settings, "TRUSTED_PROXIES", "*")
+    assert get_client_ip(request("192.0.2.9", "1.1.1.1, 203.0.113.7")) == "203.0.113.7"
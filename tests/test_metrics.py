@@ -0,0 +1,43 @@
+from httpx import AsyncClient
+
+
+def _samples(body: str, name: str) -> dict[str, float]:
+    """Samples of a metric in the Prometheus text format, by label set."""
+    samples = {}
+    for line in body.splitlines():
+        if line.startswith(name + "{"):
+            labels, value = line[len(name):].rsplit(" ", 1)
+            samples[labels] = float(value)
+    return samples
+
+
+async def test_metrics_endpoint(authenticated_client: AsyncClient):
+    """
+    Test that /metrics reports the requests by route template, their SQL queries and the crypto timings.
+    """
+    response = await authenticated_client.post(
+        "/vault/", json={"username": "user", "password": "secret", "url": "https://example.com"}
+    )
+    item_id = response.json()["id"]
+    await authenticated_client.get(f"/vault/{item_id}")
+    await authenticated_client.get("/vault/999999")
+
+    response = await authenticated_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+
+    requests = _samples(body, "http_requests_total")
+    assert requests['{method="GET",route="/vault/{item_id}",status="200"}'] >= 1
+    assert requests['{method="GET",route="/vault/{item_id}",status="404"}'] >= 1
+    assert not any(f"/vault/{item_id}\"" in labels for labels in requests)
+
+    in_flight = _samples(body, "http_requests_in_flight")
+    assert in_flight['{method="GET",route="/vault/{item_id}"}'] == 0
+    queries = _samples(body, "http_request_db_queries_sum")
+    assert queries['{method="POST",route="/vault/"}'] >= 2
+    crypto = _samples(body, "crypto_operation_duration_seconds_count")
+    assert crypto['{operation="encrypt"}'] >= 1 and crypto['{operation="decrypt"}'] >= 1
+    assert crypto['{operation="bcrypt_hash"}'] >= 1
+    buckets = _samples(body, "http_request_duration_seconds_bucket")
+    assert buckets['{method="GET",route="/vault/{item_id}",le="+Inf"}'] >= 2
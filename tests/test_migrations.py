@@ -0,0 +1,79 @@
+from sqlalchemy import create_engine, text
+
+from app.db import init_db
+from app.db.migrations import schema_fingerprint, upgrade
+
+# Esquema de vault_items anterior a las columnas normalizadas de host
+OLD_SCHEMA = [
+    """
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY, email VARCHAR NOT NULL, hashed_password VARCHAR NOT NULL, is_active BOOLEAN
+    )
+    """,
+    """
+    CREATE TABLE vault_items (
+        id INTEGER PRIMARY KEY, username VARCHAR NOT NULL, encrypted_password VARCHAR NOT NULL,
+        url VARCHAR NOT NULL, notes TEXT, icon VARCHAR, owner_id INTEGER REFERENCES users (id)
+    )
+    """,
+]
+
+def test_upgrade_adds_columns_and_backfills(tmp_path):
+    """
+    Test that an old database gets the new columns, the search index and the host backfill.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        for statement in OLD_SCHEMA:
+            connection.execute(text(statement))
+        connection.execute(text("INSERT INTO users VALUES (1, 'old@example.com', 'x', 1)"))
+        connection.execute(text("INSERT INTO users VALUES (2, 'other@example.com', 'x', 1)"))
+        connection.execute(text(
+            "INSERT INTO vault_items (username, encrypted_password, url, notes, owner_id) "
+            "VALUES ('old', 'x', 'https://Login.Example.co.uk/', 'legacy notes', 1), "
+            "('other', 'x', 'https://example.org/', NULL, 2)"
+        ))
+
+    with engine.begin() as connection:
+        upgrade(connection)
+
+    with engine.connect() as connection:
+        rows = connection.execute(
+            text("SELECT host, registrable_domain, reversed_host FROM vault_items ORDER BY id")
+        ).all()
+        found = connection.execute(
+            text("SELECT rowid FROM vault_items_fts WHERE vault_items_fts MATCH 'legacy'")
+        ).all()
+        data_keys = connection.scalars(text("SELECT encrypted_data_key FROM users ORDER BY id")).all()
+        seqs = connection.execute(text(
+            "SELECT vault_items.seq, users.vault_version FROM vault_items "
+            "JOIN users ON users.id = vault_items.owner_id ORDER BY vault_items.id"
+        )).all()
+
+    assert [tuple(row) for row in rows] == [
+        ("login.example.co.uk", "example.co.uk", "uk.co.example.login"),
+        ("example.org", "example.org", "org.example"),
+    ]
+    assert len(found) == 1
+    assert None not in data_keys and data_keys[0] != data_keys[1]
+    assert [tuple(row) for row in seqs] == [(1, 1), (1, 1)]
+
+
+def test_startup_skips_upgrade_when_schema_version_matches(tmp_path, monkeypatch):
+    """
+    Test that the boot only creates and upgrades the schema when its stored fingerprint is outdated.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'boot.db'}")
+    monkeypatch.setattr(init_db, "engine", engine)
+
+    assert init_db.create_db_and_tables("check") is True
+    assert init_db.get_stored_schema_version() == schema_fingerprint()
+    assert init_db.create_db_and_tables("check") is False
+    assert init_db.create_db_and_tables("skip") is False
+
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE schema_version SET version = 'old'"))
+    assert init_db.create_db_and_tables("check") is True
+    assert init_db.create_db_and_tables("migrate") is True
+    with engine.connect() as connection:
+        assert connection.scalar(text("SELECT count(*) FROM schema_version")) == 1
@@ -0,0 +1,175 @@
+import asyncio
+import re
+from datetime import datetime, timedelta, timezone
+from email import message_from_bytes, policy
+
+import pytest
+from httpx import AsyncClient
+
+from app.core.mail import SmtpTransport
+from app.core.outbox import OutboxWorker
+from app.models.email_outbox import OutboxEmail
+
+pytestmark = pytest.mark.asyncio
+
+
+class SmtpStandIn:
+    """Local SMTP server that keeps the messages it accepts and answers `rcpt_reply` to RCPT TO."""
+
+    def __init__(self):
+        self.messages = []
+        self.rcpt_reply = b"250 OK"
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        writer.write(b"220 localhost SMTP stand-in\r\n")
+        data: list[bytes] | None = None
+        while line := await reader.readline():
+            if data is not None:
+                if line != b".\r\n":
+                    data.append(line[1:] if line.startswith(b"..") else line)
+                    continue
+                self.messages.append(message_from_bytes(b"".join(data), policy=policy.default))
+                data = None
+                reply = b"250 OK"
+            else:
+                command = line[:4].upper()
+                if command == b"RCPT":
+                    reply = self.rcpt_reply
+                elif command == b"DATA":
+                    data = []
+                    reply = b"354 End data with <CR><LF>.<CR><LF>"
+                elif command == b"QUIT":
+                    reply = b"221 Bye"
+                else:
+                    reply = b"250 OK"
+            writer.write(reply + b"\r\n")
+            await writer.drain()
+            if reply.startswith(b"221"):
+                break
+        writer.close()
+
+
+@pytest.fixture
+async def smtp_server():
+    stand_in = SmtpStandIn()
+    server = await asyncio.start_server(stand_in.handle, "127.0.0.1", 0)
+    stand_in.port = server.sockets[0].getsockname()[1]
+    yield stand_in
+    server.close()
+    await server.wait_closed()
+
+
+@pytest.fixture
+def make_worker(smtp_server: SmtpStandIn, async_session_factory):
+    """Build an outbox worker on the test database that sends to `smtp_server`."""
+
+    def make(**options) -> OutboxWorker:
+        settings = dict(
+            batch_size=10, concurrency=2, max_attempts=3,
+            backoff_seconds=60, max_backoff_seconds=600, lease_seconds=300, poll_seconds=1,
+            failed_retention_days=7,
+        )
+        settings.update(options)
+        return OutboxWorker(async_session_factory, SmtpTransport("127.0.0.1", smtp_server.port), **settings)
+
+    return make
+
+
+async def test_password_recovery_only_writes_the_outbox(client: AsyncClient, db, sql_statements: list[str]):
+    """
+    Test that a recovery request does the same single INSERT whether or not the user exists.
+    """
+    await client.post("/users/", json={"email": "known@example.com", "password": "password123"})
+    sql_statements.clear()
+
+    known = await client.post("/login/password-recovery/known@example.com")
+    unknown = await client.post("/login/password-recovery/unknown@example.com")
+    assert known.status_code == unknown.status_code == 200
+    assert known.json() == unknown.json()
+    assert [statement.split()[0].upper() for statement in sql_statements] == ["INSERT", "INSERT"]
+    assert sorted(email.recipient for email in db.query(OutboxEmail)) == ["known@example.com", "unknown@example.com"]
+
+
+async def test_password_recovery_is_not_queued_twice(client: AsyncClient, db):
+    """
+    Test that repeating a recovery while one is pending queues nothing, and
+    that the address is validated.
+    """
+    for _ in range(3):
+        response = await client.post("/login/password-recovery/someone@example.com")
+        assert response.status_code == 200
+    assert db.query(OutboxEmail).count() == 1
+
+    response = await client.post("/login/password-recovery/not-an-email")
+    assert response.status_code == 422
+    assert db.query(OutboxEmail).count() == 1
+
+
+async def test_worker_delivers_the_recovery_email(client: AsyncClient, db, smtp_server: SmtpStandIn, make_worker):
+    """
+    Test that the worker sends the email to an existing user over SMTP, drops
+    the one to an unknown address and empties the outbox.
+    """
+    await client.post("/users/", json={"email": "known@example.com", "password": "password123"})
+    await client.post("/login/password-recovery/known@example.com")
+    await client.post("/login/password-recovery/unknown@example.com")
+
+    assert await make_worker().deliver_once() == 2
+    assert [message["To"] for message in smtp_server.messages] == ["known@example.com"]
+    assert db.query(OutboxEmail).count() == 0
+
+    token = re.search(r"Token: (\S+)", smtp_server.messages[0].get_content()).group(1)
+    response = await client.post("/login/reset-password/", json={"token": token, "new_password": "newpassword"})
+    assert response.status_code == 200
+
+
+async def test_worker_retries_with_backoff(client: AsyncClient, db, smtp_server: SmtpStandIn, make_worker):
+    """
+    Test that a temporary SMTP error is retried later, and that the email fails
+    for good after the last attempt or on a permanent error.
+    """
+    await client.post("/users/", json={"email": "known@example.com", "password": "password123"})
+    await client.post("/login/password-recovery/known@example.com")
+    worker = make_worker(max_attempts=2)
+
+    smtp_server.rcpt_reply = b"451 Try again later"
+    assert await worker.deliver_once() == 1
+    email = db.query(OutboxEmail).one()
+    assert (email.status, email.attempts) == ("pending", 1)
+    assert "451" in email.last_error
+    assert email.next_attempt_at.replace(tzinfo=timezone.utc) > datetime.now(timezone.utc)
+    # No vuelve a salir hasta que pasa el backoff
+    assert await worker.deliver_once() == 0
+
+    db.query(OutboxEmail).update({"next_attempt_at": datetime.now(timezone.utc)})
+    db.commit()
+    assert await worker.deliver_once() == 1
+    db.expire_all()
+    assert (db.query(OutboxEmail).one().status, db.query(OutboxEmail).one().attempts) == ("failed", 2)
+
+    # Un 5xx no se reintenta
+    await client.post("/login/password-recovery/known@example.com")
+    smtp_server.rcpt_reply = b"550 No such user"
+    assert await worker.deliver_once() == 1
+    db.expire_all()
+    assert [email.status for email in db.query(OutboxEmail).order_by(OutboxEmail.id)] == ["failed", "failed"]
+    assert smtp_server.messages == []
+
+
+async def test_worker_purges_old_failed_emails(client: AsyncClient, db, make_worker):
+    """
+    Test that only the failed emails older than the retention are deleted.
+    """
+    await client.post("/login/password-recovery/old@example.com")
+    await client.post("/login/password-recovery/recent@example.com")
+    await client.post("/login/password-recovery/pending@example.com")
+    long_ago = datetime.now(timezone.utc) - timedelta(days=30)
+    db.query(OutboxEmail).filter(OutboxEmail.recipient != "pending@example.com").update({"status": "failed"})
+    db.query(OutboxEmail).filter(OutboxEmail.recipient.in_(["old@example.com", "pending@example.com"])).update(
+        {"created_at": long_ago}
+    )
+    db.commit()
+
+    assert await make_worker().purge_failed() == 1
+    db.expire_all()
+    assert sorted(email.recipient for email in db.query(OutboxEmail)) == ["pending@example.com", "recent@example.com"]
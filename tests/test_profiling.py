@@ -0,0 +1,41 @@
+import json
+import pstats
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.core import profiling
+from app.main import app
+
+
+@pytest.fixture
+def profiled_engine(async_engine):
+    """The test engine with the profiling hooks, removed after the test."""
+    remove = profiling.instrument_engine(async_engine.sync_engine, "async")
+    yield async_engine
+    remove()
+
+
+async def test_profiled_request(authenticated_client: AsyncClient, profiled_engine, tmp_path):
+    """
+    Test that only requests with the profiling token are profiled, with their SQL statements.
+    """
+    profiled_app = profiling.ProfilingMiddleware(app, token="profile-token", directory=str(tmp_path))
+    headers = {"Authorization": authenticated_client.headers["Authorization"]}
+
+    async with AsyncClient(transport=ASGITransport(app=profiled_app), base_url="http://test") as client:
+        response = await client.get("/vault/", headers=headers)
+        assert "x-profile-id" not in response.headers
+        response = await client.get("/vault/", headers={**headers, "X-Profile": "wrong"})
+        assert "x-profile-id" not in response.headers
+        assert list(tmp_path.iterdir()) == []
+
+        response = await client.get("/vault/", headers={**headers, "X-Profile": "profile-token"})
+        assert response.status_code == 200
+        profile_id = response.headers["x-profile-id"]
+
+    stats = pstats.Stats(str(tmp_path / f"{profile_id}.prof"))
+    assert stats.total_calls > 0
+    report = json.loads((tmp_path / f"{profile_id}.json").read_text())
+    assert report["request"]["path"] == "/vault/" and report["request"]["status"] == 200
+    assert any("FROM vault_items" in query["statement"] for query in report["sql"])
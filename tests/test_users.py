@@ -1,5 +1,11 @@
 from httpx import AsyncClient
 import pytest
+from sqlalchemy import update
+
+from app.core.principals import principal_cache
+from app.core.security import create_password_reset_token
+from app.crud import crud_user
+from app.models.user import User
 
 pytestmark = pytest.mark.asyncio
 
@@ -33,4 +39,67 @@ async def test_create_duplicate_user(client: AsyncClient):
         json={"email": "duplicate@example.com", "password": "testpassword"},
     )
     assert response.status_code == 400
-    assert "already exists" in response.json()["detail"]
\ No newline at end of file
+    assert "already exists" in response.json()["detail"]
+
+async def test_read_users_me_uses_principal_cache(authenticated_client: AsyncClient):
+    """
+    Test that repeated authenticated requests are served from the principal cache.
+    """
+    first = await authenticated_client.get("/users/me")
+    hits_before = principal_cache.hits
+
+    second = await authenticated_client.get("/users/me")
+
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json()
+    assert principal_cache.hits == hits_before + 1
+
+async def test_reset_password_invalidates_principal_cache(authenticated_client: AsyncClient):
+    """
+    Test that a password reset drops the cached sessions of that user.
+    """
+    me = (await authenticated_client.get("/users/me")).json()
+    assert principal_cache.stats()["size"] == 1
+
+    response = await authenticated_client.post(
+        "/login/reset-password/",
+        json={"token": create_password_reset_token(me["email"]), "new_password": "newpassword"},
+    )
+    assert response.status_code == 200
+    assert principal_cache.stats()["size"] == 0
+
+async def test_deactivated_user_is_rejected(authenticated_client: AsyncClient, db):
+    """
+    Test that deactivating a user takes effect even if their session was cached.
+    """
+    me = (await authenticated_client.get("/users/me")).json()
+
+    user = crud_user.get_user_by_email(db, email=me["email"])
+    crud_user.set_user_active(db, user, is_active=False)
+
+    response = await authenticated_client.get("/users/me")
+    assert response.status_code == 400
+
+async def test_secret_routes_skip_the_principal_cache(authenticated_client: AsyncClient, db):
+    """
+    Test that a deactivation made by another worker (which cannot reach this
+    cache) is enforced at once on the routes that return decrypted passwords.
+    """
+    me = (await authenticated_client.get("/users/me")).json()
+    db.execute(update(User).where(User.id == me["id"]).values(is_active=False))
+    db.commit()
+
+    assert (await authenticated_client.get("/users/me")).status_code == 200
+    assert (await authenticated_client.get("/vault/export")).status_code == 400
+    assert (await authenticated_client.post("/vault/reveal", json={"ids": [1]})).status_code == 400
+    # La lectura fresca también actualiza la caché
+    assert (await authenticated_client.get("/users/me")).status_code == 400
+
+async def test_create_user_is_one_insert(client: AsyncClient, sql_statements: list[str]):
+    """
+    Test that the registration inserts the user with INSERT ... RETURNING, with no SELECT to refresh it.
+    """
+    response = await client.post("/users/", json={"email": "returning@example.com", "password": "password123"})
+    assert response.status_code == 201
+    assert [statement.split()[0].upper() for statement in sql_statements] == ["SELECT", "INSERT"]
+    assert "RETURNING" in sql_statements[1]
@@ -1,5 +1,14 @@
+import csv
+import io
+import json
+import re
 from httpx import AsyncClient
 import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.core.pagination import encode_cursor
+from app.jobs.compact_tombstones import compact_tombstones
+from app.models.vault_item import VaultItem
 
 pytestmark = pytest.mark.asyncio
 
@@ -44,6 +53,7 @@ async def test_read_vault_items(authenticated_client: AsyncClient):
     assert len(data) == 1  
     assert data[0]["username"] == "user_to_read"
     assert data[0]["url"] == "https://readable.com/"
+    assert set(data[0]) == {"id", "owner_id", "username", "url", "icon"}
 
 async def test_unauthenticated_access_to_vault(client: AsyncClient):
     """
@@ -51,4 +61,395 @@ async def test_unauthenticated_access_to_vault(client: AsyncClient):
     """
     response = await client.get("/vault/")
     assert response.status_code == 401 # Unauthorized
-    assert "Not authenticated" in response.json()["detail"]
\ No newline at end of file
+    assert "Not authenticated" in response.json()["detail"]
+
+async def test_read_vault_items_cursor_pagination(authenticated_client: AsyncClient):
+    """
+    Test that the list can be walked page by page with the X-Next-Cursor header.
+    """
+    for i in range(5):
+        await authenticated_client.post(
+            "/vault/",
+            json={"username": f"user{i}", "password": "pw", "url": f"https://site{i}.com"},
+        )
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = await authenticated_client.get("/vault/", params=params)
+        assert response.status_code == 200
+        seen.extend(item["username"] for item in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert seen == [f"user{i}" for i in range(5)]
+
+async def test_read_vault_items_sorted_by_url(authenticated_client: AsyncClient):
+    """
+    Test keyset pagination over the URL sort order.
+    """
+    for name in ["charlie", "alpha", "bravo"]:
+        await authenticated_client.post(
+            "/vault/",
+            json={"username": name, "password": "pw", "url": f"https://{name}.com"},
+        )
+
+    first = await authenticated_client.get("/vault/", params={"sort": "url", "limit": 2})
+    assert [item["username"] for item in first.json()] == ["alpha", "bravo"]
+
+    second = await authenticated_client.get(
+        "/vault/", params={"sort": "url", "limit": 2, "cursor": first.headers["X-Next-Cursor"]}
+    )
+    assert [item["username"] for item in second.json()] == ["charlie"]
+    assert "X-Next-Cursor" not in second.headers
+
+    # Un cursor de otro orden no es válido
+    wrong = await authenticated_client.get(
+        "/vault/", params={"sort": "id", "cursor": first.headers["X-Next-Cursor"]}
+    )
+    assert wrong.status_code == 400
+
+    # Cursores bien codificados pero con valores que no son los de su orden
+    for sort, values in [
+        ("id", []), ("id", [{"a": 1}]), ("id", [-1]), ("url", ["https://a.com"]),
+        ("url", ["https://a.com", "1"]), ("relevance", ["abc"]),
+    ]:
+        params = {"sort": sort, "cursor": encode_cursor(sort, values)}
+        if sort == "relevance":
+            params["q"] = "alice"
+        forged = await authenticated_client.get("/vault/", params=params)
+        assert forged.status_code == 400, (sort, values)
+
+async def test_search_vault_items(authenticated_client: AsyncClient):
+    """
+    Test the free-text search over username, URL and notes, and that it follows updates.
+    """
+    await authenticated_client.post(
+        "/vault/",
+        json={"username": "alice", "password": "pw", "url": "https://mail.example.com", "notes": "work account"},
+    )
+    created = await authenticated_client.post(
+        "/vault/",
+        json={"username": "bob", "password": "pw", "url": "https://bank.test", "notes": "savings"},
+    )
+
+    response = await authenticated_client.get("/vault/", params={"q": "work"})
+    assert [item["username"] for item in response.json()] == ["alice"]
+
+    response = await authenticated_client.get("/vault/", params={"q": "ban", "sort": "relevance"})
+    assert [item["username"] for item in response.json()] == ["bob"]
+
+    await authenticated_client.put(f"/vault/{created.json()['id']}", json={"notes": "work laptop"})
+    response = await authenticated_client.get("/vault/", params={"q": "work"})
+    assert sorted(item["username"] for item in response.json()) == ["alice", "bob"]
+
+    response = await authenticated_client.get("/vault/", params={"sort": "relevance"})
+    assert response.status_code == 400
+
+async def test_read_vault_items_by_domain(authenticated_client: AsyncClient):
+    """
+    Test the domain match mode: same host, subdomains and parent domains, but not siblings.
+    """
+    for name, url in [
+        ("root", "https://example.com"),
+        ("accounts", "https://accounts.example.com/login"),
+        ("deep", "https://eu.login.accounts.example.com"),
+        ("sibling", "https://mail.example.com"),
+        ("other", "https://example.org"),
+    ]:
+        await authenticated_client.post(
+            "/vault/", json={"username": name, "password": "pw", "url": url}
+        )
+
+    response = await authenticated_client.get("/vault/", params={"domain": "accounts.example.com"})
+    assert [item["username"] for item in response.json()] == ["root", "accounts", "deep"]
+
+    response = await authenticated_client.get("/vault/", params={"domain": "example.com"})
+    assert [item["username"] for item in response.json()] == ["root", "accounts", "deep", "sibling"]
+
+async def test_import_vault_items_csv(authenticated_client: AsyncClient):
+    """
+    Test the bulk import of a browser CSV export, with per-row errors.
+    """
+    export = (
+        "name,url,username,password,note\n"
+        "Mail,https://mail.example.com,alice,secret1,work\n"
+        "Broken,not a url,bob,secret2,\n"
+        "Bank,https://bank.example.com,,secret3,\n"
+        "NoPassword,https://nopass.example.com,carol,,\n"
+    )
+    response = await authenticated_client.post(
+        "/vault/import", files={"file": ("passwords.csv", export, "text/csv")}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["imported"] == 2
+    assert [error["row"] for error in data["errors"]] == [3, 5]
+
+    items = (await authenticated_client.get("/vault/")).json()
+    assert [item["url"] for item in items] == ["https://mail.example.com/", "https://bank.example.com/"]
+
+    detail = await authenticated_client.get(f"/vault/{items[0]['id']}")
+    assert detail.json()["password"] == "secret1"
+    assert detail.json()["notes"] == "work"
+
+async def test_import_vault_items_bitwarden_json(authenticated_client: AsyncClient):
+    """
+    Test the import of a Bitwarden JSON export.
+    """
+    export = (
+        '{"items": [{"name": "Site", "notes": null, "login": {"username": "dave", '
+        '"password": "pw", "uris": [{"uri": "https://site.example.com"}]}}]}'
+    )
+    response = await authenticated_client.post(
+        "/vault/import", files={"file": ("bitwarden.json", export, "application/json")}
+    )
+    assert response.json() == {"imported": 1, "errors": []}
+
+async def test_import_vault_items_login_alias_ndjson(authenticated_client: AsyncClient):
+    """
+    Test that a plain "login" field is read as the username, not as a Bitwarden login object.
+    """
+    export = (
+        '{"login": "bob", "password": "x", "url": "https://a.com"}\n'
+        '{"login": "carol", "url": "https://b.com"}\n'
+    )
+    response = await authenticated_client.post(
+        "/vault/import", files={"file": ("items.ndjson", export, "application/x-ndjson")}
+    )
+    assert response.status_code == 200
+    assert response.json()["imported"] == 1
+    assert [error["row"] for error in response.json()["errors"]] == [2]
+    items = (await authenticated_client.get("/vault/")).json()
+    assert [item["username"] for item in items] == ["bob"]
+
+async def test_import_vault_items_bitwarden_nulls(authenticated_client: AsyncClient):
+    """
+    Test that null usernames and uris in a Bitwarden export are tolerated, and
+    that other bad values are reported per row instead of aborting the import.
+    """
+    export = json.dumps({"items": [
+        {"login": {"username": None, "password": "pw1", "uris": [{"uri": "https://a.example.com"}]}},
+        {"login": {"username": "erin", "password": "pw2", "uris": [None, {"uri": "https://b.example.com"}]}},
+        {"login": {"username": ["x"], "password": "pw3", "uris": [{"uri": "https://c.example.com"}]}},
+        {"login": {"username": "frank", "password": "pw4", "uris": [None]}},
+    ]})
+    response = await authenticated_client.post(
+        "/vault/import", files={"file": ("bitwarden.json", export, "application/json")}
+    )
+    assert response.status_code == 200
+    assert response.json()["imported"] == 2
+    assert [error["row"] for error in response.json()["errors"]] == [3, 4]
+    items = (await authenticated_client.get("/vault/")).json()
+    assert [(item["username"], item["url"]) for item in items] == [
+        ("", "https://a.example.com/"), ("erin", "https://b.example.com/"),
+    ]
+
+async def test_export_vault_items(authenticated_client: AsyncClient):
+    """
+    Test the streamed export in NDJSON and CSV, with decrypted passwords.
+    """
+    for i in range(3):
+        await authenticated_client.post(
+            "/vault/",
+            json={"username": f"user{i}", "password": f"secret{i}", "url": f"https://site{i}.com", "notes": "a, b"},
+        )
+
+    response = await authenticated_client.get("/vault/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["password"] for line in lines] == ["secret0", "secret1", "secret2"]
+
+    response = await authenticated_client.get("/vault/export", params={"format": "csv"})
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["username"] for row in rows] == ["user0", "user1", "user2"]
+    assert rows[0]["notes"] == "a, b"
+
+async def test_reveal_vault_items(authenticated_client: AsyncClient):
+    """
+    Test that several passwords can be revealed at once, skipping unknown ids.
+    """
+    ids = []
+    for i in range(3):
+        response = await authenticated_client.post(
+            "/vault/",
+            json={"username": f"user{i}", "password": f"secret{i}", "url": f"https://site{i}.com"},
+        )
+        ids.append(response.json()["id"])
+
+    response = await authenticated_client.post("/vault/reveal", json={"ids": [ids[2], ids[0], 9999]})
+    assert response.status_code == 200
+    data = response.json()
+    assert [(item["id"], item["password"]) for item in data] == [(ids[0], "secret0"), (ids[2], "secret2")]
+    assert data[0]["url"] == "https://site0.com/"
+
+    single = await authenticated_client.get(f"/vault/{ids[1]}")
+    assert single.json()["password"] == "secret1"
+
+async def test_sparse_fieldsets(authenticated_client: AsyncClient):
+    """
+    Test that ?fields= limits the returned fields of the list and of one item.
+    """
+    ids = []
+    for i in range(3):
+        response = await authenticated_client.post(
+            "/vault/",
+            json={"username": f"user{i}", "password": f"secret{i}", "url": f"https://site{i}.com", "notes": f"note {i}"},
+        )
+        ids.append(response.json()["id"])
+
+    response = await authenticated_client.get("/vault/", params={"fields": "url,notes"})
+    assert response.json()[0] == {"id": ids[0], "url": "https://site0.com/", "notes": "note 0"}
+
+    # El orden por url sigue paginando aunque la url no se devuelva
+    response = await authenticated_client.get("/vault/", params={"fields": "username", "sort": "url", "limit": 2})
+    assert response.json() == [{"id": ids[0], "username": "user0"}, {"id": ids[1], "username": "user1"}]
+    response = await authenticated_client.get(
+        "/vault/", params={"fields": "username", "sort": "url", "cursor": response.headers["X-Next-Cursor"]}
+    )
+    assert response.json() == [{"id": ids[2], "username": "user2"}]
+
+    response = await authenticated_client.get(f"/vault/{ids[1]}", params={"fields": "notes"})
+    assert response.json() == {"id": ids[1], "notes": "note 1"}
+    response = await authenticated_client.get(f"/vault/{ids[1]}", params={"fields": "password"})
+    assert response.json() == {"id": ids[1], "password": "secret1"}
+
+    response = await authenticated_client.get("/vault/", params={"fields": "url,encrypted_password"})
+    assert response.status_code == 400
+
+async def test_conditional_get_with_etag(authenticated_client: AsyncClient):
+    """
+    Test that list and item reads answer 304 to a matching If-None-Match until the vault changes.
+    """
+    response = await authenticated_client.post(
+        "/vault/", json={"username": "user0", "password": "secret0", "url": "https://site0.com"}
+    )
+    item_id = response.json()["id"]
+
+    response = await authenticated_client.get("/vault/")
+    etag = response.headers["ETag"]
+    response = await authenticated_client.get("/vault/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    # Otra consulta, otro ETag
+    response = await authenticated_client.get("/vault/", params={"fields": "url"}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+    item = await authenticated_client.get(f"/vault/{item_id}")
+    assert item.headers["Cache-Control"] == "no-store"
+    response = await authenticated_client.get(f"/vault/{item_id}", headers={"If-None-Match": item.headers["ETag"]})
+    assert response.status_code == 304
+
+    await authenticated_client.put(f"/vault/{item_id}", json={"username": "renamed"})
+    response = await authenticated_client.get("/vault/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()[0]["username"] == "renamed"
+
+async def test_vault_changes_delta_sync(authenticated_client: AsyncClient, db):
+    """
+    Test that /vault/changes returns only what changed since a seq, tombstones included,
+    and answers 410 once the tombstones after that seq were compacted.
+    """
+    ids = []
+    for i in range(3):
+        response = await authenticated_client.post(
+            "/vault/", json={"username": f"user{i}", "password": f"secret{i}", "url": f"https://site{i}.com"}
+        )
+        ids.append(response.json()["id"])
+
+    response = await authenticated_client.get("/vault/changes", params={"limit": 2})
+    first = response.json()
+    assert [item["id"] for item in first["items"]] == ids[:2]
+    assert first["has_more"] is True
+    response = await authenticated_client.get("/vault/changes", params={"since": first["seq"]})
+    synced = response.json()
+    assert ([item["id"] for item in synced["items"]], synced["has_more"]) == ([ids[2]], False)
+
+    await authenticated_client.put(f"/vault/{ids[0]}", json={"username": "renamed"})
+    response = await authenticated_client.delete(f"/vault/{ids[1]}")
+    assert response.status_code == 200
+
+    response = await authenticated_client.get("/vault/changes", params={"since": synced["seq"]})
+    changes = response.json()
+    assert [(item["id"], item["username"]) for item in changes["items"]] == [(ids[0], "renamed")]
+    assert changes["deleted"] == [ids[1]]
+
+    # El item borrado ya no aparece en las lecturas normales
+    assert [item["id"] for item in (await authenticated_client.get("/vault/")).json()] == [ids[0], ids[2]]
+    assert (await authenticated_client.get(f"/vault/{ids[1]}")).status_code == 404
+
+    assert compact_tombstones(sessionmaker(bind=db.get_bind()), retention_days=0) == 1
+    response = await authenticated_client.get("/vault/changes", params={"since": synced["seq"]})
+    assert response.status_code == 410
+    response = await authenticated_client.get("/vault/changes", params={"since": changes["seq"]})
+    assert response.json()["items"] == [] and response.json()["deleted"] == []
+
+
+async def test_vault_writes_are_single_round_trip(authenticated_client: AsyncClient, db, sql_statements: list[str]):
+    """
+    Test that each write is the version bump plus one INSERT/UPDATE ... RETURNING
+    (a delete then blanks the tombstone), with no SELECT to load the item before
+    or to refresh it after.
+    """
+    response = await authenticated_client.post(
+        "/vault/", json={"username": "warm", "password": "pw", "url": "https://warm.com"}
+    )
+    item_id = response.json()["id"]
+
+    def writes() -> list[str]:
+        # Sin contar las transacciones implícitas ni la autenticación (en caché)
+        found = [statement.split()[0].upper() for statement in sql_statements]
+        sql_statements.clear()
+        return found
+
+    writes()
+    response = await authenticated_client.post(
+        "/vault/", json={"username": "new", "password": "pw", "url": "https://new.com"}
+    )
+    assert response.status_code == 201
+    assert writes() == ["UPDATE", "INSERT"]
+
+    response = await authenticated_client.put(f"/vault/{item_id}", json={"username": "renamed", "password": "pw2"})
+    assert response.json()["username"] == "renamed"
+    assert writes() == ["UPDATE", "UPDATE"]
+
+    # El borrado devuelve el item tal como era: se marca y después se vacía
+    response = await authenticated_client.delete(f"/vault/{item_id}")
+    assert response.status_code == 200
+    assert (response.json()["id"], response.json()["username"]) == (item_id, "renamed")
+    assert writes() == ["UPDATE", "UPDATE", "UPDATE"]
+    tombstone = db.get(VaultItem, item_id)
+    assert (tombstone.username, tombstone.encrypted_password) == ("", b"")
+
+    # Un item inexistente (o ya borrado) no deja el bump de versión
+    response = await authenticated_client.put(f"/vault/{item_id}", json={"username": "gone"})
+    assert response.status_code == 404
+    response = await authenticated_client.delete(f"/vault/{item_id}")
+    assert response.status_code == 404
+    response = await authenticated_client.get("/vault/changes", params={"since": 0})
+    assert response.json()["seq"] == 4
+
+
+async def test_postgres_search_matches_the_index_expression():
+    """
+    Test that the PostgreSQL search expression is the one of the GIN index
+    (IMMUTABLE functions only), so the planner can use the index.
+    """
+    from sqlalchemy.dialects import postgresql
+
+    from app.db.fulltext import _POSTGRES_DDL, postgres_search_vector
+
+    def normalized(sql: str) -> str:
+        return re.sub(r"[()\s]|vault_items\.", "", sql)
+
+    query = str(postgres_search_vector(VaultItem).compile(dialect=postgresql.dialect()))
+    index = _POSTGRES_DDL[0].split("USING GIN", 1)[1]
+    assert normalized(query) == normalized(index)
+    assert "concat_ws" not in index